@@ -1,13 +1,28 @@
 import pygame
-import os
-from enum import Enum, auto
+import argparse
+import time
+
+import instrument
+import sprite_atlas
+import split_rules
+from split_ai import AIPlayer
+from split_position import BLACK as BLACK_INDEX, COLS, ROWS, WHITE as WHITE_INDEX, square
+from split_rules import PieceColor
+from tablebase import Tablebase
 
 # Constants
 BOARD_SIZE = 720  # Size of the chessboard
 SIDEBAR_WIDTH = BOARD_SIZE / 3.2  # Width of the sidebar
 WIDTH, HEIGHT = BOARD_SIZE + SIDEBAR_WIDTH, BOARD_SIZE
-ROWS, COLS = 8, 8
 SQUARE_SIZE = BOARD_SIZE // COLS
+MIN_SQUARE_SIZE = 32
+RESIZE_SETTLE_MS = 150  # A resized window is laid out again once dragging pauses this long
+
+STATS_INTERVAL = 5.0  # Seconds between frame statistics reports
+AI_POLL_MS = 50  # How often an idle dirty-mode loop wakes up while the computer thinks
+OVERLAY_REFRESH_MS = 500  # How often the instrumentation overlay is brought up to date
+OVERLAY_LINES = 12  # Histograms shown in the overlay, the most total time first
+OVERLAY_FONT_SIZE = 20
 
 # Colors
 WHITE = (255, 255, 255)
@@ -22,129 +37,75 @@ WIN_TEXT_COLOR = (0, 255, 0)
 BUTTON_COLOR = (100, 100, 100)
 BUTTON_HOVER_COLOR = (150, 150, 150)
 
-# Piece types
-class PieceType(Enum):
-    PAWN = auto()
-    KNIGHT = auto()
-    BISHOP = auto()
-    ROOK = auto()
-    QUEEN = auto()
-    KING = auto()
-
-# Piece colors
-class PieceColor(Enum):
-    WHITE = "w"
-    BLACK = "b"
-
-def load_images():
-    pieces = {}
-    base_path = os.path.join(os.path.dirname(__file__), 'images')  # Get the images folder relative to the script
-
-    for color in PieceColor:
-        for piece in PieceType:
-            # Load full piece image
-            path = os.path.join(base_path, f'{color.value}_{piece.name.lower()}.png')
-            image = pygame.image.load(path)
-            pieces[f'{color.value}_{piece.name.lower()}'] = pygame.transform.scale(image, (SQUARE_SIZE, SQUARE_SIZE))
-
-            # Skip loading split images for kings
-            if piece != PieceType.KING:
-                for fraction in ['half', 'quarter', 'eighth']:
-                    path = os.path.join(base_path, f'{color.value}_{piece.name.lower()}_{fraction}.png')
-                    image = pygame.image.load(path)
-                    pieces[f'{color.value}_{piece.name.lower()}_{fraction}'] = pygame.transform.scale(image, (SQUARE_SIZE, SQUARE_SIZE))
-                    
-    return pieces
-
-piece_images = load_images()
-
-# Chessboard class
-class ChessBoard:
+COLOR_INDEXES = {"white": WHITE_INDEX, "black": BLACK_INDEX}
+
+def set_board_size(size):
+    # Lay the window out for a board of about size pixels, in whole squares
+    global BOARD_SIZE, SIDEBAR_WIDTH, WIDTH, HEIGHT, SQUARE_SIZE
+    SQUARE_SIZE = max(size // COLS, MIN_SQUARE_SIZE)
+    BOARD_SIZE = SQUARE_SIZE * COLS
+    SIDEBAR_WIDTH = BOARD_SIZE / 3.2
+    WIDTH, HEIGHT = BOARD_SIZE + SIDEBAR_WIDTH, BOARD_SIZE
+
+def board_size_for_window(width, height):
+    # Largest board whose layout fits a window of that size
+    return int(min(height, width * 3.2 / 4.2))
+
+def get_piece_images():
+    # Piece images for the current square size, keyed by the packed piece codes of split_position
+    return sprite_atlas.get_atlas(SQUARE_SIZE).images
+
+# Fonts and rendered labels are made once and reused by every frame
+fonts = {}
+text_surfaces = {}
+
+def get_font(size=36):
+    font = fonts.get(size)
+    if font is None:
+        font = fonts[size] = pygame.font.Font(None, size)
+    return font
+
+def render_text(text, color, size=36):
+    key = (text, color, size)
+    surface = text_surfaces.get(key)
+    if surface is None:
+        surface = text_surfaces[key] = get_font(size).render(text, True, color)
+    return surface
+
+def render_board_background(flipped):
+    # The empty board as seen from one side
+    background = pygame.Surface((BOARD_SIZE, BOARD_SIZE))
+    for row in range(ROWS):
+        for col in range(COLS):
+            adjusted_row = ROWS - 1 - row if flipped else row
+            adjusted_col = COLS - 1 - col if flipped else col
+            color = LIGHT_BROWN if (row + col) % 2 == 0 else DARK_BROWN
+            pygame.draw.rect(background, color, (adjusted_col * SQUARE_SIZE, adjusted_row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+    return background
+
+def draw_overlay(screen):
+    # Instrumentation summary on a dark panel over the top left of the board
+    font = get_font(OVERLAY_FONT_SIZE)
+    lines = instrument.report(OVERLAY_LINES) or ["instrumentation on, nothing measured yet"]
+    surfaces = [font.render(line, True, TEXT_COLOR) for line in lines]  # Not cached, the numbers keep changing
+    line_height = font.get_linesize()
+    rect = pygame.Rect(0, 0, min(max(surface.get_width() for surface in surfaces) + 12, BOARD_SIZE),
+                       min(line_height * len(surfaces) + 8, BOARD_SIZE))
+    panel = pygame.Surface(rect.size)
+    panel.set_alpha(200)
+    panel.fill(BLACK)
+    screen.blit(panel, rect)
+    for index, surface in enumerate(surfaces):
+        screen.blit(surface, (6, 4 + index * line_height), pygame.Rect(0, 0, rect.width - 6, line_height))
+    return rect
+
+# Chessboard class: the headless rules board plus drawing and mouse handling
+class ChessBoard(split_rules.ChessBoard):
     def __init__(self, screen):
-        self.reset()
+        super().__init__()
         self.screen = screen
         self.flipped = False
 
-    def reset(self):
-        # Reset the game state to the initial setup.
-        self.board = [
-            ["b_rook", "b_knight", "b_bishop", "b_queen", "b_king", "b_bishop", "b_knight", "b_rook"],
-            ["b_pawn"] * 8,
-            [None] * 8,
-            [None] * 8,
-            [None] * 8,
-            [None] * 8,
-            ["w_pawn"] * 8,
-            ["w_rook", "w_knight", "w_bishop", "w_queen", "w_king", "w_bishop", "w_knight", "w_rook"]
-        ]
-        self.turn = PieceColor.WHITE
-        self.selected_piece = None
-        self.selected_pos = None
-        self.valid_moves = []
-        self.potential_moves = []  # Track potential moves before committing
-        self.en_passant_target = None
-        self.castling_rights = {PieceColor.WHITE: {"king_side": True, "queen_side": True},
-                                PieceColor.BLACK: {"king_side": True, "queen_side": True}}
-        self.game_over = False  # Track if the game is over
-        self.winner = None  # Track the winner
-        self.captured_pieces = {}  # Track captured pieces during potential moves
-
-    def get_valid_moves(self, piece, x, y):
-        moves_list = []
-        piece_type = piece.split('_')[1]
-        directions = {
-            "bishop": [(1, 1), (1, -1), (-1, 1), (-1, -1)],
-            "rook": [(1, 0), (-1, 0), (0, 1), (0, -1)],
-            "queen": [(1, 1), (1, -1), (-1, 1), (-1, -1), (1, 0), (-1, 0), (0, 1), (0, -1)],
-            "king": [(1, 1), (1, -1), (-1, 1), (-1, -1), (1, 0), (-1, 0), (0, 1), (0, -1)]
-        }
-        if piece_type == "pawn":
-            direction = -1 if piece.startswith("w") else 1
-            start_row = 6 if piece.startswith("w") else 1
-            if 0 <= y + direction < ROWS and self.board[y + direction][x] is None:
-                moves_list.append((x, y + direction))
-                if y == start_row and self.board[y + 2 * direction][x] is None:
-                    moves_list.append((x, y + 2 * direction))
-            for dx in [-1, 1]:
-                nx, ny = x + dx, y + direction
-                if 0 <= nx < COLS and 0 <= ny < ROWS:
-                    if self.board[ny][nx] and self.board[ny][nx][0] != piece[0]:  # Normal capture
-                        moves_list.append((nx, ny))
-                    elif (nx, ny) == self.en_passant_target:  # En passant capture
-                        moves_list.append((nx, ny))
-        elif piece_type == "knight":
-            for dx, dy in [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < COLS and 0 <= ny < ROWS and (self.board[ny][nx] is None or self.board[ny][nx][0] != piece[0]):
-                    moves_list.append((nx, ny))
-        elif piece_type == "king":
-            for dx, dy in directions["king"]:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < COLS and 0 <= ny < ROWS and (self.board[ny][nx] is None or self.board[ny][nx][0] != piece[0]):
-                    moves_list.append((nx, ny))
-            # Castling
-            if self.castling_rights[PieceColor(piece[0])]["king_side"]:
-                if self.board[y][x + 1] is None and self.board[y][x + 2] is None:
-                    moves_list.append((x + 2, y))
-            if self.castling_rights[PieceColor(piece[0])]["queen_side"]:
-                if self.board[y][x - 1] is None and self.board[y][x - 2] is None and self.board[y][x - 3] is None:
-                    moves_list.append((x - 2, y))
-        else:
-            for dx, dy in directions.get(piece_type, []):
-                nx, ny = x + dx, y + dy
-                while 0 <= nx < COLS and 0 <= ny < ROWS:
-                    if self.board[ny][nx] is None:
-                        moves_list.append((nx, ny))
-                    elif self.board[ny][nx][0] != piece[0]:
-                        moves_list.append((nx, ny))
-                        break
-                    else:
-                        break
-                    nx += dx
-                    ny += dy
-
-        return moves_list
-
     def handle_click(self, pos):
         # Check if the game is over
         if self.game_over:
@@ -161,6 +122,8 @@ class ChessBoard:
             return
 
         # Handle chessboard clicks
+        if pos[1] >= BOARD_SIZE:
+            return  # Below the board in a window taller than the layout
         col = pos[0] // SQUARE_SIZE
         row = pos[1] // SQUARE_SIZE
 
@@ -168,194 +131,7 @@ class ChessBoard:
         if self.flipped:
             col = COLS - 1 - col
             row = ROWS - 1 - row
-
-        if self.selected_piece:
-            # Check if the player clicks on the same piece again to deselect it
-            if (col, row) == self.selected_pos and len(self.potential_moves) == 0:
-                # Deselect the piece only if no moves have been made
-                self.selected_piece = None
-                self.selected_pos = None
-                self.valid_moves = []
-                self.potential_moves = []
-                return
-
-            # Check if the player clicks on a selected move option to deselect it
-            if (col, row) in self.potential_moves:
-                # Remove the move from potential moves
-                self.potential_moves.remove((col, row))
-
-                # Restore the captured piece (if any) on the deselected square
-                if (col, row) in self.captured_pieces:
-                    self.board[row][col] = self.captured_pieces[(col, row)]
-
-                # Remove the ghost piece from the deselected square
-                else:
-                    self.board[row][col] = None
-
-                # If there's still one move left, revert it to a full ghost piece
-                if len(self.potential_moves) == 1:
-                    col2, row2 = self.potential_moves[0]
-                    self.board[row2][col2] = self.selected_piece  # Revert to full piece
-                return
-
-            if (col, row) in self.valid_moves:
-                # Prevent kings from performing quantum moves
-                if self.selected_piece.split('_')[1] == "king" and len(self.potential_moves) >= 1:
-                    return  # Kings can only have one move
-
-                # Prevent eighth pieces from splitting
-                if self.selected_piece.endswith("_eighth") and len(self.potential_moves) >= 1:
-                    return  # Eighth pieces cannot split
-                
-                elif (len(self.potential_moves) >= 2):
-                    return  # Half and quarter pieces can only split into two moves
-
-                # Track the captured piece (if any) on the target square
-                if self.board[row][col] is not None:
-                    self.captured_pieces[(col, row)] = self.board[row][col]
-
-                # Add the move to potential moves
-                self.potential_moves.append((col, row))
-
-                # Update ghost pieces
-                if len(self.potential_moves) == 1:
-                    # Display a full ghost piece
-                    self.board[row][col] = self.selected_piece
-                elif len(self.potential_moves) == 2:
-                    # Split the ghost piece into smaller pieces
-                    col1, row1 = self.potential_moves[0]
-                    col2, row2 = self.potential_moves[1]
-                    if not self.selected_piece.endswith("_half") and not self.selected_piece.endswith("_quarter"):
-                        # If the selected piece is a full piece, split it into half pieces
-                        self.board[row1][col1] = f"{self.selected_piece.split('_')[0]}_{self.selected_piece.split('_')[1]}_half"
-                        self.board[row2][col2] = f"{self.selected_piece.split('_')[0]}_{self.selected_piece.split('_')[1]}_half"
-                    elif self.selected_piece.endswith("_half"):
-                        # If the selected piece is a half piece, split it into quarter pieces
-                        self.board[row1][col1] = f"{self.selected_piece.split('_')[0]}_{self.selected_piece.split('_')[1]}_quarter"
-                        self.board[row2][col2] = f"{self.selected_piece.split('_')[0]}_{self.selected_piece.split('_')[1]}_quarter"
-                    elif self.selected_piece.endswith("_quarter"):
-                        # If the selected piece is a quarter piece, split it into eighth pieces
-                        self.board[row1][col1] = f"{self.selected_piece.split('_')[0]}_{self.selected_piece.split('_')[1]}_eighth"
-                        self.board[row2][col2] = f"{self.selected_piece.split('_')[0]}_{self.selected_piece.split('_')[1]}_eighth"
-        else:
-            if self.board[row][col] and self.board[row][col][0] == self.turn.value:
-                self.selected_piece = self.board[row][col]
-                self.selected_pos = (col, row)
-                self.valid_moves = self.get_valid_moves(self.selected_piece, col, row)
-                self.potential_moves = []  # Reset potential moves when a new piece is selected
-            
-    def commit_move(self):
-        if self.selected_piece and self.potential_moves:
-            # Handle en passant capture
-            for move in self.potential_moves:
-                col, row = move
-                if (col, row) == self.en_passant_target:
-                    # Remove the pawn that was captured en passant
-                    captured_pawn_row = row + 1 if self.turn == PieceColor.WHITE else row - 1
-                    self.board[captured_pawn_row][col] = None
-
-            # Handle castling
-            if self.selected_piece.split('_')[1] == "king":
-                original_col, original_row = self.selected_pos
-                for move in self.potential_moves:
-                    col, row = move
-                    if abs(col - original_col) == 2:  # Castling move
-                        if col > original_col:  # King-side castling
-                            # Move the rook
-                            self.board[row][col - 1] = self.board[row][7]
-                            self.board[row][7] = None
-                        else:  # Queen-side castling
-                            # Move the rook
-                            self.board[row][col + 1] = self.board[row][0]
-                            self.board[row][0] = None
-                        # Disable castling rights for this color
-                        self.castling_rights[self.turn]["king_side"] = False
-                        self.castling_rights[self.turn]["queen_side"] = False
-
-            # Split the piece into smaller pieces
-            for i, move in enumerate(self.potential_moves):
-                col, row = move
-                if self.board[row][col] is None:
-                    # Place the smaller piece
-                    if self.selected_piece.endswith("_half"):
-                        self.board[row][col] = f"{self.selected_piece.split('_')[0]}_{self.selected_piece.split('_')[1]}_quarter"
-                    elif self.selected_piece.endswith("_quarter"):
-                        self.board[row][col] = f"{self.selected_piece.split('_')[0]}_{self.selected_piece.split('_')[1]}_eighth"
-                    else:
-                        self.board[row][col] = self.selected_piece
-                else:
-                    # Handle capture (if needed)
-                    pass
-
-            # Remove the original piece
-            original_col, original_row = self.selected_pos
-            self.board[original_row][original_col] = None
-
-            # Disable castling rights if the king or rooks move
-            if self.selected_piece.split('_')[1] == "king":
-                self.castling_rights[self.turn]["king_side"] = False
-                self.castling_rights[self.turn]["queen_side"] = False
-            elif self.selected_piece.split('_')[1] == "rook":
-                if original_col == 0:  # Queen-side rook
-                    self.castling_rights[self.turn]["queen_side"] = False
-                elif original_col == 7:  # King-side rook
-                    self.castling_rights[self.turn]["king_side"] = False
-
-            # Check for pawn promotion
-            for move in self.potential_moves:
-                col, row = move
-                piece = self.board[row][col]
-                if piece and piece.split('_')[1] == "pawn":
-                    if (self.turn == PieceColor.WHITE and row == 0) or (self.turn == PieceColor.BLACK and row == 7):
-                        # Determine the suffix of the pawn (full, half, quarter, or eighth)
-                        suffix = ""
-                        if piece.endswith("_half"):
-                            suffix = "_half"
-                        elif piece.endswith("_quarter"):
-                            suffix = "_quarter"
-                        elif piece.endswith("_eighth"):
-                            suffix = "_eighth"
-                        
-                        # Promote the pawn to a queen of the same proportion
-                        self.board[row][col] = f"{self.turn.value}_queen{suffix}"
-
-            # Set en passant target square if a pawn moves two squares forward
-            if self.selected_piece.split('_')[1] == "pawn":
-                start_row = 6 if self.turn == PieceColor.WHITE else 1
-                if abs(self.selected_pos[1] - self.potential_moves[0][1]) == 2:
-                    self.en_passant_target = (self.selected_pos[0], (self.selected_pos[1] + self.potential_moves[0][1]) // 2)
-                else:
-                    self.en_passant_target = None
-            else:
-                self.en_passant_target = None
-
-            # Reset the selected piece, potential moves, and captured pieces
-            self.selected_piece = None
-            self.selected_pos = None
-            self.valid_moves = []
-            self.potential_moves = []
-            self.captured_pieces = {}
-
-            # Check if either player has lost their king
-            white_king_found = False
-            black_king_found = False
-            for row in self.board:
-                for piece in row:
-                    if piece and piece.split('_')[1] == "king":
-                        if piece.startswith("w"):
-                            white_king_found = True
-                        elif piece.startswith("b"):
-                            black_king_found = True
-
-            if not white_king_found:
-                self.game_over = True
-                self.winner = PieceColor.BLACK
-            elif not black_king_found:
-                self.game_over = True
-                self.winner = PieceColor.WHITE
-
-            # Switch turns
-            self.turn = PieceColor.BLACK if self.turn == PieceColor.WHITE else PieceColor.WHITE
+        self.click_square(col, row)
 
     def draw_board(self):
         for row in range(ROWS):
@@ -365,34 +141,72 @@ class ChessBoard:
                 adjusted_col = COLS - 1 - col if self.flipped else col
 
                 color = LIGHT_BROWN if (row + col) % 2 == 0 else DARK_BROWN
-                if (col, row) in self.valid_moves:
+                if square(col, row) in self.valid_targets:
                     color = HIGHLIGHT_COLOR
                 pygame.draw.rect(self.screen, color, (adjusted_col * SQUARE_SIZE, adjusted_row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
 
         # Highlight the original position of the selected piece
-        if self.selected_piece and self.selected_pos:
-            col, row = self.selected_pos
+        if self.selected_piece and self.selected_sq is not None:
+            col, row = self.selected_sq % COLS, self.selected_sq // COLS
             adjusted_col = COLS - 1 - col if self.flipped else col
             adjusted_row = ROWS - 1 - row if self.flipped else row
             pygame.draw.rect(self.screen, (255, 255, 0), (adjusted_col * SQUARE_SIZE, adjusted_row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE), 5)
 
     def draw_pieces(self):
+        images = get_piece_images()
+        squares = self.position.squares
         for row in range(ROWS):
             for col in range(COLS):
-                piece = self.board[row][col]
+                sq = square(col, row)
+                piece = self.ghosts.get(sq, squares[sq])
                 if piece:
                     # Adjust row and column if the board is flipped
                     adjusted_row = ROWS - 1 - row if self.flipped else row
                     adjusted_col = COLS - 1 - col if self.flipped else col
-                    self.screen.blit(piece_images[piece], (adjusted_col * SQUARE_SIZE, adjusted_row * SQUARE_SIZE))
+                    self.screen.blit(images[piece], (adjusted_col * SQUARE_SIZE, adjusted_row * SQUARE_SIZE))
     
+    def square_states(self):
+        # What every screen square shows: (piece, highlighted, selected outline),
+        # indexed in screen order so a flip changes the states it moves
+        squares = self.position.squares
+        valid_moves = set(self.valid_targets)
+        selected = self.selected_sq if self.selected_piece else None
+        states = [None] * (ROWS * COLS)
+        for sq in range(ROWS * COLS):
+            index = ROWS * COLS - 1 - sq if self.flipped else sq
+            states[index] = (self.ghosts.get(sq, squares[sq]), sq in valid_moves, sq == selected)
+        return states
+
+    def draw_square(self, index, state, background):
+        # Redraw one screen square from its state, in the same layers as draw_board and draw_pieces
+        piece, highlighted, selected = state
+        rect = pygame.Rect(index % COLS * SQUARE_SIZE, index // COLS * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+        if highlighted:
+            pygame.draw.rect(self.screen, HIGHLIGHT_COLOR, rect)
+        else:
+            self.screen.blit(background, rect, rect)
+        if selected:
+            pygame.draw.rect(self.screen, (255, 255, 0), rect, 5)
+        if piece:
+            self.screen.blit(get_piece_images()[piece], rect)
+        return rect
+
+    def sidebar_state(self, mouse_pos):
+        # Everything the sidebar depends on, hover of the buttons included
+        pass_hover = self.pass_button().collidepoint(mouse_pos)
+        restart_hover = self.game_over and self.restart_button().collidepoint(mouse_pos)
+        return (self.turn, self.flipped, self.game_over, self.winner, pass_hover, restart_hover)
+
+    def pass_button(self):
+        return pygame.Rect(BOARD_SIZE + 20, HEIGHT // 2 - 25, SIDEBAR_WIDTH - 40, 50)
+
+    def restart_button(self):
+        return pygame.Rect(BOARD_SIZE + 20, HEIGHT // 2 + 50, SIDEBAR_WIDTH - 40, 50)
+
     def draw_sidebar(self):
         # Draw sidebar background
         pygame.draw.rect(self.screen, SIDEBAR_COLOR, (BOARD_SIZE, 0, SIDEBAR_WIDTH, HEIGHT))
 
-        # Set up font
-        font = pygame.font.Font(None, 36)
-
         # Calculate vertical spacing
         sidebar_center_x = BOARD_SIZE + SIDEBAR_WIDTH // 2
         vertical_spacing = HEIGHT // 8
@@ -406,65 +220,258 @@ class ChessBoard:
         bottom_turn = PieceColor.BLACK if self.flipped else PieceColor.WHITE
 
         # Draw the top player label
-        top_text = font.render(top_player, True, HIGHLIGHT_TEXT_COLOR if self.turn == top_turn else TEXT_COLOR)
+        top_text = render_text(top_player, HIGHLIGHT_TEXT_COLOR if self.turn == top_turn else TEXT_COLOR)
         top_rect = top_text.get_rect(center=(sidebar_center_x, vertical_spacing))
         self.screen.blit(top_text, top_rect)
 
         # Draw the bottom player label
-        bottom_text = font.render(bottom_player, True, HIGHLIGHT_TEXT_COLOR if self.turn == bottom_turn else TEXT_COLOR)
+        bottom_text = render_text(bottom_player, HIGHLIGHT_TEXT_COLOR if self.turn == bottom_turn else TEXT_COLOR)
         bottom_rect = bottom_text.get_rect(center=(sidebar_center_x, HEIGHT - vertical_spacing))
         self.screen.blit(bottom_text, bottom_rect)
 
         # Draw pass button
-        pass_button = pygame.Rect(BOARD_SIZE + 20, HEIGHT // 2 - 25, SIDEBAR_WIDTH - 40, 50)
+        pass_button = self.pass_button()
         mouse_pos = pygame.mouse.get_pos()
         button_color = BUTTON_HOVER_COLOR if pass_button.collidepoint(mouse_pos) else BUTTON_COLOR
         pygame.draw.rect(self.screen, button_color, pass_button)
-        pass_text = font.render("Pass", True, TEXT_COLOR)
+        pass_text = render_text("Pass", TEXT_COLOR)
         pass_text_rect = pass_text.get_rect(center=pass_button.center)
         self.screen.blit(pass_text, pass_text_rect)
 
         if self.game_over:
             # Draw winner text
-            winner_text = font.render(f"{self.winner.name} Wins!", True, WIN_TEXT_COLOR)
+            winner_text = render_text(f"{self.winner.name} Wins!" if self.winner else "Draw", WIN_TEXT_COLOR)
             winner_rect = winner_text.get_rect(center=(sidebar_center_x, HEIGHT // 2 - 75))
             self.screen.blit(winner_text, winner_rect)
 
             # Draw restart button
-            restart_button = pygame.Rect(BOARD_SIZE + 20, HEIGHT // 2 + 50, SIDEBAR_WIDTH - 40, 50)
+            restart_button = self.restart_button()
             button_color = BUTTON_HOVER_COLOR if restart_button.collidepoint(mouse_pos) else BUTTON_COLOR
             pygame.draw.rect(self.screen, button_color, restart_button)
-            restart_text = font.render("Restart", True, TEXT_COLOR)
+            restart_text = render_text("Restart", TEXT_COLOR)
             restart_text_rect = restart_text.get_rect(center=restart_button.center)
             self.screen.blit(restart_text, restart_text_rect)
 
+# The drawing methods show up as board.<name> in the instrumentation
+instrument.wrap_methods(ChessBoard, ("draw_board", "draw_pieces", "draw_square", "draw_sidebar"), "board.")
+
+# Redraws only what changed since the previous frame. The empty board is
+# pre-rendered for both orientations; a square is redrawn when its piece, ghost,
+# highlight or selection outline changes and the sidebar when the turn, the
+# result or the hovered button changes.
+class DirtyRenderer:
+    def __init__(self, board):
+        self.board = board
+        self.resize()
+
+    def resize(self):
+        # Rebuild the cached backgrounds after the board size changed
+        self.backgrounds = {flipped: render_board_background(flipped) for flipped in (False, True)}
+        self.sidebar_rect = pygame.Rect(BOARD_SIZE, 0, WIDTH - BOARD_SIZE, HEIGHT)
+        self.invalidate()
+
+    def invalidate(self):
+        # Redraw everything on the next frame (first frame, window exposed)
+        self.states = [None] * (ROWS * COLS)
+        self.sidebar = None
+        self.overlay_rect = None
+        self.full = True
+
+    def render(self, overlay=None):
+        # Draw the changes and return the number of screen areas updated.
+        # overlay(screen) draws on top of the squares and returns its rect; the
+        # squares under it are redrawn on the next frame to show it again or remove it.
+        board = self.board
+        screen = board.screen
+        if self.full:
+            screen.fill(WHITE)
+        if self.overlay_rect is not None:
+            rect = self.overlay_rect
+            for row in range(rect.top // SQUARE_SIZE, (rect.bottom - 1) // SQUARE_SIZE + 1):
+                for col in range(rect.left // SQUARE_SIZE, (rect.right - 1) // SQUARE_SIZE + 1):
+                    self.states[row * COLS + col] = None
+            self.overlay_rect = None
+        background = self.backgrounds[board.flipped]
+        rects = []
+        states = board.square_states()
+        for index, state in enumerate(states):
+            if state != self.states[index]:
+                rects.append(board.draw_square(index, state, background))
+        self.states = states
+
+        sidebar = board.sidebar_state(pygame.mouse.get_pos())
+        if sidebar != self.sidebar:
+            board.draw_sidebar()
+            rects.append(self.sidebar_rect)
+            self.sidebar = sidebar
+
+        if overlay is not None:
+            self.overlay_rect = overlay(screen)
+            rects.append(self.overlay_rect)
+
+        if self.full:
+            pygame.display.flip()
+            self.full = False
+        elif rects:
+            pygame.display.update(rects)
+        return len(rects)
+
+# Average time spent drawing a frame and CPU use of the whole process (the
+# computer player's thread included) since the last reset
+class FrameStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.draw_seconds = 0.0
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+
+    def add(self, seconds):
+        self.frames += 1
+        self.draw_seconds += seconds
+
+    def report(self):
+        wall = max(time.perf_counter() - self.wall_start, 1e-9)
+        cpu = time.process_time() - self.cpu_start
+        average = self.draw_seconds / self.frames * 1000 if self.frames else 0.0
+        return f"{self.frames} frames ({self.frames / wall:.1f}/s), average frame {average:.2f} ms, CPU {cpu / wall:.0%}"
+
 # Main loop
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split Chess")
+    parser.add_argument("--ai", choices=("white", "black"), help="let the computer play this color")
+    parser.add_argument("--ai-time", type=float, default=2.0, help="seconds the computer may think per move")
+    parser.add_argument("--tablebase", metavar="DIR", help="let the computer probe the endgame tables in DIR")
+    parser.add_argument("--render", choices=("dirty", "full"), default="dirty",
+                        help="redraw only what changed and sleep while idle, or redraw everything 60 times a second")
+    parser.add_argument("--stats", action="store_true", help="print average frame time and CPU use every few seconds")
+    parser.add_argument("--size", type=int, default=BOARD_SIZE, help="board size in pixels; the window can also be resized")
+    parser.add_argument("--instrument", metavar="FILE",
+                        help="time move generation, commits, drawing and events and write the histograms to FILE as JSON on exit")
+    args = parser.parse_args(argv)
+    if args.instrument:
+        instrument.enable()
+
     pygame.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    set_board_size(args.size)
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
     pygame.display.set_caption("Chess")
     clock = pygame.time.Clock()
     chess_board = ChessBoard(screen)
 
+    # The computer player searches on a background thread while the loop keeps drawing
+    tablebase = Tablebase(args.tablebase) if args.tablebase else None
+    ai = AIPlayer(COLOR_INDEXES[args.ai], args.ai_time, tablebase=tablebase) if args.ai else None
+    ai_position = None
+
+    get_piece_images()  # Load the sprites before the first frame
+    renderer = DirtyRenderer(chess_board) if args.render == "dirty" else None
+    pending_size = None  # Board size to switch to once the window stops changing
+    resize_at = 0.0
+    stats = FrameStats()
+    last_report = time.perf_counter()
+    show_overlay = False  # Toggled with the I key, which also turns the instrumentation on
+    events_at = None  # perf_counter_ns() when the events of the frame being drawn were picked up
+
     running = True
     while running:
-        screen.fill(WHITE)
-        chess_board.draw_board()
-        chess_board.draw_pieces()
-        chess_board.draw_sidebar()
-        pygame.display.flip()
-
-        for event in pygame.event.get():
+        frame_start = time.perf_counter()
+        overlay = draw_overlay if show_overlay else None
+        if renderer is not None:
+            if renderer.render(overlay):
+                stats.add(time.perf_counter() - frame_start)
+        else:
+            screen.fill(WHITE)
+            chess_board.draw_board()
+            chess_board.draw_pieces()
+            chess_board.draw_sidebar()
+            if overlay is not None:
+                overlay(screen)
+            pygame.display.flip()
+            stats.add(time.perf_counter() - frame_start)
+        if events_at is not None:
+            instrument.record("event.frame", time.perf_counter_ns() - events_at)
+        if args.stats and time.perf_counter() - last_report >= STATS_INTERVAL:
+            print(stats.report())
+            print(chess_board.move_cache.report())
+            stats.reset()
+            last_report = time.perf_counter()
+
+        ai_turn = ai is not None and not chess_board.game_over and chess_board.position.turn == ai.color
+        if renderer is None:
+            events = pygame.event.get()
+        elif pending_size is not None:
+            events = [pygame.event.wait(RESIZE_SETTLE_MS)] + pygame.event.get()
+        elif show_overlay:
+            events = [pygame.event.wait(OVERLAY_REFRESH_MS)] + pygame.event.get()
+        elif ai_turn:
+            # Wake up now and then to pick up the computer's move
+            events = [pygame.event.wait(AI_POLL_MS)] + pygame.event.get()
+        else:
+            # Nothing can change until the player does something
+            events = [pygame.event.wait()] + pygame.event.get()
+        events_at = None
+        if instrument.enabled and any(event.type != pygame.NOEVENT for event in events):
+            events_at = time.perf_counter_ns()
+        for event in events:
+            handled_at = time.perf_counter_ns() if events_at is not None else None
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.VIDEOEXPOSE:
+                if renderer is not None:
+                    renderer.invalidate()
+            elif event.type == pygame.VIDEORESIZE:
+                # Wait for the drag to pause so only the final size gets an atlas
+                pending_size = board_size_for_window(event.w, event.h)
+                resize_at = time.perf_counter() + RESIZE_SETTLE_MS / 1000
             elif event.type == pygame.MOUSEBUTTONDOWN:
-                chess_board.handle_click(pygame.mouse.get_pos())
+                pos = pygame.mouse.get_pos()
+                if not (ai_turn and pos[0] < BOARD_SIZE):  # The board belongs to the computer while it is thinking
+                    chess_board.handle_click(pos)
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_f:  # Toggle board flip on 'F' key press
                     chess_board.flipped = not chess_board.flipped
-
-        clock.tick(60)
-
+                elif event.key == pygame.K_i:  # Toggle the instrumentation overlay on 'I' key press
+                    instrument.enable()
+                    show_overlay = not show_overlay
+            if handled_at is not None and event.type != pygame.NOEVENT:
+                instrument.record("event." + pygame.event.event_name(event.type), time.perf_counter_ns() - handled_at)
+
+        if pending_size is not None and time.perf_counter() >= resize_at:
+            set_board_size(pending_size)
+            pending_size = None
+            get_piece_images()
+            chess_board.screen = screen = pygame.display.get_surface()
+            if renderer is not None:
+                renderer.resize()
+
+        if ai is not None:
+            ai_turn = not chess_board.game_over and chess_board.position.turn == ai.color
+            if ai.thinking and (not ai_turn or chess_board.position is not ai_position):
+                ai.cancel()  # The game was restarted or finished while the computer was thinking
+            if ai_turn:
+                if not ai.thinking:
+                    ai_position = chess_board.position
+                    ai.start(ai_position)
+                else:
+                    result = ai.poll()
+                    if result is not None and result.move is None:
+                        chess_board.game_over = True  # No legal move: a draw, as the search and selfplay score it
+                    elif result is not None:
+                        chess_board.play_move(result.move)
+
+        if renderer is None:
+            clock.tick(60)
+
+    if args.stats:
+        print(stats.report())
+        print(chess_board.move_cache.report())
+    if args.instrument:
+        instrument.dump(args.instrument)
+    if ai is not None:
+        ai.cancel()
     pygame.quit()
 
 if __name__ == "__main__":
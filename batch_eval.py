@@ -0,0 +1,183 @@
+# Vectorized evaluation of many Split Chess positions at once (needs numpy).
+#
+# Positions come in as an N x 64 int8 array of the packed piece codes of
+# split_position (square n = y * 8 + x, 0 for empty), e.g. built with
+# positions_to_arrays from Position or ChessBoard objects. evaluate_batch
+# returns, per position and from White's point of view:
+#
+#   material         fraction weighted material without kings (a half knight counts 160)
+#   positional       piece-square terms, also fraction weighted
+#   score            material + positional, the same number as split_ai.evaluate
+#                    for White to move (to_move gives the side to move's view
+#                    when turns are passed)
+#   white_king       whether each side still has its king; game_over and
+#   black_king       winner (WHITE, BLACK or -1) follow from them like Position.winner
+#   white_promotion  pawns one push from promotion with the square ahead empty
+#   black_promotion
+#
+# python batch_eval.py benchmarks it against a per-position Python loop over
+# the same positions.
+import argparse
+import random
+import time
+
+import numpy as np
+
+from split_ai import PIECE_SQUARE_SCORES, PIECE_WEIGHTS, evaluate
+from split_position import (BLACK, BLACK_KING, COLOR_SHIFT, COLS, KING, PAWN, PAWN_PROMOTION_ROW, PAWN_STEP, TYPE_MASK,
+                            WHITE, WHITE_KING, Position)
+
+CHUNK = 1 << 16  # Positions per vectorized pass, bounds the temporary arrays
+
+SQUARES = np.arange(64, dtype=np.int32)
+
+# Lookup tables indexed by piece code
+SQUARE_SCORES = np.array(PIECE_SQUARE_SCORES, dtype=np.int32).ravel()  # code * 64 + sq
+MATERIAL_VALUES = [0] * 64  # Signed, kings count 0
+IS_PAWN = (np.zeros(64, dtype=bool), np.zeros(64, dtype=bool))  # Per color
+for _code in range(64):
+    if _code and PIECE_WEIGHTS[_code]:
+        _color, _kind = _code >> COLOR_SHIFT, _code & TYPE_MASK
+        if _kind != KING:
+            MATERIAL_VALUES[_code] = PIECE_WEIGHTS[_code] if _color == WHITE else -PIECE_WEIGHTS[_code]
+        IS_PAWN[_color][_code] = _kind == PAWN
+MATERIAL = np.array(MATERIAL_VALUES, dtype=np.int32)
+
+
+def _promotion_rows(color):
+    # Squares of the row before promotion and of the promotion row itself
+    promotion_row = PAWN_PROMOTION_ROW[color]
+    before = promotion_row * COLS - PAWN_STEP[color]
+    return slice(before, before + COLS), slice(promotion_row * COLS, promotion_row * COLS + COLS)
+
+
+PROMOTION_ROWS = (_promotion_rows(WHITE), _promotion_rows(BLACK))
+
+
+def positions_to_arrays(items):
+    # (N x 64 int8 codes, N int8 side to move) from Positions or ChessBoards;
+    # a ChessBoard contributes its committed position, ghosts are ignored
+    positions = [getattr(item, "position", item) for item in items]
+    codes = np.frombuffer(b"".join(bytes(position.squares) for position in positions), dtype=np.int8)
+    turns = np.fromiter((position.turn for position in positions), dtype=np.int8, count=len(positions))
+    return codes.reshape(len(positions), 64), turns
+
+
+def evaluate_batch(codes, turns=None):
+    # Evaluate every row of codes, see the top of the file for the results
+    codes = np.asarray(codes, dtype=np.int8).reshape(-1, 64)
+    count = len(codes)
+    results = {
+        "material": np.empty(count, dtype=np.int32),
+        "score": np.empty(count, dtype=np.int32),
+        "white_king": np.empty(count, dtype=bool),
+        "black_king": np.empty(count, dtype=bool),
+        "white_promotion": np.empty(count, dtype=np.int8),
+        "black_promotion": np.empty(count, dtype=np.int8),
+    }
+    for start in range(0, count, CHUNK):
+        chunk = codes[start:start + CHUNK].astype(np.int32)
+        rows = slice(start, start + len(chunk))
+        results["material"][rows] = MATERIAL[chunk].sum(axis=1)
+        results["score"][rows] = SQUARE_SCORES[chunk * 64 + SQUARES].sum(axis=1)
+        results["white_king"][rows] = (chunk == WHITE_KING).any(axis=1)
+        results["black_king"][rows] = (chunk == BLACK_KING).any(axis=1)
+        for color, name in ((WHITE, "white_promotion"), (BLACK, "black_promotion")):
+            before, promotion = PROMOTION_ROWS[color]
+            ready = IS_PAWN[color][chunk[:, before]] & (chunk[:, promotion] == 0)
+            results[name][rows] = ready.sum(axis=1)
+
+    results["positional"] = results["score"] - results["material"]
+    results["game_over"] = ~(results["white_king"] & results["black_king"])
+    results["winner"] = np.where(~results["white_king"], BLACK, np.where(~results["black_king"], WHITE, -1)).astype(np.int8)
+    if turns is not None:
+        results["to_move"] = np.where(np.asarray(turns) == WHITE, results["score"], -results["score"])
+    return results
+
+
+def evaluate_one(position):
+    # The same results for a single position with plain Python, for checks and the benchmark
+    squares = position.squares
+    values = MATERIAL_VALUES
+    score = 0
+    material = 0
+    for sq, piece in enumerate(squares):
+        if piece:
+            score += PIECE_SQUARE_SCORES[piece][sq]
+            material += values[piece]
+    winner = position.winner()
+    results = {
+        "material": material,
+        "positional": score - material,
+        "score": score,
+        "white_king": WHITE_KING in squares,
+        "black_king": BLACK_KING in squares,
+        "game_over": winner is not None,
+        "winner": -1 if winner is None else winner,
+        "to_move": evaluate(position),
+    }
+    for color, name in ((WHITE, "white_promotion"), (BLACK, "black_promotion")):
+        ready = 0
+        for sq in range(PROMOTION_ROWS[color][0].start, PROMOTION_ROWS[color][0].stop):
+            piece = squares[sq]
+            if piece and piece >> COLOR_SHIFT == color and piece & TYPE_MASK == PAWN and not squares[sq + PAWN_STEP[color]]:
+                ready += 1
+        results[name] = ready
+    return results
+
+
+def random_positions(count, seed=1, max_plies=120):
+    # Positions from random games, a few taken from each game
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        position = Position.initial()
+        for ply in range(rng.randrange(max_plies)):
+            moves = position.generate_moves()
+            if not moves:
+                break
+            position.make_move(rng.choice(moves))
+            if ply % 10 == 9:
+                positions.append(position.copy())
+        positions.append(position.copy())
+    return positions[:count]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized evaluator against a Python loop")
+    parser.add_argument("--positions", type=int, default=20000, help="number of distinct positions generated")
+    parser.add_argument("--repeat", type=int, default=50, help="times the positions are tiled for the batch run")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    positions = random_positions(args.positions, args.seed)
+    codes, turns = positions_to_arrays(positions)
+
+    start = time.perf_counter()
+    expected = [evaluate_one(position) for position in positions]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = evaluate_batch(codes, turns)
+    batch_seconds = time.perf_counter() - start
+
+    for index, one in enumerate(expected):
+        for name, value in one.items():
+            if results[name][index] != value:
+                raise AssertionError(f"{name} differs for {positions[index]!r}: {results[name][index]} != {value}")
+
+    big_codes, big_turns = np.tile(codes, (args.repeat, 1)), np.tile(turns, args.repeat)
+    start = time.perf_counter()
+    evaluate_batch(big_codes, big_turns)
+    big_seconds = time.perf_counter() - start
+
+    loop_rate = len(positions) / loop_seconds
+    batch_rate = len(big_codes) / big_seconds
+    print(f"python loop  {len(positions):>9} positions  {loop_seconds:7.3f}s  {loop_rate:12.0f} positions/s")
+    print(f"numpy batch  {len(positions):>9} positions  {batch_seconds:7.3f}s  {len(positions) / batch_seconds:12.0f} positions/s")
+    print(f"numpy batch  {len(big_codes):>9} positions  {big_seconds:7.3f}s  {batch_rate:12.0f} positions/s")
+    print(f"speedup {batch_rate / loop_rate:.0f}x, results identical on the first {len(positions)} positions")
+
+
+if __name__ == "__main__":
+    main()
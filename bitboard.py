@@ -0,0 +1,241 @@
+# Bitboard move generator for Split Chess.
+#
+# BitboardPosition is a Position that also keeps one 64-bit bitboard per piece
+# code (color, type and fraction) plus one occupancy bitboard per color. Bit n
+# stands for square n of the flat board (y * 8 + x). Knight, king and pawn
+# attacks come from precomputed tables and sliding pieces use precomputed ray
+# masks cut at the first blocker. The rules are exactly those of
+# Position.piece_moves, and targets are listed in its order too, so both
+# generators give the same Move objects (split targets included) in the
+# same order.
+import split_position
+from split_position import (BISHOP, BLACK, BLACK_KING, COLOR_SHIFT, COLS, DIAGONALS, KING, KING_SIDE, KING_TARGETS,
+                            KNIGHT, KNIGHT_DELTAS, KNIGHT_TARGETS, ORTHOGONALS, PAWN, PAWN_CAPTURES, PAWN_START_ROW,
+                            PAWN_STEP, QUEEN, QUEEN_SIDE, ROOK, ROWS, TYPE_MASK, WHITE, WHITE_KING, Position, square)
+
+
+def _on_board(x, y):
+    return 0 <= x < COLS and 0 <= y < ROWS
+
+
+def _step_attacks(deltas):
+    table = []
+    for sq in range(64):
+        x, y = sq % COLS, sq // COLS
+        bits = 0
+        for dx, dy in deltas:
+            if _on_board(x + dx, y + dy):
+                bits |= 1 << square(x + dx, y + dy)
+        table.append(bits)
+    return tuple(table)
+
+
+def _ray_masks(dx, dy):
+    table = []
+    for sq in range(64):
+        x, y = sq % COLS, sq // COLS
+        bits = 0
+        nx, ny = x + dx, y + dy
+        while _on_board(nx, ny):
+            bits |= 1 << square(nx, ny)
+            nx += dx
+            ny += dy
+        table.append(bits)
+    return tuple(table)
+
+
+KNIGHT_ATTACKS = _step_attacks(KNIGHT_DELTAS)
+KING_ATTACKS = _step_attacks(DIAGONALS + ORTHOGONALS)
+PAWN_ATTACKS = (_step_attacks(((-1, -1), (1, -1))), _step_attacks(((-1, 1), (1, 1))))
+
+# For every square, the ray masks of each direction paired with whether the
+# direction runs towards higher square numbers (nearest blocker = lowest bit)
+# and the mask table used to cut the ray behind that blocker.
+RAYS = {}
+for _dx, _dy in DIAGONALS + ORTHOGONALS:
+    RAYS[(_dx, _dy)] = _ray_masks(_dx, _dy)
+
+
+def _slider_rays(directions):
+    return tuple(tuple((RAYS[d][sq], d[1] * COLS + d[0] > 0, RAYS[d]) for d in directions) for sq in range(64))
+
+
+SLIDER_RAYS = {
+    BISHOP: _slider_rays(DIAGONALS),
+    ROOK: _slider_rays(ORTHOGONALS),
+}
+
+# Magic-style lookup: the attacks of a slider only depend on the occupancy of
+# its relevant squares (its rays without the last square of each), so they are
+# cached per square keyed by that masked occupancy. A dict does the job of the
+# magic multiplication; entries are filled the first time they are needed.
+def _without_last_square(ray, positive):
+    if not ray:
+        return 0
+    last = 1 << (ray.bit_length() - 1) if positive else ray & -ray
+    return ray ^ last
+
+
+EDGE_FREE = {}
+for _dx, _dy in DIAGONALS + ORTHOGONALS:
+    EDGE_FREE[(_dx, _dy)] = tuple(_without_last_square(ray, _dy * COLS + _dx > 0) for ray in RAYS[(_dx, _dy)])
+RELEVANT_MASKS = {
+    BISHOP: tuple(sum(EDGE_FREE[d][sq] for d in DIAGONALS) for sq in range(64)),
+    ROOK: tuple(sum(EDGE_FREE[d][sq] for d in ORTHOGONALS) for sq in range(64)),
+}
+ATTACK_TABLES = {BISHOP: tuple({} for _ in range(64)), ROOK: tuple({} for _ in range(64))}
+
+
+def slider_attacks(rays, occupied):
+    attacks = 0
+    for ray, positive, table in rays:
+        blockers = ray & occupied
+        if blockers:
+            if positive:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= table[blocker]
+        attacks |= ray
+    return attacks
+
+
+def lookup_attacks(kind, sq, occupied):
+    key = occupied & RELEVANT_MASKS[kind][sq]
+    table = ATTACK_TABLES[kind][sq]
+    attacks = table.get(key)
+    if attacks is None:
+        attacks = table[key] = slider_attacks(SLIDER_RAYS[kind][sq], key)
+    return attacks
+
+
+def _target_order(color, kind, sq):
+    # Every square the piece may reach from sq, in the order of Position.piece_moves
+    if kind == PAWN:
+        step = PAWN_STEP[color]
+        return tuple(target for target in (sq + step, sq + 2 * step) if 0 <= target < 64) + PAWN_CAPTURES[color][sq]
+    if kind == KNIGHT:
+        return KNIGHT_TARGETS[sq]
+    if kind == KING:
+        x = sq % COLS
+        return KING_TARGETS[sq] + ((sq + 2,) if x + 2 < COLS else ()) + ((sq - 2,) if x - 3 >= 0 else ())
+    return sum(split_position.SLIDER_RAYS[kind][sq], ())
+
+
+# TARGET_ORDER[color][kind][sq]
+TARGET_ORDER = tuple(tuple(tuple(_target_order(color, kind, sq) for sq in range(64)) if kind else ()
+                           for kind in range(KING + 1)) for color in (WHITE, BLACK))
+
+
+def bit_squares(bits):
+    # Square numbers of the set bits, lowest first
+    squares = []
+    while bits:
+        low = bits & -bits
+        squares.append(low.bit_length() - 1)
+        bits ^= low
+    return squares
+
+
+class BitboardPosition(Position):
+    __slots__ = ("layers", "occupied")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rebuild()
+
+    @classmethod
+    def from_position(cls, position):
+        return cls(position.squares, position.turn, position.castling, position.en_passant)
+
+    def rebuild(self):
+        # Recompute every bitboard from the squares
+        self.layers = [0] * 64
+        self.occupied = [0, 0]
+        for sq, piece in enumerate(self.squares):
+            if piece:
+                self.layers[piece] |= 1 << sq
+                self.occupied[piece >> COLOR_SHIFT] |= 1 << sq
+
+    def _update(self, previous):
+        # Move the bits of every square whose piece differs from previous[sq]
+        squares = self.squares
+        layers = self.layers
+        occupied = self.occupied
+        for sq, old in previous.items():
+            new = squares[sq]
+            if old != new:
+                bit = 1 << sq
+                if old:
+                    layers[old] ^= bit
+                    occupied[old >> COLOR_SHIFT] ^= bit
+                if new:
+                    layers[new] ^= bit
+                    occupied[new >> COLOR_SHIFT] ^= bit
+
+    def make_move(self, move):
+        super().make_move(move)
+        previous = {}
+        for sq, old in self.history[-1][0]:
+            previous.setdefault(sq, old)
+        self._update(previous)
+
+    def unmake_move(self):
+        squares = self.squares
+        previous = {sq: squares[sq] for sq, _ in self.history[-1][0]}
+        super().unmake_move()
+        self._update(previous)
+
+    def piece_targets(self, sq):
+        # Bitboard of the valid targets of the piece on sq
+        piece = self.squares[sq]
+        kind = piece & TYPE_MASK
+        color = piece >> COLOR_SHIFT
+        own = self.occupied[color]
+        everything = own | self.occupied[color ^ 1]
+        if kind == PAWN:
+            targets = 0
+            step = PAWN_STEP[color]
+            forward = sq + step
+            if 0 <= forward < 64 and not everything >> forward & 1:
+                targets |= 1 << forward
+                if sq // COLS == PAWN_START_ROW[color] and not everything >> (forward + step) & 1:
+                    targets |= 1 << (forward + step)
+            captures = self.occupied[color ^ 1]
+            if self.en_passant >= 0:
+                captures |= 1 << self.en_passant
+            return targets | PAWN_ATTACKS[color][sq] & captures
+        if kind == KNIGHT:
+            return KNIGHT_ATTACKS[sq] & ~own
+        if kind == KING:
+            targets = KING_ATTACKS[sq] & ~own
+            x = sq % COLS
+            if self.castling & KING_SIDE[color] and x + 2 < COLS and not everything & (6 << sq):
+                targets |= 1 << (sq + 2)
+            if self.castling & QUEEN_SIDE[color] and x - 3 >= 0 and not everything & (7 << (sq - 3)):
+                targets |= 1 << (sq - 2)
+            return targets
+        if kind == QUEEN:
+            return (lookup_attacks(ROOK, sq, everything) | lookup_attacks(BISHOP, sq, everything)) & ~own
+        return lookup_attacks(kind, sq, everything) & ~own
+
+    def piece_moves(self, sq):
+        piece = self.squares[sq]
+        targets = self.piece_targets(sq)
+        return [target for target in TARGET_ORDER[piece >> COLOR_SHIFT][piece & TYPE_MASK][sq] if targets >> target & 1]
+
+    def generate_moves(self):
+        if self.winner() is not None:
+            return []
+        squares = self.squares
+        moves = []
+        for src in bit_squares(self.occupied[self.turn]):
+            self.add_piece_moves(moves, src, squares[src], self.piece_moves(src))
+        return moves
+
+    def winner(self):
+        if not self.layers[WHITE_KING]:
+            return BLACK
+        if not self.layers[BLACK_KING]:
+            return WHITE
+        return None
@@ -0,0 +1,285 @@
+# Compact binary game records for Split Chess.
+#
+# A record file starts with MAGIC and a version byte, followed by the games
+# back to back:
+#
+#   header  7 bytes (<IBH): number of plies, result, length of the start FEN
+#   FEN     utf-8, only for games that do not start from the initial position
+#   moves   3 bytes per ply: Move.code, little endian (source, first target and
+#           second target + 1, which is all a split move needs; the piece,
+#           fraction, captures and flags follow from the position)
+#
+# Games are read and written as streams, so files of millions of games never
+# have to fit in memory. Next to the record file, path + ".idx" holds the
+# file offset of every game as a little endian u64. GameArchive memory-maps
+# it for random access to game N, and rebuilds it when it is missing or does
+# not match the record file.
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from split_position import Position
+from split_rules import ChessBoard
+
+MAGIC = b"SPGR"
+VERSION = 1
+FILE_HEADER = MAGIC + bytes([VERSION])
+GAME_HEADER = struct.Struct("<IBH")
+MOVE_BYTES = 3
+INDEX_SUFFIX = ".idx"
+OFFSET = struct.Struct("<Q")
+
+RESULTS = ("*", "1-0", "0-1", "1/2-1/2")
+
+
+class GameRecord:
+    # One game: the Move.code of every ply, the result ("1-0", "0-1",
+    # "1/2-1/2" or "*") and the start FEN (None for the initial position)
+    __slots__ = ("moves", "result", "fen")
+
+    def __init__(self, moves, result="*", fen=None):
+        self.moves = [move if isinstance(move, int) else move.code for move in moves]
+        self.result = result
+        self.fen = fen
+
+    def __repr__(self):
+        return f"GameRecord({len(self.moves)} plies, {self.result!r})"
+
+    def start_position(self):
+        return Position.from_fen(self.fen) if self.fen else Position.initial()
+
+    def board(self, ply=None):
+        # Headless ChessBoard after the first ply moves (the whole game by default)
+        board = ChessBoard()
+        if self.fen:
+            board.position = board.position_class.from_fen(self.fen)
+        for code in self.moves[:ply]:
+            board.play_move(board.position.move_from_code(code))
+        return board
+
+    def notation(self):
+        # Move.notation of every ply
+        position = self.start_position()
+        moves = []
+        for code in self.moves:
+            move = position.move_from_code(code)
+            moves.append(move.notation)
+            position.make_move(move)
+        return moves
+
+
+def encode_game(game):
+    fen = game.fen.encode() if game.fen else b""
+    moves = bytearray(len(game.moves) * MOVE_BYTES)
+    for index, code in enumerate(game.moves):
+        offset = index * MOVE_BYTES
+        moves[offset] = code & 255
+        moves[offset + 1] = code >> 8 & 255
+        moves[offset + 2] = code >> 16
+    return GAME_HEADER.pack(len(game.moves), RESULTS.index(game.result), len(fen)) + fen + moves
+
+
+def read_game(stream):
+    # The next game of an open record file, or None at the end of it
+    header = stream.read(GAME_HEADER.size)
+    if not header:
+        return None
+    if len(header) < GAME_HEADER.size:
+        raise ValueError("Truncated game record")
+    plies, result, fen_length = GAME_HEADER.unpack(header)
+    fen = stream.read(fen_length).decode() if fen_length else None
+    data = stream.read(plies * MOVE_BYTES)
+    if len(data) < plies * MOVE_BYTES:
+        raise ValueError("Truncated game record")
+    moves = [data[i] | data[i + 1] << 8 | data[i + 2] << 16 for i in range(0, len(data), MOVE_BYTES)]
+    return GameRecord(moves, RESULTS[result], fen)
+
+
+def check_header(stream, path):
+    if stream.read(len(FILE_HEADER)) != FILE_HEADER:
+        raise ValueError(f"{path} is not a Split Chess game record file (version {VERSION})")
+
+
+def read_games(path):
+    # Yield every game of a record file in order
+    with open(path, "rb") as stream:
+        check_header(stream, path)
+        while True:
+            game = read_game(stream)
+            if game is None:
+                return
+            yield game
+
+
+def scan_offsets(path):
+    # Yield the offset of every game by hopping from header to header
+    with open(path, "rb") as stream:
+        check_header(stream, path)
+        offset = len(FILE_HEADER)
+        while True:
+            header = stream.read(GAME_HEADER.size)
+            if len(header) < GAME_HEADER.size:
+                return
+            yield offset
+            plies, _, fen_length = GAME_HEADER.unpack(header)
+            offset += GAME_HEADER.size + fen_length + plies * MOVE_BYTES
+            stream.seek(offset)
+
+
+def build_index(path):
+    # (Re)write the offset index of a record file and return its number of games
+    offsets = array("Q", scan_offsets(path))
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    with open(path + INDEX_SUFFIX, "wb") as index:
+        offsets.tofile(index)
+    return len(offsets)
+
+
+def index_is_current(path):
+    # True when the index exists and its last entry ends exactly at the end of the record file
+    index_path = path + INDEX_SUFFIX
+    if not os.path.exists(index_path):
+        return False
+    index_size = os.path.getsize(index_path)
+    data_size = os.path.getsize(path)
+    if index_size % OFFSET.size:
+        return False
+    if not index_size:
+        return data_size == len(FILE_HEADER)
+    with open(index_path, "rb") as index:
+        index.seek(index_size - OFFSET.size)
+        last = OFFSET.unpack(index.read(OFFSET.size))[0]
+    with open(path, "rb") as stream:
+        stream.seek(last)
+        header = stream.read(GAME_HEADER.size)
+    if len(header) < GAME_HEADER.size:
+        return False
+    plies, _, fen_length = GAME_HEADER.unpack(header)
+    return last + GAME_HEADER.size + fen_length + plies * MOVE_BYTES == data_size
+
+
+class GameWriter:
+    # Appends games to a record file and its index, creating both when missing
+    def __init__(self, path):
+        self.path = path
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new and not index_is_current(path):
+            build_index(path)
+        self.data = open(path, "ab")
+        if new:
+            self.data.write(FILE_HEADER)
+        self.index = open(path + INDEX_SUFFIX, "wb" if new else "ab")
+        self.written = 0
+
+    def write(self, game):
+        self.index.write(OFFSET.pack(self.data.tell()))
+        self.data.write(encode_game(game))
+        self.written += 1
+
+    def close(self):
+        # The record file is flushed before the index so the index never points past it
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_games(path, games):
+    # Append every game of an iterable (e.g. a generator) and return how many were written
+    with GameWriter(path) as writer:
+        for game in games:
+            writer.write(game)
+    return writer.written
+
+
+class GameArchive:
+    # Random access to the games of a record file: archive[n] reads game n,
+    # archive.replay(n, ply) gives the headless board after ply moves of it
+    def __init__(self, path):
+        self.path = path
+        if not index_is_current(path):
+            build_index(path)
+        self.data = open(path, "rb")
+        check_header(self.data, path)
+        self.index = open(path + INDEX_SUFFIX, "rb")
+        size = os.fstat(self.index.fileno()).st_size
+        self.offsets = mmap.mmap(self.index.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.count = size // OFFSET.size
+
+    def __len__(self):
+        return self.count
+
+    def offset(self, number):
+        return OFFSET.unpack_from(self.offsets, number * OFFSET.size)[0]
+
+    def __getitem__(self, number):
+        if number < 0:
+            number += self.count
+        if not 0 <= number < self.count:
+            raise IndexError(f"Game {number} out of range, the archive has {self.count} games")
+        self.data.seek(self.offset(number))
+        return read_game(self.data)
+
+    def replay(self, number, ply=None):
+        return self[number].board(ply)
+
+    def close(self):
+        if isinstance(self.offsets, mmap.mmap):
+            self.offsets.close()
+        self.index.close()
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def games_from_selfplay(path):
+    # Yield the games of a selfplay.py results file, ordered as they were finished
+    with open(path) as results:
+        for line in results:
+            if line.strip():
+                game = json.loads(line)
+                yield GameRecord(game["moves"], game["result"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert and inspect Split Chess game record files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser("convert", help="append the games of a selfplay.py results file to a record file")
+    convert.add_argument("results")
+    convert.add_argument("records")
+    show = commands.add_parser("show", help="print one game and the position after a given ply")
+    show.add_argument("records")
+    show.add_argument("game", type=int)
+    show.add_argument("--ply", type=int, help="ply to replay to (default: the whole game)")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        written = write_games(args.records, games_from_selfplay(args.results))
+        print(f"{written} games appended to {args.records}")
+        return
+
+    with GameArchive(args.records) as archive:
+        game = archive[args.game]
+        moves = game.notation()
+        for ply in range(0, len(moves), 2):
+            print(f"{ply // 2 + 1:>3}. {' '.join(f'{move:<16}' for move in moves[ply:ply + 2])}")
+        print(game.result)
+        board = game.board(args.ply)
+        print(f"after {len(game.moves) if args.ply is None else args.ply} plies: {board.position.to_fen()}")
+
+
+if __name__ == "__main__":
+    main()
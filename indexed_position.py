@@ -0,0 +1,127 @@
+# Position with incremental piece indexes.
+#
+# IndexedPosition keeps next to the squares:
+#
+#   pieces          one dict per color, square -> piece code (so the fraction comes along)
+#   kings           one set per color with the square(s) of its king
+#   material        per color, the material of each piece type in eighths of a
+#                   piece (a half knight adds 4 to material[color][KNIGHT])
+#   occupied_count  number of occupied squares
+#
+# A square holds at most one piece (a split puts one smaller piece on each of
+# two squares, ghosts only exist on the ChessBoard), so a per-square occupancy
+# count would be 0 or 1 everywhere and say no more than squares[sq] does; the
+# total over the board is the count kept here.
+#
+# They are updated from the change log that make_move and unmake_move keep,
+# so splitting, capturing, promoting or castling costs the same whatever the
+# size of the board, and winner() and generate_moves() only look at the pieces
+# of one side instead of scanning all squares. Setting IndexedPosition.debug
+# checks the indexes against a full rescan after every move.
+from split_position import BLACK, COLOR_SHIFT, KING, NO_SQUARE, TYPE_MASK, WHITE, Position, piece_fraction
+
+FRACTION_EIGHTHS = (8, 4, 2, 1)
+
+
+class IndexedPosition(Position):
+    __slots__ = ("pieces", "kings", "material", "occupied_count")
+
+    debug = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rebuild()
+
+    @classmethod
+    def from_position(cls, position):
+        return cls(position.squares, position.turn, position.castling, position.en_passant)
+
+    def rebuild(self):
+        # Recompute every index from the squares
+        self.pieces = ({}, {})
+        self.kings = (set(), set())
+        self.material = ([0] * (KING + 1), [0] * (KING + 1))
+        self.occupied_count = 0
+        self._update({sq: 0 for sq in range(64)})
+
+    def _update(self, previous):
+        # Move the index entries of every square whose piece differs from previous[sq]
+        squares = self.squares
+        pieces = self.pieces
+        kings = self.kings
+        material = self.material
+        eighths = FRACTION_EIGHTHS
+        for sq, old in previous.items():
+            new = squares[sq]
+            if old != new:
+                if old:
+                    color, kind = old >> COLOR_SHIFT, old & TYPE_MASK
+                    del pieces[color][sq]
+                    material[color][kind] -= eighths[piece_fraction(old)]
+                    if kind == KING:
+                        kings[color].discard(sq)
+                    self.occupied_count -= 1
+                if new:
+                    color, kind = new >> COLOR_SHIFT, new & TYPE_MASK
+                    pieces[color][sq] = new
+                    material[color][kind] += eighths[piece_fraction(new)]
+                    if kind == KING:
+                        kings[color].add(sq)
+                    self.occupied_count += 1
+
+    def make_move(self, move):
+        super().make_move(move)
+        previous = {}
+        for sq, old in self.history[-1][0]:
+            previous.setdefault(sq, old)
+        self._update(previous)
+        if self.debug:
+            self.check_indexes()
+
+    def unmake_move(self):
+        squares = self.squares
+        previous = {sq: squares[sq] for sq, _ in self.history[-1][0]}
+        super().unmake_move()
+        self._update(previous)
+        if self.debug:
+            self.check_indexes()
+
+    def check_indexes(self):
+        # Compare the incremental indexes with a full rescan of the squares
+        fresh = IndexedPosition(self.squares, self.turn, self.castling, self.en_passant)
+        for name in IndexedPosition.__slots__:
+            if getattr(self, name) != getattr(fresh, name):
+                raise AssertionError(f"{name} out of sync in {self!r}: {getattr(self, name)} != {getattr(fresh, name)}")
+
+    def king_square(self, color):
+        # Square of the king of color, NO_SQUARE once it has been captured
+        kings = self.kings[color]
+        return min(kings) if kings else NO_SQUARE
+
+    def generate_moves(self):
+        # Same moves in the same order as Position.generate_moves, from the piece list
+        if self.winner() is not None:
+            return []
+        moves = []
+        for src, piece in sorted(self.pieces[self.turn].items()):
+            self.add_piece_moves(moves, src, piece, self.piece_moves(src))
+        return moves
+
+    def generate_captures(self):
+        if self.winner() is not None:
+            return []
+        squares = self.squares
+        en_passant = self.en_passant
+        moves = []
+        for src, piece in sorted(self.pieces[self.turn].items()):
+            targets = [target for target in self.piece_moves(src) if squares[target] or target == en_passant]
+            if targets:
+                self.add_piece_moves(moves, src, piece, targets)
+        return moves
+
+    def winner(self):
+        if not self.kings[WHITE]:
+            return BLACK
+        if not self.kings[BLACK]:
+            return WHITE
+        return None
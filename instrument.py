@@ -0,0 +1,195 @@
+# Optional timing instrumentation for Split Chess.
+#
+# Nothing here runs until enable() is called: it swaps timed wrappers in for
+# the methods it measures and disable() puts the originals back, so the game,
+# the server and batch jobs pay nothing while it is off. Timings go into
+# histograms by name:
+#
+#   valid_moves.<piece type>   MoveCache.piece_moves, which ChessBoard.get_valid_moves
+#                              and square selection both go through
+#   commit.<kind>              ChessBoard.commit_move by move kind: quiet or split,
+#                              capture, castle, promotion, en_passant joined by "+"
+#   <prefix><method>           methods registered with wrap_methods (SplitChess.py
+#                              registers its drawing methods as board.draw_*)
+#   event.<type>, event.frame  recorded by SplitChess.main: handling of each event,
+#                              and from picking up events to showing the frame
+#
+# Histograms are log-linear (four buckets per power of two of nanoseconds), so
+# adding a sample is one integer operation and a list increment, and
+# percentiles are accurate to within a bucket. report() summarizes them and
+# dump(path) writes them as JSON.
+import json
+import time
+
+from move_cache import MoveCache
+from split_position import CAPTURE, CASTLE, EN_PASSANT, PROMOTION, SPLIT, TYPE_MASK
+from split_rules import ChessBoard
+
+SUB_BITS = 2  # Buckets per power of two: 1 << SUB_BITS
+BUCKETS = 64 << SUB_BITS
+TYPE_NAMES = ("empty", "pawn", "knight", "bishop", "rook", "queen", "king", "none")
+MOVE_KINDS = ((SPLIT, "split"), (CASTLE, "castle"), (PROMOTION, "promotion"), (EN_PASSANT, "en_passant"),
+              (CAPTURE, "capture"))
+
+enabled = False
+histograms = {}
+originals = {}  # (class, method name) -> the method before it was wrapped
+registered = []  # (class, method names, prefix) wrapped on enable()
+
+
+def bucket_of(ns):
+    shift = ns.bit_length() - SUB_BITS - 1
+    if shift <= 0:
+        return ns
+    return (shift << SUB_BITS) + (ns >> shift)
+
+
+def bucket_bounds(bucket):
+    # Smallest and one past the largest nanosecond value counted in bucket
+    shift = (bucket >> SUB_BITS) - 1
+    if shift <= 0:
+        return bucket, bucket + 1
+    mantissa = bucket - (shift << SUB_BITS)
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, ns):
+        self.counts[bucket_of(ns)] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, share):
+        # Upper bound of the bucket holding the sample at this share, in nanoseconds
+        wanted = share * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= wanted:
+                return min(bucket_bounds(bucket)[1], self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total / 1e6,
+            "mean_us": self.total / self.count / 1e3 if self.count else 0.0,
+            "p50_us": self.percentile(0.5) / 1e3,
+            "p90_us": self.percentile(0.9) / 1e3,
+            "p99_us": self.percentile(0.99) / 1e3,
+            "max_us": self.max / 1e3,
+            "buckets": {bucket_bounds(bucket)[0]: count for bucket, count in enumerate(self.counts) if count},
+        }
+
+
+def record(name, ns):
+    histogram = histograms.get(name)
+    if histogram is None:
+        histogram = histograms[name] = Histogram()
+    histogram.add(ns)
+
+
+def move_kind(flags):
+    names = [name for flag, name in MOVE_KINDS if flags & flag and not (flag == CAPTURE and flags & EN_PASSANT)]
+    return "+".join(names) if names else "quiet"
+
+
+def timed(method, name):
+    # method with every call recorded under name
+    clock = time.perf_counter_ns
+
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            record(name, clock() - start)
+    wrapper.__wrapped__ = method
+    return wrapper
+
+
+def timed_piece_moves(method):
+    clock = time.perf_counter_ns
+    names = [f"valid_moves.{TYPE_NAMES[piece & TYPE_MASK]}" for piece in range(64)]
+
+    def piece_moves(self, position, sq, generate=None):
+        start = clock()
+        targets = method(self, position, sq, generate)
+        record(names[position.squares[sq]], clock() - start)
+        return targets
+    piece_moves.__wrapped__ = method
+    return piece_moves
+
+
+def timed_commit_move(method):
+    clock = time.perf_counter_ns
+
+    def commit_move(self):
+        if not (self.selected_piece and self.potential_targets):
+            return method(self)
+        name = "commit." + move_kind(self.position.create_move(self.selected_sq, self.potential_targets).flags)
+        start = clock()
+        method(self)
+        record(name, clock() - start)
+    commit_move.__wrapped__ = method
+    return commit_move
+
+
+def wrap_methods(cls, names, prefix):
+    # Time these methods of cls as prefix + name whenever instrumentation is on
+    registered.append((cls, names, prefix))
+    if enabled:
+        for name in names:
+            patch(cls, name, timed(cls.__dict__[name], prefix + name))
+
+
+def patch(cls, name, wrapper):
+    originals[cls, name] = cls.__dict__[name]
+    setattr(cls, name, wrapper)
+
+
+def enable():
+    global enabled
+    if enabled:
+        return
+    enabled = True
+    patch(MoveCache, "piece_moves", timed_piece_moves(MoveCache.piece_moves))
+    patch(ChessBoard, "commit_move", timed_commit_move(ChessBoard.commit_move))
+    for cls, names, prefix in registered:
+        for name in names:
+            patch(cls, name, timed(cls.__dict__[name], prefix + name))
+
+
+def disable():
+    # Put the original methods back; the histograms are kept
+    global enabled
+    for (cls, name), method in originals.items():
+        setattr(cls, name, method)
+    originals.clear()
+    enabled = False
+
+
+def reset():
+    histograms.clear()
+
+
+def report(limit=None):
+    # One line per histogram, the most total time first
+    ranked = sorted(histograms.items(), key=lambda item: item[1].total, reverse=True)[:limit]
+    return [f"{name}: {histogram.count} x {histogram.total / histogram.count / 1e3:.1f} us, "
+            f"p99 {histogram.percentile(0.99) / 1e3:.1f} us" for name, histogram in ranked]
+
+
+def dump(path):
+    with open(path, "w") as output:
+        json.dump({name: histogram.summary() for name, histogram in sorted(histograms.items())}, output, indent=1)
@@ -0,0 +1,209 @@
+# Load test for split_server.py.
+#
+# Plays random games against a Split Chess server with scripted clients, two
+# per game, all running in this one asyncio loop. Each player keeps its own
+# Position up to date from the server's M events, thinks for a random time
+# and then plays a random move, either as one M command or (CLICK_SHARE of
+# the time) as S clicks followed by P, like the pygame front end does. After
+# a game ends White asks for a restart. It reports the latency of every
+# command (sent to answered), throughput, and the server's CPU time from its
+# I command, from which follows how many games at this pace one core hosts.
+#
+#   python load_test.py --spawn --games 2000 --duration 30
+import argparse
+import asyncio
+import random
+import re
+import subprocess
+import sys
+import time
+
+from split_position import EIGHTH, KING, WHITE, Position, parse_square, piece_color, piece_fraction, piece_type, square_name
+from split_server import raise_file_limit
+
+CLICK_SHARE = 0.25  # Moves played through S and P instead of M
+MAX_PLIES = 200  # The player to move resigns after this many plies
+SQUARE_PATTERN = re.compile(r"[a-h][1-8]")
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.moves = 0
+        self.games = 0
+        self.errors = []
+
+
+class Player:
+    def __init__(self, game, stats, rng, think):
+        self.game = game
+        self.stats = stats
+        self.rng = rng
+        self.think = think
+        self.position = None
+        self.color = None
+        self.plies = 0
+        self.over = False
+        self.commands = []  # Rest of a click sequence
+        self.sent = None  # perf_counter() of the command waiting for its answer
+
+    async def run(self, host, port):
+        reader, self.writer = await asyncio.open_connection(host, port)
+        try:
+            self.writer.write(f"J {self.game}\n".encode())
+            _, letter, fen = (await reader.readline()).decode().split(" ", 2)
+            self.color = "wb".index(letter)
+            self.position = Position.from_fen(fen)
+            while True:
+                if self.sent is None and not self.over and self.position.turn == self.color:
+                    await asyncio.sleep(self.rng.uniform(0, 2 * self.think))
+                    self.play()
+                else:
+                    line = await reader.readline()
+                    if not line:
+                        return
+                    self.event(line.decode().rstrip("\n"))
+                await self.writer.drain()
+        finally:
+            self.writer.close()
+
+    def play(self):
+        # A random piece of ours that can move, then one or (where allowed) two of its targets
+        position = self.position
+        sources = [sq for sq, piece in enumerate(position.squares) if piece and piece_color(piece) == self.color]
+        self.rng.shuffle(sources)
+        targets = []
+        for src in sources:
+            targets = position.piece_moves(src)
+            if targets:
+                break
+        if self.plies >= MAX_PLIES or not targets:
+            self.commands = ["R"]
+        else:
+            piece = position.squares[src]
+            count = 1
+            if len(targets) > 1 and piece_type(piece) != KING and piece_fraction(piece) != EIGHTH:
+                count = self.rng.choice((1, 2))
+            names = [square_name(target) for target in self.rng.sample(targets, count)]
+            if self.rng.random() < CLICK_SHARE:
+                self.commands = [f"S {square_name(src)}"] + [f"S {name}" for name in names] + ["P"]
+            else:
+                self.commands = [f"M {square_name(src)} {' '.join(names)}"]
+        self.send_next()
+
+    def send_next(self):
+        self.sent = time.perf_counter()
+        self.writer.write((self.commands.pop(0) + "\n").encode())
+
+    def answered(self):
+        if self.sent is not None:
+            self.stats.latencies.append(time.perf_counter() - self.sent)
+            self.sent = None
+
+    def event(self, line):
+        kind, _, rest = line.partition(" ")
+        if kind == "M":
+            # The notation names the source first, then the targets
+            squares = [parse_square(name) for name in SQUARE_PATTERN.findall(rest.split(" ")[0])]
+            self.position.make_move(self.position.create_move(squares[0], squares[1:]))
+            self.plies += 1
+            self.over = self.position.winner() is not None  # The G line follows
+            self.stats.moves += self.color == WHITE
+            self.answered()
+        elif kind == "S":
+            self.answered()
+            if self.commands:
+                self.send_next()
+        elif kind == "G":
+            self.over = True
+            self.answered()
+            if self.color == WHITE:
+                self.stats.games += 1
+                self.writer.write(b"N\n")
+        elif kind == "N":
+            self.position = Position.from_fen(rest)
+            self.plies = 0
+            self.over = False
+        elif kind == "E":
+            self.stats.errors.append(f"{self.game}: {rest}")
+            self.commands = []
+            self.answered()
+
+
+async def server_info(host, port):
+    # (CPU seconds, max RSS in kB) of the server
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"I\n")
+    _, games, clients, cpu, rss = (await reader.readline()).decode().split()
+    writer.close()
+    return float(cpu), int(rss)
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(share * len(values)))] if values else 0.0
+
+
+async def run(host, port, args):
+    stats = Stats()
+    players = [Player(f"game-{index // 2}", stats, random.Random(args.seed * 1000003 + index), args.think)
+               for index in range(args.games * 2)]
+    cpu_before, _ = await server_info(host, port)
+    client_before = time.process_time()
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(player.run(host, port)) for player in players]
+    done, _ = await asyncio.wait(tasks, timeout=args.duration)
+    elapsed = time.perf_counter() - start
+    cpu_after, rss = await server_info(host, port)
+    client_cpu = time.process_time() - client_before
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    failed = [task.exception() for task in done if not task.cancelled() and task.exception()]
+
+    latencies = sorted(stats.latencies)
+    server_cpu = cpu_after - cpu_before
+    utilization = server_cpu / elapsed
+    print(f"{args.games} games, {len(players)} clients, {elapsed:.1f}s, think {args.think:.2f}s on average")
+    print(f"{stats.moves} moves ({stats.moves / elapsed:.0f}/s), {len(latencies)} commands answered, "
+          f"{stats.games} games finished, {len(stats.errors)} rejected, {len(failed)} clients failed")
+    print("latency ms   " + "  ".join(f"{name} {percentile(latencies, share) * 1000:.2f}" for name, share in
+                                       (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))))
+    print(f"server CPU {server_cpu:.2f}s ({utilization:.1%} of one core), max RSS {rss // 1024} MB, "
+          f"load generator CPU {client_cpu:.2f}s")
+    if utilization:
+        print(f"games per core at this pace: {args.games / utilization:.0f} "
+              f"({server_cpu * 1e6 / max(stats.moves, 1):.0f} us of server CPU per move)")
+    for error in stats.errors[:5]:
+        print(f"rejected: {error}")
+    for error in failed[:5]:
+        print(f"failed: {error!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play many random games against a Split Chess server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--spawn", action="store_true", help="start split_server.py on a free port for the test")
+    parser.add_argument("--games", type=int, default=500, help="concurrent games, two clients each")
+    parser.add_argument("--duration", type=float, default=20, help="seconds to play")
+    parser.add_argument("--think", type=float, default=0.5, help="average seconds a player waits before moving")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    raise_file_limit()
+
+    server = None
+    host, port = args.host, args.port
+    if args.spawn:
+        server = subprocess.Popen([sys.executable, "split_server.py", "--host", host, "--port", "0"],
+                                  stdout=subprocess.PIPE, text=True, cwd=sys.path[0] or None)
+        host, port = server.stdout.readline().split()[-1].rsplit(":", 1)
+    try:
+        asyncio.run(run(host, int(port), args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# Cache of piece_moves results with targeted invalidation.
+#
+# MoveCache is an LRU of valid targets keyed by (Position.key, square). Each
+# entry also remembers the squares its result depends on: the piece itself,
+# the squares it may move to or capture on, the squares a slider looks at up
+# to and including its first blocker, the squares between king and rook for
+# castling. When a position is not in the cache yet, the entry of the position
+# before the last move is reused if that move changed none of those squares
+# (and, for pawns, not the en passant square; for kings, not the castling
+# rights); the same goes for the position two moves back, which is where the
+# pieces of the side to move were last looked at. So a commit only
+# invalidates the entries it actually affects, and taking a move back finds
+# the old entries under the old key.
+#
+# CachedPosition is an IndexedPosition whose piece_moves (and so its move
+# generation) goes through a MoveCache.
+from collections import OrderedDict
+
+from indexed_position import IndexedPosition
+from split_position import (ALL_CASTLING, COLOR_SHIFT, COLS, KING, KING_TARGETS, KNIGHT, KNIGHT_TARGETS, NO_SQUARE,
+                            PAWN, PAWN_CAPTURES, PAWN_START_ROW, PAWN_STEP, SLIDER_RAYS, TYPE_MASK, WHITE)
+
+DEFAULT_CAPACITY = 1 << 16  # Entries, about 200 bytes each
+LOOKBACK = 2  # Plies searched back for a reusable entry: move generation alternates sides
+MASK_MEMO = 256  # Change logs whose square masks are remembered
+
+
+def _step_dependencies(piece, sq):
+    # Squares that decide the targets of a pawn, knight or king on sq
+    kind = piece & TYPE_MASK
+    color = piece >> COLOR_SHIFT
+    squares = {sq}
+    if kind == PAWN:
+        forward = sq + PAWN_STEP[color]
+        if 0 <= forward < 64:
+            squares.add(forward)
+            if sq // COLS == PAWN_START_ROW[color]:
+                squares.add(forward + PAWN_STEP[color])
+        squares.update(PAWN_CAPTURES[color][sq])
+    elif kind == KNIGHT:
+        squares.update(KNIGHT_TARGETS[sq])
+    elif kind == KING:
+        squares.update(KING_TARGETS[sq])
+        row = sq - sq % COLS
+        squares.update(target for target in range(sq - 3, sq + 3) if row <= target < row + COLS)
+    bits = 0
+    for target in squares:
+        bits |= 1 << target
+    return bits
+
+
+# Dependency masks of the pieces whose reach does not depend on blockers, by piece code and square
+STEP_DEPENDENCIES = [[0] * 64 for _ in range(64)]
+for _piece in range(64):
+    if _piece & TYPE_MASK in (PAWN, KNIGHT, KING):
+        STEP_DEPENDENCIES[_piece] = [_step_dependencies(_piece, _sq) for _sq in range(64)]
+
+
+class MoveCache:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.entries = OrderedDict()  # (position key, sq) -> (targets, dependency mask, piece)
+        self.masks = {}  # id(change log) -> (change log, changed squares)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.carried = 0  # Misses answered by the entry of the previous position
+        self.misses = 0
+        self.evictions = 0
+
+    def clear(self):
+        self.entries.clear()
+        self.masks.clear()
+        self.reset_stats()
+
+    def dependencies(self, position, sq):
+        squares = position.squares
+        piece = squares[sq]
+        if piece & TYPE_MASK in (PAWN, KNIGHT, KING):
+            return STEP_DEPENDENCIES[piece][sq]
+        bits = 1 << sq
+        for ray in SLIDER_RAYS[piece & TYPE_MASK][sq]:
+            for target in ray:
+                bits |= 1 << target
+                if squares[target]:
+                    break
+        return bits
+
+    def piece_moves(self, position, sq, generate=None):
+        # The valid targets of the piece on sq as a tuple; generate(sq) computes
+        # them on a miss (position.piece_moves by default)
+        entries = self.entries
+        piece = position.squares[sq]
+        key = (position.key, sq)
+        entry = entries.get(key)
+        if entry is not None and entry[2] == piece:
+            entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        # Entries of the last positions stay valid unless the moves since touched what they depend on
+        history = position.history
+        changed = 0
+        for back in range(1, min(LOOKBACK, len(history)) + 1):
+            changes, castling, en_passant, previous_key = history[-back]
+            changed |= self.changed_squares(changes)
+            entry = entries.get((previous_key, sq))
+            if entry is not None and entry[2] == piece:
+                kind = piece & TYPE_MASK
+                if (not entry[1] & changed and (kind != PAWN or en_passant == position.en_passant)
+                        and (kind != KING or castling == position.castling)):
+                    self.carried += 1
+                    self.store(key, entry)
+                    return entry[0]
+
+        self.misses += 1
+        targets = tuple(generate(sq) if generate else position.piece_moves(sq))
+        self.store(key, (targets, self.dependencies(position, sq), piece))
+        return targets
+
+    def changed_squares(self, changes):
+        # Bit mask of the squares in a move's change log. Masks are remembered by
+        # the identity of the log, which is kept alive so its id is not reused.
+        masks = self.masks
+        memo = masks.get(id(changes))
+        if memo is not None and memo[0] is changes:
+            return memo[1]
+        if len(masks) >= MASK_MEMO:
+            masks.clear()
+        changed = 0
+        for sq, _ in changes:
+            changed |= 1 << sq
+        masks[id(changes)] = (changes, changed)
+        return changed
+
+    def store(self, key, entry):
+        entries = self.entries
+        entries[key] = entry
+        if len(entries) > self.capacity:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.carried + self.misses
+        return {
+            "capacity": self.capacity,
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "carried": self.carried,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.carried) / lookups if lookups else 0.0,
+        }
+
+    def report(self):
+        stats = self.stats()
+        return (f"move cache: {stats['hit_rate']:.1%} hits ({stats['hits']} direct, {stats['carried']} carried over, "
+                f"{stats['misses']} misses), {stats['entries']}/{stats['capacity']} entries, "
+                f"{stats['evictions']} evicted")
+
+
+class CachedPosition(IndexedPosition):
+    __slots__ = ("move_cache",)
+
+    def __init__(self, squares=None, turn=WHITE, castling=ALL_CASTLING, en_passant=NO_SQUARE, move_cache=None):
+        super().__init__(squares, turn, castling, en_passant)
+        self.move_cache = MoveCache() if move_cache is None else move_cache
+
+    @classmethod
+    def from_position(cls, position, move_cache=None):
+        return cls(position.squares, position.turn, position.castling, position.en_passant, move_cache)
+
+    def piece_moves(self, sq):
+        return self.move_cache.piece_moves(self, sq, super().piece_moves)
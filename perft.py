@@ -0,0 +1,153 @@
+# Perft for Split Chess: counts the leaf positions of the move tree to a fixed
+# depth. Every valid target on its own and every allowed pair of targets of a
+# splittable piece is a separate branch (see Position.generate_moves).
+#
+# Run without arguments to check the reference positions below and report the
+# speed, or pass --fen/--depth/--divide to look at a single position.
+import argparse
+import json
+import sys
+import time
+
+from bitboard import BitboardPosition
+from indexed_position import IndexedPosition
+from split_position import Position
+from transposition import EXACT, TranspositionTable
+
+# Reference positions with the expected node counts for depth 1, 2, 3, ...
+# Depths 1-3 were cross-checked against the original string based ChessBoard
+# rules, so any faster move generator has to reproduce them exactly.
+REFERENCE_POSITIONS = [
+    ("start", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -",
+     [38, 1444, 61848, 2638681]),
+    ("en-passant", "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6",
+     [66, 2659, 216988, 10339202]),
+    # A rook can split onto both the en passant square and the pawn behind it
+    ("ep-file-split", "3k4/8/8/8/4P3/8/8/K3r3 b - e3",
+     [60, 183, 23885, 140643]),
+    ("castling", "r3k2r/pppq1ppp/2npbn2/2b1p3/2B1P3/2NPBN2/PPPQ1PPP/R3K2R w KQkq -",
+     [103, 10440, 1098495]),
+    ("promotion", "n3k3/1P^26/8/8/8/8/6p^41/4K2N w - -",
+     [11, 112, 7111, 268044]),
+    ("split-opening", "rnbq1bnr/1ppppk2/p^25p^2p^2/2P^21p^2p^2p^2p^2/p^23P^23/2P^21P^2N^82/PP1PN^8PPP/RNBQKBN^2R w KQ -",
+     [35, 980, 46927]),
+    ("split-middle", "r1b1kbn^4r/ppppq^2Q^8p1/n^22n^8p^23/4p^2n^4q^81/1n^41n^42P^2P^2/1P^22P^2Q^8q^8P^2/P1PP2B^21/RNBQ^8K1NR w KQkq -",
+     [49, 4707, 243615]),
+    ("fractions", "8/2k5/3n^4b^83/8/4K3/2R^25/8/8 w - -",
+     [99, 4604, 505399]),
+]
+
+
+def perft(position, depth, generate=None, table=None):
+    # With a TranspositionTable, subtree counts are reused for positions that
+    # are reached again through a different move order
+    if depth == 0:
+        return 1
+    if table is not None and depth > 1:
+        entry = table.probe(position.key)
+        if entry is not None and entry[0] == depth:
+            return entry[1]
+    moves = generate(position) if generate else position.generate_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        position.make_move(move)
+        nodes += perft(position, depth - 1, generate, table)
+        position.unmake_move()
+    if table is not None:
+        table.store(position.key, depth, nodes, EXACT)
+    return nodes
+
+
+def divide(position, depth, generate=None, table=None):
+    # Node count below each move of the root position
+    results = []
+    moves = generate(position) if generate else position.generate_moves()
+    for move in moves:
+        position.make_move(move)
+        results.append((move, perft(position, depth - 1, generate, table)))
+        position.unmake_move()
+    return results
+
+
+def timed_perft(position, depth, generate=None, table=None):
+    start = time.perf_counter()
+    nodes = perft(position, depth, generate, table)
+    seconds = time.perf_counter() - start
+    return nodes, seconds
+
+
+def run_reference(max_depth, generate=None, log_path=None, position_class=Position, table=None):
+    # Check every reference position up to max_depth, returns False on any mismatch
+    ok = True
+    for name, fen, expected in REFERENCE_POSITIONS:
+        for depth, expected_nodes in enumerate(expected[:max_depth], start=1):
+            nodes, seconds = timed_perft(position_class.from_fen(fen), depth, generate, table)
+            nps = nodes / seconds if seconds > 0 else 0.0
+            status = "ok" if nodes == expected_nodes else f"MISMATCH (expected {expected_nodes})"
+            print(f"{name:<14} depth {depth}  {nodes:>10} nodes  {seconds:8.3f}s  {nps:>10.0f} nps  {status}")
+            ok = ok and nodes == expected_nodes
+            if log_path:
+                log_result(log_path, name, depth, nodes, seconds)
+    return ok
+
+
+def log_result(path, name, depth, nodes, seconds):
+    # Append one JSON line per run so the speed can be tracked over time
+    record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "position": name, "depth": depth,
+              "nodes": nodes, "seconds": round(seconds, 4), "nps": round(nodes / seconds) if seconds > 0 else 0}
+    with open(path, "a") as log:
+        log.write(json.dumps(record) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split Chess move generation counter")
+    parser.add_argument("--fen", help="position to count instead of the reference suite")
+    parser.add_argument("--depth", type=int, default=3, help="search depth (default 3)")
+    parser.add_argument("--divide", action="store_true", help="show the node count below each root move")
+    parser.add_argument("--log", help="append results as JSON lines to this file")
+    parser.add_argument("--bitboard", action="store_true", help="use the bitboard move generator")
+    parser.add_argument("--indexed", action="store_true", help="use the piece-list position of indexed_position.py")
+    parser.add_argument("--check-indexes", action="store_true", help="with --indexed, rescan the board after every move")
+    parser.add_argument("--hash", type=int, metavar="MB", help="reuse subtree counts through a transposition table of at most MB megabytes")
+    parser.add_argument("--policy", choices=("depth", "age"), default="depth", help="transposition table replacement")
+    args = parser.parse_args(argv)
+    position_class = BitboardPosition if args.bitboard else IndexedPosition if args.indexed else Position
+    IndexedPosition.debug = args.check_indexes
+    table = TranspositionTable(args.hash, args.policy) if args.hash else None
+
+    if args.fen is None:
+        ok = run_reference(args.depth, log_path=args.log, position_class=position_class, table=table)
+        print_table_stats(table)
+        return 0 if ok else 1
+
+    position = position_class.from_fen(args.fen)
+    if args.divide:
+        start = time.perf_counter()
+        results = divide(position, args.depth, table=table)
+        seconds = time.perf_counter() - start
+        for move, count in results:
+            print(f"{move!r:<20} {count}")
+        nodes = sum(count for _, count in results)
+        print(f"\n{len(results)} moves")
+    else:
+        nodes, seconds = timed_perft(position, args.depth, table=table)
+    nps = nodes / seconds if seconds > 0 else 0.0
+    print(f"{nodes} nodes in {seconds:.3f}s ({nps:.0f} nps)")
+    print_table_stats(table)
+    if args.log:
+        log_result(args.log, args.fen, args.depth, nodes, seconds)
+    return 0
+
+
+def print_table_stats(table):
+    if table is not None:
+        stats = table.stats()
+        print(f"hash: {stats['size']} slots ({stats['memory_bytes'] // 1024} KiB, {stats['policy']} policy), "
+              f"{stats['filled']} filled, {stats['hits']} hits / {stats['misses']} misses "
+              f"({stats['hit_rate']:.1%}), {stats['overwrites']} overwrites, {stats['rejected']} rejected")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
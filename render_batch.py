@@ -0,0 +1,220 @@
+# Offscreen batch rendering of Split Chess boards to PNG.
+#
+# Draws positions without a window (SDL's dummy video driver) at any board
+# size, with the piece images of images/ taken from the sprite atlases of
+# sprite_atlas.py, so every size is scaled once and then cached on disk. A
+# Renderer keeps the empty board pre-rendered and one frame surface it draws
+# into, and like the game's dirty renderer it only redraws the squares whose
+# piece or highlight differ from the last image; consecutive frames of a
+# replay are a few blits each. Images are written with zlib directly, which
+# at the default level is about three times faster than pygame.image.save.
+#
+# The command line spreads the work over a process pool, one renderer per
+# worker:
+#
+#   python render_batch.py positions fens.txt thumbnails/ --size 256
+#   python render_batch.py replay games.spg replays/ --games 0-99 --size 480
+#
+# positions renders one image per FEN line of a file, named after its line
+# number; replay renders every position of games from a game_record.py file,
+# one directory per game and one image per ply, the last move highlighted.
+import argparse
+import multiprocessing
+import os
+import struct
+import sys
+import time
+import zlib
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+import sprite_atlas
+from game_record import GameArchive
+from split_position import COLS, ROWS, Position
+
+LIGHT_SQUARE = (240, 217, 181)  # The board colors of SplitChess.py
+DARK_SQUARE = (181, 136, 99)
+LIGHT_MOVED = (205, 210, 106)  # Source and targets of the last move
+DARK_MOVED = (170, 162, 58)
+PNG_LEVEL = 3  # zlib level: 1 is fastest, 9 smallest
+CHUNK = 64  # Positions per pool task
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def encode_png(surface, level=PNG_LEVEL):
+    # 8 bit RGB PNG of a surface, every row unfiltered
+    width, height = surface.get_size()
+    pixels = pygame.image.tobytes(surface, "RGB")
+    stride = width * 3
+    rows = b"".join(b"\0" + pixels[offset:offset + stride] for offset in range(0, len(pixels), stride))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (PNG_SIGNATURE + png_chunk(b"IHDR", header) + png_chunk(b"IDAT", zlib.compress(rows, level))
+            + png_chunk(b"IEND", b""))
+
+
+def write_file(path, data):
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as output:
+        output.write(data)
+    os.replace(temporary, path)
+
+
+class Renderer:
+    # Draws positions into one frame surface of size x size pixels (rounded
+    # down to whole squares). The returned surface is reused by the next call.
+    def __init__(self, size, level=PNG_LEVEL):
+        self.square_size = max(size // COLS, 1)
+        self.size = self.square_size * COLS
+        self.level = level
+        self.images = sprite_atlas.get_atlas(self.square_size).images
+        self.backgrounds = {}  # Highlighted -> the empty board in those colors
+        self.frame = pygame.Surface((self.size, self.size))
+        self.shown = [None] * (ROWS * COLS)  # (piece, highlighted) of every screen square in the frame
+        self.flipped = None
+
+    def background(self, highlighted):
+        surface = self.backgrounds.get(highlighted)
+        if surface is None:
+            light, dark = (LIGHT_MOVED, DARK_MOVED) if highlighted else (LIGHT_SQUARE, DARK_SQUARE)
+            surface = self.backgrounds[highlighted] = pygame.Surface((self.size, self.size))
+            for index in range(ROWS * COLS):
+                row, col = divmod(index, COLS)
+                surface.fill(light if (row + col) % 2 == 0 else dark, self.rect(index))
+        return surface
+
+    def rect(self, index):
+        return pygame.Rect(index % COLS * self.square_size, index // COLS * self.square_size,
+                           self.square_size, self.square_size)
+
+    def render(self, position, flipped=False, last_move=None):
+        marked = set(last_move.targets) | {last_move.src} if last_move is not None else ()
+        if flipped != self.flipped:
+            self.shown = [None] * (ROWS * COLS)  # Every screen square shows another board square now
+            self.flipped = flipped
+        squares = position.squares
+        shown = self.shown
+        blits = []
+        for sq in range(ROWS * COLS):
+            index = ROWS * COLS - 1 - sq if flipped else sq
+            state = (squares[sq], sq in marked)
+            if shown[index] != state:
+                shown[index] = state
+                rect = self.rect(index)
+                blits.append((self.background(state[1]), rect, rect))
+                if state[0]:
+                    blits.append((self.images[state[0]], rect))
+        self.frame.blits(blits, doreturn=False)
+        return self.frame
+
+    def save(self, position, path, flipped=False, last_move=None):
+        write_file(path, encode_png(self.render(position, flipped, last_move), self.level))
+
+
+# Per worker process: its renderer and, for replays, the open game archive
+renderer = None
+archive = None
+
+
+def _start_worker(size, level, records=None):
+    global renderer, archive
+    renderer = Renderer(size, level)
+    if records is not None:
+        archive = GameArchive(records)
+
+
+def _render_positions(task):
+    # Chunk of (FEN, path, flipped)
+    for fen, path, flipped in task:
+        renderer.save(Position.from_fen(fen), path, flipped)
+    return len(task)
+
+
+def _render_replay(task):
+    # Every position of one game into its own directory
+    number, directory, flipped = task
+    game = archive[number]
+    os.makedirs(directory, exist_ok=True)
+    position = game.start_position()
+    renderer.save(position, os.path.join(directory, "0000.png"), flipped)
+    for ply, code in enumerate(game.moves, 1):
+        move = position.move_from_code(code)
+        position.make_move(move)
+        renderer.save(position, os.path.join(directory, f"{ply:04d}.png"), flipped, move)
+    return len(game.moves) + 1
+
+
+def chunks(items, size):
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def parse_games(spec, count):
+    # "0-99,120" -> [0, ..., 99, 120]; None is every game
+    if spec is None:
+        return list(range(count))
+    numbers = []
+    for part in spec.split(","):
+        first, _, last = part.partition("-")
+        numbers.extend(range(int(first), int(last or first) + 1))
+    return numbers
+
+
+def run_pool(function, tasks, workers, initargs, log=print):
+    # Run the tasks and report images per second; returns the number of images
+    start = time.perf_counter()
+    images = 0
+    last_report = start
+    with multiprocessing.Pool(workers, _start_worker, initargs) as pool:
+        for count in pool.imap_unordered(function, tasks):
+            images += count
+            if time.perf_counter() - last_report >= 2.0:
+                log(f"{images} images  {images / (time.perf_counter() - start):.0f}/s")
+                last_report = time.perf_counter()
+    elapsed = time.perf_counter() - start
+    log(f"{images} images in {elapsed:.1f}s ({images / max(elapsed, 1e-9):.0f}/s on {workers} workers)")
+    return images
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render Split Chess positions and game replays to PNG without a window")
+    parser.add_argument("--size", type=int, default=256, help="board size in pixels, rounded down to whole squares")
+    parser.add_argument("--flip", action="store_true", help="show the board from Black's side")
+    parser.add_argument("--level", type=int, default=PNG_LEVEL, choices=range(10), metavar="0-9",
+                        help="PNG compression level")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    commands = parser.add_subparsers(dest="command", required=True)
+    positions = commands.add_parser("positions", help="one image per FEN line of a file")
+    positions.add_argument("fens", help="file of FENs, one per line")
+    positions.add_argument("out", help="directory for the images")
+    replay = commands.add_parser("replay", help="one image per ply of games in a game_record.py file")
+    replay.add_argument("records")
+    replay.add_argument("out", help="directory for the games' frame directories")
+    replay.add_argument("--games", help="game numbers such as 0-99,120 (default: all)")
+    args = parser.parse_args(argv)
+    os.makedirs(args.out, exist_ok=True)
+    sprite_atlas.get_atlas(max(args.size // COLS, 1))  # Scaled once here, the workers load it from the cache
+
+    if args.command == "positions":
+        with open(args.fens) as lines:
+            fens = [(number, line.strip()) for number, line in enumerate(lines) if line.strip()]
+        for number, fen in fens:
+            Position.from_fen(fen)  # Fail early on a bad FEN
+        items = [(fen, os.path.join(args.out, f"{number:06d}.png"), args.flip) for number, fen in fens]
+        run_pool(_render_positions, chunks(items, CHUNK), args.workers, (args.size, args.level))
+    else:
+        with GameArchive(args.records) as records:
+            numbers = parse_games(args.games, len(records))
+            if any(not 0 <= number < len(records) for number in numbers):
+                parser.error(f"{args.records} has {len(records)} games")
+        tasks = [(number, os.path.join(args.out, f"game_{number:06d}"), args.flip) for number in numbers]
+        run_pool(_render_replay, tasks, args.workers, (args.size, args.level, args.records))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
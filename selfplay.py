@@ -0,0 +1,247 @@
+# Headless self-play tournaments for Split Chess.
+#
+# Plays many games between two configurable players on a process pool and
+# streams every finished game to a JSON lines file. Games already in the file
+# are skipped when the same command is run again, so an interrupted run can be
+# resumed. Players are given as:
+#
+#   random          uniformly random moves
+#   greedy          best static evaluation after one move
+#   search:DEPTH    alpha-beta search to DEPTH plies (optionally search:DEPTH:NODES)
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from split_ai import MATE, Searcher, evaluate
+from split_position import BLACK, WHITE, Position
+
+RESULTS = {WHITE: "1-0", BLACK: "0-1", None: "1/2-1/2"}
+
+
+class RandomPlayer:
+    def __init__(self, rng):
+        self.rng = rng
+
+    def choose(self, position, moves):
+        return self.rng.choice(moves)
+
+
+class GreedyPlayer:
+    # Picks the move with the best evaluation for the mover, random among equals
+    def __init__(self, rng):
+        self.rng = rng
+
+    def choose(self, position, moves):
+        best_score = None
+        best_moves = []
+        for move in moves:
+            position.make_move(move)
+            score = MATE if position.winner() is not None else -evaluate(position)
+            position.unmake_move()
+            if best_score is None or score > best_score:
+                best_score = score
+                best_moves = [move]
+            elif score == best_score:
+                best_moves.append(move)
+        return self.rng.choice(best_moves)
+
+
+class SearchPlayer:
+    # Alpha-beta search, random among the root moves with the best score
+    def __init__(self, rng, depth, node_limit=None):
+        self.rng = rng
+        self.depth = depth
+        self.node_limit = node_limit
+        self.searcher = Searcher(table_mb=4)
+
+    def choose(self, position, moves):
+        return self.searcher.search(position, self.depth, node_limit=self.node_limit, rng=self.rng).move
+
+
+def make_player(spec, rng):
+    name, _, options = spec.partition(":")
+    if name == "random":
+        return RandomPlayer(rng)
+    if name == "greedy":
+        return GreedyPlayer(rng)
+    if name == "search":
+        depth, _, nodes = options.partition(":")
+        return SearchPlayer(rng, int(depth or 2), int(nodes) if nodes else None)
+    raise ValueError(f"Unknown player {spec!r}, expected random, greedy or search:DEPTH[:NODES]")
+
+
+def play_game(task):
+    # Play one game and return its summary; runs inside a worker process
+    index, white_spec, black_spec, seed, max_plies = task
+    rng = random.Random(seed)
+    players = (make_player(white_spec, rng), make_player(black_spec, rng))
+    position = Position.initial()
+    moves_played = []
+    reason = "move limit"
+    winner = None
+    start = time.perf_counter()
+    while len(moves_played) < max_plies:
+        moves = position.generate_moves()
+        if not moves:
+            reason = "no moves"
+            break
+        move = players[position.turn].choose(position, moves)
+        position.make_move(move)
+        moves_played.append(move.code)
+        winner = position.winner()
+        if winner is not None:
+            reason = "king captured"
+            break
+    return {
+        "game": index,
+        "white": white_spec,
+        "black": black_spec,
+        "seed": seed,
+        "max_plies": max_plies,
+        "result": RESULTS[winner],
+        "reason": reason,
+        "plies": len(moves_played),
+        "seconds": round(time.perf_counter() - start, 4),
+        "moves": moves_played,
+    }
+
+
+def completed_games(path):
+    # Games already present in a results file, by game number, without their
+    # moves. A last line cut short by an interruption is dropped so new results
+    # start on a fresh line.
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, "rb+") as results:
+        data = results.read()
+        if data and not data.endswith(b"\n"):
+            results.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+    for line in data.splitlines():
+        try:
+            game = json.loads(line)
+            game.pop("moves", None)
+            done[game["game"]] = game
+        except (ValueError, KeyError, TypeError):
+            pass
+    return done
+
+
+def build_tasks(args, done):
+    # Tasks of the games not in done. Raises ValueError when a game in done was
+    # played by other players, with another seed or under another move limit
+    # than this run would use.
+    tasks = []
+    for index in range(args.games):
+        white, black = args.white, args.black
+        if args.alternate and index % 2:
+            white, black = black, white
+        task = (index, white, black, args.seed * 1000003 + index, args.max_plies)
+        game = done.get(index)
+        if game is None:
+            tasks.append(task)
+        elif (game.get("white"), game.get("black"), game.get("seed"), game.get("max_plies")) != task[1:]:
+            raise ValueError(f"game {index} in {args.out} is {game.get('white')} vs {game.get('black')} with seed "
+                             f"{game.get('seed')} and max plies {game.get('max_plies')}, this run would play "
+                             f"{white} vs {black} with seed {task[3]} and max plies {task[4]}; "
+                             f"use another --out or the same options")
+    return tasks
+
+
+class Tally:
+    # Running score per player spec and throughput of the games seen so far
+    def __init__(self):
+        self.points = {}
+        self.games = 0
+        self.plies = 0
+        self.resumed = 0  # Games counted from an earlier run, left out of the throughput
+        self.resumed_plies = 0
+        self.outcomes = {"1-0": 0, "0-1": 0, "1/2-1/2": 0}
+        self.start = time.perf_counter()
+
+    def add(self, game, resumed=False):
+        self.games += 1
+        self.plies += game["plies"]
+        if resumed:
+            self.resumed += 1
+            self.resumed_plies += game["plies"]
+        self.outcomes[game["result"]] += 1
+        white_points = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}[game["result"]]
+        for spec, points in ((game["white"], white_points), (game["black"], 1.0 - white_points)):
+            total, count = self.points.get(spec, (0.0, 0))
+            self.points[spec] = (total + points, count + 1)
+
+    def throughput(self):
+        seconds = max(time.perf_counter() - self.start, 1e-9)
+        return (self.games - self.resumed) / seconds, (self.plies - self.resumed_plies) / seconds
+
+    def report(self):
+        games_per_second, moves_per_second = self.throughput()
+        lines = [f"{self.games} games, white wins {self.outcomes['1-0']}, black wins {self.outcomes['0-1']}, "
+                 f"draws {self.outcomes['1/2-1/2']}, average length {self.plies / max(self.games, 1):.1f} plies",
+                 f"{games_per_second:.2f} games/s, {moves_per_second:.0f} moves/s"
+                 + (f" ({self.resumed} games from earlier runs)" if self.resumed else "")]
+        for spec, (total, count) in sorted(self.points.items()):
+            lines.append(f"  {spec:<16} {total:g}/{count} points")
+        return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Split Chess self-play games on all cores")
+    parser.add_argument("--games", type=int, default=100, help="number of games in the run")
+    parser.add_argument("--white", default="random", help="white player (random, greedy, search:DEPTH[:NODES])")
+    parser.add_argument("--black", default="random", help="black player")
+    parser.add_argument("--alternate", action="store_true", help="swap colors every other game")
+    parser.add_argument("--max-plies", type=int, default=300, help="plies before a game is scored as a draw")
+    parser.add_argument("--seed", type=int, default=1, help="base seed; every game gets its own seed from it")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--out", default="selfplay.jsonl", help="results file, appended to and used for resume")
+    parser.add_argument("--quiet", action="store_true", help="only print the final summary")
+    args = parser.parse_args(argv)
+    for spec in (args.white, args.black):
+        make_player(spec, random.Random())  # Fail early on a bad player spec
+
+    done = completed_games(args.out)
+    try:
+        tasks = build_tasks(args, done)
+    except ValueError as error:
+        parser.error(str(error))
+    tally = Tally()
+    for index in range(args.games):
+        if index in done:
+            tally.add(done[index], resumed=True)
+    if done:
+        print(f"resuming: {tally.resumed} games already in {args.out}, {len(tasks)} to play")
+
+    last_report = time.perf_counter()
+    pool = multiprocessing.Pool(args.workers)
+    try:
+        with open(args.out, "a") as out:
+            for game in pool.imap_unordered(play_game, tasks):
+                out.write(json.dumps(game, separators=(",", ":")) + "\n")
+                out.flush()
+                tally.add(game)
+                if not args.quiet and time.perf_counter() - last_report >= 2.0:
+                    games_per_second, moves_per_second = tally.throughput()
+                    print(f"{tally.games}/{args.games} games  {games_per_second:.2f} games/s  "
+                          f"{moves_per_second:.0f} moves/s")
+                    last_report = time.perf_counter()
+        pool.close()
+    except KeyboardInterrupt:
+        pool.terminate()
+        print("\ninterrupted, run the same command again to resume")
+        print(tally.report())
+        return 130
+    finally:
+        pool.join()
+    print(tally.report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
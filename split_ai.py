@@ -0,0 +1,409 @@
+# Computer player for Split Chess.
+#
+# Negamax alpha-beta search with iterative deepening under a time and/or node
+# budget, a transposition table, move ordering (transposition table move,
+# captures by most valuable victim, killer moves, history heuristic) and a
+# capture-only quiescence search. Split moves are searched like any other
+# move. AIPlayer runs the search on a background thread so the pygame loop
+# keeps drawing while the computer thinks.
+#
+# With endgame tables (tablebase.py) the search scores covered positions from
+# the tables instead of searching them. Won and lost roots are played straight
+# from the tables, which know the shortest way; at a drawn root the moves are
+# cut down to the ones keeping the draw and the search plays on without
+# probing, hoping for a mistake.
+import argparse
+import threading
+import time
+
+from move_cache import CachedPosition, MoveCache
+from split_position import (BISHOP, CAPTURE, COLS, EN_PASSANT, KING, KNIGHT, PAWN, PIECE_CODES, QUEEN, ROOK,
+                            ROWS, WHITE, Position, piece_color, piece_fraction, piece_type)
+from tablebase import DRAW, LOSS, UNKNOWN, WIN, Tablebase
+from transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+MATE = 1000000
+TABLEBASE_WIN = MATE // 2  # Below every king capture score the search can find
+# How good a tablebase result after our move is for us; unknown ranks like a draw
+RESULT_RANKS = {None: 1, UNKNOWN: 1, WIN: 0, LOSS: 3, DRAW: 2}
+INFINITY = 10 ** 9
+MAX_PLY = 64
+QUIESCENCE_PLIES = 6
+
+# Material in centipawns of a full piece; split pieces count for their fraction
+PIECE_VALUES = {PAWN: 100, KNIGHT: 320, BISHOP: 330, ROOK: 500, QUEEN: 900, KING: 20000}
+FRACTION_WEIGHTS = (1.0, 0.5, 0.25, 0.125)
+
+
+def _center_bonus(sq):
+    x, y = sq % COLS, sq // COLS
+    return 3.5 - max(abs(x - 3.5), abs(y - 3.5))  # 0 on the edge, 3 in the center
+
+
+def _square_bonus(kind, color, sq):
+    # Small positional terms in centipawns for a full piece of that color on sq
+    advance = (ROWS - 1 - sq // COLS) if color == WHITE else sq // COLS
+    if kind == PAWN:
+        return advance * 8 + _center_bonus(sq) * 3
+    if kind in (KNIGHT, BISHOP):
+        return _center_bonus(sq) * 10
+    if kind in (ROOK, QUEEN):
+        return _center_bonus(sq) * 3
+    return -_center_bonus(sq) * 5  # Keep the king away from the middle
+
+
+# Score of every piece code on every square from White's point of view
+PIECE_SQUARE_SCORES = [[0] * 64 for _ in range(64)]
+PIECE_WEIGHTS = [0] * 64  # Fraction weighted value of each piece code
+for _code in PIECE_CODES.values():
+    _kind, _color, _weight = piece_type(_code), piece_color(_code), FRACTION_WEIGHTS[piece_fraction(_code)]
+    PIECE_WEIGHTS[_code] = round(PIECE_VALUES[_kind] * _weight)
+    for _sq in range(64):
+        _score = round((PIECE_VALUES[_kind] + _square_bonus(_kind, _color, _sq)) * _weight)
+        PIECE_SQUARE_SCORES[_code][_sq] = _score if _color == WHITE else -_score
+
+
+def evaluate(position):
+    # Score in centipawns from the point of view of the side to move
+    scores = PIECE_SQUARE_SCORES
+    score = 0
+    for sq, piece in enumerate(position.squares):
+        if piece:
+            score += scores[piece][sq]
+    return score if position.turn == WHITE else -score
+
+
+class SearchAborted(Exception):
+    pass
+
+
+class SearchResult:
+    __slots__ = ("move", "score", "depth", "nodes", "seconds")
+
+    def __init__(self, move, score, depth, nodes, seconds):
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.seconds = seconds
+
+    def __repr__(self):
+        return (f"SearchResult(move={self.move!r}, score={self.score}, depth={self.depth}, "
+                f"nodes={self.nodes}, seconds={self.seconds:.2f})")
+
+
+class Searcher:
+    def __init__(self, table_mb=16, move_cache=None, tablebase=None):
+        # move_cache: a MoveCache to generate moves through. Off by default,
+        # it costs more than it saves in CPython search (see its hit rate).
+        # table_mb: upper bound on the transposition table's memory.
+        # tablebase: a tablebase.Tablebase to probe
+        self.table = TranspositionTable(table_mb, "age")
+        self.move_cache = move_cache
+        self.tablebase = tablebase
+        self.probing = False
+        self.stop_event = threading.Event()
+        self.nodes = 0
+
+    def stop(self):
+        # Stops the running search, and any later one until reset()
+        self.stop_event.set()
+
+    def reset(self):
+        # Lets searches run again after stop()
+        self.stop_event.clear()
+
+    def search(self, position, max_depth=MAX_PLY, time_limit=None, node_limit=None, on_iteration=None, rng=None):
+        # Search a copy of position and return the best move found within the
+        # budget. Always returns a move when one exists, even if stopped early.
+        # rng: a random.Random picking among equally scored root moves; without
+        # it the same position always gets the same move.
+        if self.move_cache is not None:
+            position = CachedPosition.from_position(position, self.move_cache)
+        else:
+            position = position.copy()
+        self.table.new_search()
+        self.nodes = 0
+        self.node_limit = node_limit
+        self.start = time.perf_counter()
+        self.deadline = self.start + time_limit if time_limit else None
+        self.killers = [[0, 0] for _ in range(MAX_PLY + QUIESCENCE_PLIES + 1)]
+        self.history = [0] * (64 * 64)
+
+        moves = position.generate_moves()
+        if not moves:
+            return SearchResult(None, 0, 0, 0, 0.0)
+        if rng is not None:
+            moves = rng.sample(moves, len(moves))  # Move ordering is a stable sort and keeps the first best score
+        self.probing = self.tablebase is not None
+        known = self.tablebase.probe(position) if self.probing else None
+        if known in (WIN, LOSS):  # The tables know the shortest way
+            score = TABLEBASE_WIN if known == WIN else -TABLEBASE_WIN
+            return SearchResult(self.tablebase.best_move(position), score, 0, 0, time.perf_counter() - self.start)
+        if known == DRAW:
+            moves = self.tablebase_moves(position, moves)
+            self.probing = False
+        result = SearchResult(self.order_moves(moves, 0, 0)[0], 0, 0, 0, 0.0)
+        for depth in range(1, max_depth + 1):
+            if self.stop_event.is_set():
+                break  # Nodes only check it every 1024, a small tree would finish
+            try:
+                score, move = self.search_root(position, moves, depth)
+            except SearchAborted:
+                break
+            result = SearchResult(move, score, depth, self.nodes, time.perf_counter() - self.start)
+            if on_iteration:
+                on_iteration(result)
+            if abs(score) >= MATE - MAX_PLY:
+                break  # A forced king capture was found
+        result.nodes = self.nodes
+        result.seconds = time.perf_counter() - self.start
+        return result
+
+    def tablebase_moves(self, position, moves):
+        # The moves that keep the draw of a drawn root
+        ranks = []
+        for move in moves:
+            position.make_move(move)
+            if position.winner() is not None:
+                rank = 3
+            else:
+                rank = RESULT_RANKS[self.tablebase.probe(position)]
+            position.unmake_move()
+            ranks.append(rank)
+        best = max(ranks)
+        return [move for move, rank in zip(moves, ranks) if rank == best]
+
+    def check_limits(self):
+        if self.stop_event.is_set():
+            raise SearchAborted
+        if self.node_limit and self.nodes >= self.node_limit:
+            raise SearchAborted
+        if self.deadline and time.perf_counter() >= self.deadline:
+            raise SearchAborted
+
+    def search_root(self, position, moves, depth):
+        entry = self.table.probe(position.key)
+        moves = self.order_moves(moves, entry[3] if entry else 0, 0)
+        alpha, beta = -INFINITY, INFINITY
+        best_move = moves[0]
+        for move in moves:
+            position.make_move(move)
+            score = -self.negamax(position, depth - 1, -beta, -alpha, 1)
+            position.unmake_move()
+            if score > alpha:
+                alpha = score
+                best_move = move
+        self.table.store(position.key, depth, alpha, EXACT, best_move.code)
+        return alpha, best_move
+
+    def negamax(self, position, depth, alpha, beta, ply):
+        self.nodes += 1
+        if not self.nodes & 1023:
+            self.check_limits()
+        if position.winner() is not None:
+            return -MATE + ply  # The opponent has just captured our king
+        if self.probing:
+            result = self.tablebase.probe(position)
+            if result is not None:
+                if result == WIN:
+                    return TABLEBASE_WIN - ply
+                return -TABLEBASE_WIN + ply if result == LOSS else 0
+        if depth <= 0 or ply >= MAX_PLY:
+            return self.quiesce(position, alpha, beta, ply, 0)
+
+        table = self.table
+        key = position.key
+        entry = table.probe(key)
+        tt_move = 0
+        if entry is not None:
+            entry_depth, score, flag, tt_move = entry
+            if entry_depth >= depth:
+                score = score_from_table(score, ply)
+                if flag == EXACT:
+                    return score
+                if flag == LOWER and score > alpha:
+                    alpha = score
+                elif flag == UPPER and score < beta:
+                    beta = score
+                if alpha >= beta:
+                    return score
+
+        moves = position.generate_moves()
+        if not moves:
+            return 0  # No move at all: the game cannot go on
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_code = 0
+        for move in self.order_moves(moves, tt_move, ply):
+            position.make_move(move)
+            score = -self.negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            position.unmake_move()
+            if score > best_score:
+                best_score = score
+                best_code = move.code
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if not move.flags & CAPTURE:
+                            self.remember_quiet_move(move, depth, ply)
+                        break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        table.store(key, depth, score_to_table(best_score, ply), flag, best_code)
+        return best_score
+
+    def quiesce(self, position, alpha, beta, ply, depth):
+        # Only moves whose every target captures something are searched here
+        self.nodes += 1
+        if not self.nodes & 1023:
+            self.check_limits()
+        if position.winner() is not None:
+            return -MATE + ply
+        stand_pat = evaluate(position)
+        if stand_pat >= beta or depth >= QUIESCENCE_PLIES:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+        captures = position.generate_captures()
+        for move in self.order_moves(captures, 0, ply):
+            position.make_move(move)
+            score = -self.quiesce(position, -beta, -alpha, ply + 1, depth + 1)
+            position.unmake_move()
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+        return alpha
+
+    def order_moves(self, moves, tt_move, ply):
+        killers = self.killers[ply]
+        history = self.history
+        weights = PIECE_WEIGHTS
+
+        def priority(move):
+            code = move.code
+            if code == tt_move:
+                return 1 << 40
+            if move.flags & CAPTURE:
+                # Most valuable victims first, cheapest attacker first
+                victims = sum(weights[captured] for captured in move.captured)
+                if move.flags & EN_PASSANT:
+                    victims += weights[PAWN]
+                return (1 << 30) + victims * 64 - weights[move.piece] // 64
+            if code == killers[0] or code == killers[1]:
+                return 1 << 29
+            return history[move.src * 64 + move.targets[0]]
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def remember_quiet_move(self, move, depth, ply):
+        killers = self.killers[ply]
+        code = move.code
+        if killers[0] != code:
+            killers[1] = killers[0]
+            killers[0] = code
+        self.history[move.src * 64 + move.targets[0]] += depth * depth
+
+
+def score_to_table(score, ply):
+    # Mate scores are stored relative to the position, not the root
+    if score >= MATE - MAX_PLY * 2:
+        return score + ply
+    if score <= -MATE + MAX_PLY * 2:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    if score >= MATE - MAX_PLY * 2:
+        return score - ply
+    if score <= -MATE + MAX_PLY * 2:
+        return score + ply
+    return score
+
+
+class AIPlayer:
+    # Plays one color by searching on a background thread. start() hands over a
+    # copy of the position, poll() returns the chosen move once the search is
+    # done and cancel() abandons a running search (e.g. on reset or quit).
+    def __init__(self, color, time_limit=2.0, node_limit=None, max_depth=MAX_PLY, table_mb=16, tablebase=None):
+        self.color = color
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth = max_depth
+        self.searcher = Searcher(table_mb, tablebase=tablebase)
+        self.thread = None
+        self.result = None
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    @property
+    def thinking(self):
+        return self.thread is not None
+
+    def start(self, position):
+        self.cancel()
+        self.generation += 1
+        self.searcher.reset()  # Here, not in the thread, so a cancel() right after start() is never lost
+        self.thread = threading.Thread(target=self._run, args=(position.copy(), self.generation), daemon=True)
+        self.thread.start()
+
+    def _run(self, position, generation):
+        result = self.searcher.search(position, self.max_depth, self.time_limit, self.node_limit)
+        with self.lock:
+            if generation == self.generation:
+                self.result = result
+
+    def poll(self):
+        # The finished search result, or None while the search is still running
+        with self.lock:
+            result = self.result
+            self.result = None
+        if result is not None:
+            self.thread = None
+        return result
+
+    def cancel(self):
+        if self.thread is not None:
+            with self.lock:
+                self.generation += 1
+                self.result = None
+            self.searcher.stop()
+            self.thread.join()
+            self.thread = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search a Split Chess position")
+    parser.add_argument("--fen", help="position to search (default: start position)")
+    parser.add_argument("--time", type=float, default=5.0, help="time budget in seconds")
+    parser.add_argument("--nodes", type=int, help="node budget")
+    parser.add_argument("--depth", type=int, default=MAX_PLY, help="maximum depth")
+    parser.add_argument("--move-cache", action="store_true", help="generate moves through a MoveCache and report its hit rate")
+    parser.add_argument("--tablebase", metavar="DIR", help="probe the endgame tables in DIR (see tablebase.py)")
+    args = parser.parse_args(argv)
+
+    position = Position.from_fen(args.fen) if args.fen else Position.initial()
+    searcher = Searcher(move_cache=MoveCache() if args.move_cache else None,
+                        tablebase=Tablebase(args.tablebase) if args.tablebase else None)
+
+    def report(result):
+        print(f"depth {result.depth:>2}  score {result.score:>8}  nodes {result.nodes:>9}  "
+              f"{result.seconds:6.2f}s  {result.move!r}")
+
+    result = searcher.search(position, args.depth, args.time, args.nodes, on_iteration=report)
+    print(f"best move {result.move!r} ({result.nodes} nodes, {result.nodes / max(result.seconds, 1e-9):.0f} nps)")
+    stats = searcher.table.stats()
+    print(f"hash hits {stats['hits']} / misses {stats['misses']} ({stats['hit_rate']:.1%})")
+    if searcher.move_cache is not None:
+        print(searcher.move_cache.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,585 @@
+# Compact position representation for Split Chess.
+#
+# The board is a flat bytearray of 64 squares indexed as y * 8 + x, where
+# row 0 is Black's back rank (the same orientation as ChessBoard.board).
+# Every piece is packed into one small integer:
+#
+#   bits 0-2  piece type (PAWN .. KING, 0 means empty)
+#   bits 3-4  fraction (FULL, HALF, QUARTER, EIGHTH)
+#   bit  5    color (WHITE = 0, BLACK = 1)
+#
+# Move generation and commits work directly on these integers, so no string
+# parsing happens on the hot paths. The string form ("w_knight_half") is only
+# used when converting to and from the drawing code.
+
+import random
+import re
+
+ROWS, COLS = 8, 8
+
+EMPTY = 0
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(1, 7)
+FULL, HALF, QUARTER, EIGHTH = range(4)
+WHITE, BLACK = 0, 1
+
+TYPE_MASK = 7
+FRACTION_SHIFT = 3
+COLOR_SHIFT = 5
+
+NO_SQUARE = -1
+
+# Castling rights are kept as a 4 bit mask
+WHITE_KING_SIDE = 1
+WHITE_QUEEN_SIDE = 2
+BLACK_KING_SIDE = 4
+BLACK_QUEEN_SIDE = 8
+KING_SIDE = (WHITE_KING_SIDE, BLACK_KING_SIDE)
+QUEEN_SIDE = (WHITE_QUEEN_SIDE, BLACK_QUEEN_SIDE)
+ALL_CASTLING = 15
+
+COLOR_NAMES = ("w", "b")
+TYPE_NAMES = (None, "pawn", "knight", "bishop", "rook", "queen", "king")
+FRACTION_NAMES = ("", "half", "quarter", "eighth")
+
+
+def make_piece(color, piece_type, fraction=FULL):
+    return (color << COLOR_SHIFT) | (fraction << FRACTION_SHIFT) | piece_type
+
+
+def piece_color(piece):
+    return piece >> COLOR_SHIFT
+
+
+def piece_type(piece):
+    return piece & TYPE_MASK
+
+
+def piece_fraction(piece):
+    return (piece >> FRACTION_SHIFT) & 3
+
+
+def square(x, y):
+    return y * COLS + x
+
+
+# Lookup tables between the packed codes and the image names used for drawing
+PIECE_NAMES = [None] * 64
+PIECE_CODES = {}
+for _color in (WHITE, BLACK):
+    for _type in range(PAWN, KING + 1):
+        for _fraction in (FULL, HALF, QUARTER, EIGHTH):
+            _code = make_piece(_color, _type, _fraction)
+            _name = f"{COLOR_NAMES[_color]}_{TYPE_NAMES[_type]}"
+            if _fraction != FULL:
+                _name += f"_{FRACTION_NAMES[_fraction]}"
+            PIECE_NAMES[_code] = _name
+            PIECE_CODES[_name] = _code
+
+# Piece shown on each target when a move is split in two (full -> half -> quarter -> eighth)
+SPLIT_PIECE = [0] * 64
+# Piece placed by the commit on a target that is empty at that point. This mirrors
+# the original commit: halves become quarters, quarters eighths, anything else stays.
+PLACED_PIECE = [0] * 64
+for _code in range(64):
+    _fraction = piece_fraction(_code)
+    SPLIT_PIECE[_code] = _code + (1 << FRACTION_SHIFT) if _fraction < EIGHTH else _code
+    PLACED_PIECE[_code] = _code + (1 << FRACTION_SHIFT) if _fraction in (HALF, QUARTER) else _code
+
+WHITE_KING = make_piece(WHITE, KING)
+BLACK_KING = make_piece(BLACK, KING)
+
+
+def _on_board(x, y):
+    return 0 <= x < COLS and 0 <= y < ROWS
+
+
+def _step_targets(deltas):
+    table = []
+    for sq in range(64):
+        x, y = sq % COLS, sq // COLS
+        table.append(tuple(square(x + dx, y + dy) for dx, dy in deltas if _on_board(x + dx, y + dy)))
+    return tuple(table)
+
+
+def _ray_table(directions):
+    table = []
+    for sq in range(64):
+        x, y = sq % COLS, sq // COLS
+        rays = []
+        for dx, dy in directions:
+            ray = []
+            nx, ny = x + dx, y + dy
+            while _on_board(nx, ny):
+                ray.append(square(nx, ny))
+                nx += dx
+                ny += dy
+            if ray:
+                rays.append(tuple(ray))
+        table.append(tuple(rays))
+    return tuple(table)
+
+
+DIAGONALS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+ORTHOGONALS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+KNIGHT_DELTAS = ((2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2))
+
+KNIGHT_TARGETS = _step_targets(KNIGHT_DELTAS)
+KING_TARGETS = _step_targets(DIAGONALS + ORTHOGONALS)
+SLIDER_RAYS = {
+    BISHOP: _ray_table(DIAGONALS),
+    ROOK: _ray_table(ORTHOGONALS),
+    QUEEN: _ray_table(DIAGONALS + ORTHOGONALS),
+}
+# Pawns: forward step per color, start row and the diagonal capture squares
+PAWN_STEP = (-COLS, COLS)
+PAWN_START_ROW = (6, 1)
+PAWN_PROMOTION_ROW = (0, 7)
+PAWN_CAPTURES = (_step_targets(((-1, -1), (1, -1))), _step_targets(((-1, 1), (1, 1))))
+
+
+FEN_LETTERS = " pnbrqk"
+FEN_FRACTIONS = "1248"
+FEN_CASTLING = {"K": WHITE_KING_SIDE, "Q": WHITE_QUEEN_SIDE, "k": BLACK_KING_SIDE, "q": BLACK_QUEEN_SIDE}
+
+
+def square_name(sq):
+    return "abcdefgh"[sq % COLS] + str(ROWS - sq // COLS)
+
+
+def parse_square(name):
+    # Inverse of square_name
+    return square("abcdefgh".index(name[0]), ROWS - int(name[1]))
+
+
+# Move flags
+CAPTURE = 1
+CASTLE = 2
+EN_PASSANT = 4
+PROMOTION = 8
+DOUBLE_PUSH = 16
+SPLIT = 32
+
+# Move notation, see Move.notation. Everything but the squares is optional when parsing.
+MOVE_PATTERN = re.compile(r"([PNBRQK])?([a-h][1-8])[-x]([a-h][1-8])(?:/x?([a-h][1-8]))?(=Q)?(\^[248])?( e\.p\.| O-O-O| O-O)?")
+
+
+class Move:
+    # A move of the piece on src to one target, or split between two targets.
+    # fraction is the fraction of the moved piece(s) and captured holds the piece
+    # found on each target before the move (EMPTY if none).
+    __slots__ = ("src", "targets", "piece", "fraction", "captured", "flags")
+
+    def __init__(self, src, targets, piece, fraction, captured, flags):
+        self.src = src
+        self.targets = targets
+        self.piece = piece
+        self.fraction = fraction
+        self.captured = captured
+        self.flags = flags
+
+    def __eq__(self, other):
+        return isinstance(other, Move) and self.src == other.src and self.targets == other.targets
+
+    def __hash__(self):
+        return hash((self.src, self.targets))
+
+    @property
+    def code(self):
+        # The move packed into 19 bits: src, first target and second target + 1 (0 if none)
+        second = self.targets[1] + 1 if len(self.targets) == 2 else 0
+        return self.src | self.targets[0] << 6 | second << 12
+
+    @property
+    def notation(self):
+        # Piece letter and source, each target after "-" (first) or "/" (second)
+        # with an "x" when it captures, "=Q" for a promotion, the fraction the
+        # moved piece ends up with when it is not whole, then " e.p.", " O-O" or
+        # " O-O-O". E.g. "Pe2-e4", "Nb1-a3/xc3^2", "Pb7xa8=Q^2", "Ke1-g1 O-O".
+        text = FEN_LETTERS[self.piece & TYPE_MASK].upper() + square_name(self.src)
+        for index, target in enumerate(self.targets):
+            # The en passant target is empty; it is the pawn's diagonal one
+            captures = self.captured[index] or self.flags & EN_PASSANT and target % COLS != self.src % COLS
+            text += ("x", "/x")[index] if captures else ("-", "/")[index]
+            text += square_name(target)
+        if self.flags & PROMOTION:
+            text += "=Q"
+        if self.fraction != FULL:
+            text += "^" + FEN_FRACTIONS[self.fraction]
+        if self.flags & EN_PASSANT:
+            text += " e.p."
+        elif self.flags & CASTLE:
+            text += " O-O" if self.targets[0] > self.src else " O-O-O"
+        return text
+
+    def __repr__(self):
+        return f"Move({square_name(self.src)}-{'/'.join(square_name(target) for target in self.targets)})"
+
+
+# Zobrist keys: one random 64-bit number per piece code and square (zero for
+# empty squares), for black to move, per castling rights mask and per en
+# passant square. The last entry of ZOBRIST_EN_PASSANT is used for NO_SQUARE.
+_zobrist_random = random.Random(20240613)
+ZOBRIST_PIECES = [[0] * 64 if code not in PIECE_CODES.values() else [_zobrist_random.getrandbits(64) for _ in range(64)]
+                  for code in range(64)]
+ZOBRIST_TURN = _zobrist_random.getrandbits(64)
+ZOBRIST_CASTLING = [0] + [_zobrist_random.getrandbits(64) for _ in range(ALL_CASTLING)]
+ZOBRIST_EN_PASSANT = [_zobrist_random.getrandbits(64) for _ in range(64)] + [0]
+
+
+class Position:
+    __slots__ = ("squares", "turn", "castling", "en_passant", "history", "key")
+
+    def __init__(self, squares=None, turn=WHITE, castling=ALL_CASTLING, en_passant=NO_SQUARE):
+        self.squares = bytearray(64) if squares is None else bytearray(squares)
+        self.turn = turn
+        self.castling = castling
+        self.en_passant = en_passant
+        self.history = []  # Undo records of the moves played with make_move
+        self.key = self.compute_key()  # Zobrist hash key, updated by make_move and unmake_move
+
+    @classmethod
+    def initial(cls):
+        return cls.from_board(INITIAL_BOARD)
+
+    @classmethod
+    def from_board(cls, board, turn=WHITE, castling=ALL_CASTLING, en_passant=NO_SQUARE):
+        # Build a position from the 8x8 list of piece strings used by the drawing code
+        squares = bytearray(64)
+        for y, row in enumerate(board):
+            for x, name in enumerate(row):
+                if name:
+                    squares[square(x, y)] = PIECE_CODES[name]
+        return cls(squares, turn, castling, en_passant)
+
+    def to_board(self):
+        names = PIECE_NAMES
+        squares = self.squares
+        return [[names[squares[y * COLS + x]] for x in range(COLS)] for y in range(ROWS)]
+
+    @classmethod
+    def from_fen(cls, fen):
+        # FEN with fractions written after the piece letter: "N^2" is a half
+        # knight, "n^4" a black quarter knight and "Q^8" an eighth queen.
+        # Only placement, side to move, castling and en passant are used.
+        fields = fen.split()
+        squares = bytearray(64)
+        for y, rank in enumerate(fields[0].split("/")):
+            x = 0
+            i = 0
+            while i < len(rank):
+                char = rank[i]
+                i += 1
+                if char.isdigit():
+                    x += int(char)
+                    continue
+                fraction = FULL
+                if rank[i:i + 1] == "^":
+                    fraction = FEN_FRACTIONS.index(rank[i + 1])
+                    i += 2
+                color = WHITE if char.isupper() else BLACK
+                squares[square(x, y)] = make_piece(color, FEN_LETTERS.index(char.lower()), fraction)
+                x += 1
+        turn = WHITE if len(fields) < 2 or fields[1] == "w" else BLACK
+        castling = 0
+        for char in fields[2] if len(fields) > 2 else "":
+            castling |= FEN_CASTLING.get(char, 0)
+        en_passant = NO_SQUARE
+        if len(fields) > 3 and fields[3] != "-":
+            en_passant = parse_square(fields[3])
+        return cls(squares, turn, castling, en_passant)
+
+    def to_fen(self):
+        ranks = []
+        for y in range(ROWS):
+            rank = ""
+            empty = 0
+            for x in range(COLS):
+                piece = self.squares[square(x, y)]
+                if not piece:
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                letter = FEN_LETTERS[piece & TYPE_MASK]
+                rank += letter.upper() if piece >> COLOR_SHIFT == WHITE else letter
+                if piece_fraction(piece):
+                    rank += "^" + FEN_FRACTIONS[piece_fraction(piece)]
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        castling = "".join(char for char, right in FEN_CASTLING.items() if self.castling & right) or "-"
+        en_passant = "-" if self.en_passant == NO_SQUARE else square_name(self.en_passant)
+        return f"{'/'.join(ranks)} {COLOR_NAMES[self.turn]} {castling} {en_passant}"
+
+    def copy(self):
+        return type(self)(self.squares, self.turn, self.castling, self.en_passant)
+
+    def __eq__(self, other):
+        return (isinstance(other, Position) and self.squares == other.squares and self.turn == other.turn
+                and self.castling == other.castling and self.en_passant == other.en_passant)
+
+    def __repr__(self):
+        return f"Position({self.to_fen()!r})"
+
+    def piece_moves(self, sq):
+        # Target squares for the piece standing on sq, following the same rules
+        # (and the same order) as the original string based move generator.
+        squares = self.squares
+        piece = squares[sq]
+        kind = piece & TYPE_MASK
+        color = piece >> COLOR_SHIFT
+        moves = []
+        if kind == PAWN:
+            step = PAWN_STEP[color]
+            forward = sq + step
+            if 0 <= forward < 64 and not squares[forward]:
+                moves.append(forward)
+                if sq // COLS == PAWN_START_ROW[color] and not squares[forward + step]:
+                    moves.append(forward + step)
+            for target in PAWN_CAPTURES[color][sq]:
+                other = squares[target]
+                if other and other >> COLOR_SHIFT != color:  # Normal capture
+                    moves.append(target)
+                elif target == self.en_passant:  # En passant capture
+                    moves.append(target)
+        elif kind == KNIGHT or kind == KING:
+            for target in (KNIGHT_TARGETS if kind == KNIGHT else KING_TARGETS)[sq]:
+                other = squares[target]
+                if not other or other >> COLOR_SHIFT != color:
+                    moves.append(target)
+            if kind == KING:
+                # Castling only needs the squares between king and rook to be empty
+                x = sq % COLS
+                if self.castling & KING_SIDE[color] and x + 2 < COLS:
+                    if not squares[sq + 1] and not squares[sq + 2]:
+                        moves.append(sq + 2)
+                if self.castling & QUEEN_SIDE[color] and x - 3 >= 0:
+                    if not squares[sq - 1] and not squares[sq - 2] and not squares[sq - 3]:
+                        moves.append(sq - 2)
+        elif kind:
+            for ray in SLIDER_RAYS[kind][sq]:
+                for target in ray:
+                    other = squares[target]
+                    if not other:
+                        moves.append(target)
+                    else:
+                        if other >> COLOR_SHIFT != color:
+                            moves.append(target)
+                        break
+        return moves
+
+    def create_move(self, src, targets):
+        # Describe moving the piece on src to one or two targets in this position
+        squares = self.squares
+        piece = squares[src]
+        kind = piece & TYPE_MASK
+        captured = tuple(squares[target] for target in targets)
+        flags = 0
+        if len(targets) == 2:
+            flags |= SPLIT
+        if self.en_passant in targets:
+            flags |= EN_PASSANT | CAPTURE
+        if any(captured):
+            flags |= CAPTURE
+        if kind == KING and abs(targets[0] % COLS - src % COLS) == 2:
+            flags |= CASTLE
+        elif kind == PAWN:
+            promotion_row = PAWN_PROMOTION_ROW[piece >> COLOR_SHIFT]
+            if any(target // COLS == promotion_row for target in targets):
+                flags |= PROMOTION
+            if abs(src // COLS - targets[0] // COLS) == 2:
+                flags |= DOUBLE_PUSH
+        fraction = piece_fraction(piece if len(targets) == 1 else SPLIT_PIECE[piece])
+        return Move(src, tuple(targets), piece, fraction, captured, flags)
+
+    def move_from_code(self, code):
+        # Rebuild a move packed with Move.code for this position
+        second = code >> 12
+        targets = (code >> 6 & 63,) if not second else (code >> 6 & 63, second - 1)
+        return self.create_move(code & 63, targets)
+
+    def parse_move(self, text):
+        # The legal move written as text in Move.notation; plain squares such as
+        # "e2-e4/e3" are accepted too. Raises ValueError for anything else.
+        match = MOVE_PATTERN.fullmatch(text.strip())
+        if not match:
+            raise ValueError(f"Bad move notation {text!r}")
+        targets = (parse_square(match[3]),) if not match[4] else (parse_square(match[3]), parse_square(match[4]))
+        move = written = self.create_move(parse_square(match[2]), targets)
+        moves = self.generate_moves()
+        if move not in moves and len(targets) == 2:
+            # Pairs are generated in one order only unless the order matters (double pushes)
+            move = self.create_move(move.src, targets[::-1])
+        if move not in moves:
+            raise ValueError(f"Illegal move {text!r} in {self!r}")
+        if match[1] and text.strip() != written.notation:
+            raise ValueError(f"Move {text!r} does not fit the position, it is {written.notation!r}")
+        return move
+
+    def generate_moves(self):
+        # Every move of the side to move: each valid target on its own and, for
+        # pieces that may split, every pair of targets. A pawn pair containing a
+        # double push is listed in both orders because only the first target
+        # sets the en passant square.
+        if self.winner() is not None:
+            return []
+        squares = self.squares
+        turn = self.turn
+        moves = []
+        for src in range(64):
+            piece = squares[src]
+            if piece and piece >> COLOR_SHIFT == turn:
+                self.add_piece_moves(moves, src, piece, self.piece_moves(src))
+        return moves
+
+    def generate_captures(self):
+        # Moves of the side to move whose every target captures something
+        # (including en passant): single captures and splits onto two captures.
+        if self.winner() is not None:
+            return []
+        squares = self.squares
+        turn = self.turn
+        en_passant = self.en_passant
+        moves = []
+        for src in range(64):
+            piece = squares[src]
+            if piece and piece >> COLOR_SHIFT == turn:
+                targets = [target for target in self.piece_moves(src) if squares[target] or target == en_passant]
+                if targets:
+                    self.add_piece_moves(moves, src, piece, targets)
+        return moves
+
+    def add_piece_moves(self, moves, src, piece, targets):
+        # Append the single and split moves of one piece given its valid targets
+        create = self.create_move
+        for target in targets:
+            moves.append(create(src, (target,)))
+        kind = piece & TYPE_MASK
+        if kind == KING or piece_fraction(piece) == EIGHTH:
+            return
+        count = len(targets)
+        for i in range(count):
+            for j in range(i + 1, count):
+                first, second = targets[i], targets[j]
+                moves.append(create(src, (first, second)))
+                if kind == PAWN and (abs(first - src) == 2 * COLS or abs(second - src) == 2 * COLS):
+                    moves.append(create(src, (second, first)))
+
+    def make_move(self, move):
+        # Play a move created for this position. The steps and their order follow
+        # the original ChessBoard.commit_move exactly, including the ghost pieces
+        # the board shows before the move is committed. Every square write is
+        # logged so unmake_move can restore the position without copying it.
+        squares = self.squares
+        src = move.src
+        targets = move.targets
+        flags = move.flags
+        piece = squares[src]
+        kind = piece & TYPE_MASK
+        color = piece >> COLOR_SHIFT
+        changes = []
+        record = changes.append
+        self.history.append((changes, self.castling, self.en_passant, self.key))
+        key = self.key ^ ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_EN_PASSANT[self.en_passant]
+
+        # Ghost pieces: a single target keeps the piece whole, two targets split it
+        ghost = piece if len(targets) == 1 else SPLIT_PIECE[piece]
+        for target in targets:
+            record((target, squares[target]))
+            squares[target] = ghost
+
+        if flags & EN_PASSANT:
+            # Remove the pawn that was captured en passant
+            captured_pawn = self.en_passant + (COLS if color == WHITE else -COLS)
+            record((captured_pawn, squares[captured_pawn]))
+            squares[captured_pawn] = EMPTY
+            # Place pieces on targets that were emptied by the capture
+            for target in targets:
+                if not squares[target]:
+                    squares[target] = PLACED_PIECE[piece]
+
+        if flags & CASTLE:
+            target = targets[0]
+            row = target - target % COLS
+            if target > src:  # King-side castling
+                rook_from, rook_to = row + 7, target - 1
+            else:  # Queen-side castling
+                rook_from, rook_to = row, target + 1
+            record((rook_to, squares[rook_to]))
+            squares[rook_to] = squares[rook_from]
+            record((rook_from, squares[rook_from]))
+            squares[rook_from] = EMPTY
+
+        # Remove the original piece
+        record((src, piece))
+        squares[src] = EMPTY
+
+        # Disable castling rights if the king or rooks move
+        if kind == KING:
+            self.castling &= ~(KING_SIDE[color] | QUEEN_SIDE[color])
+        elif kind == ROOK:
+            if src % COLS == 0:
+                self.castling &= ~QUEEN_SIDE[color]
+            elif src % COLS == 7:
+                self.castling &= ~KING_SIDE[color]
+
+        # Promote pawns to queens of the same fraction
+        if flags & PROMOTION:
+            promotion_row = PAWN_PROMOTION_ROW[color]
+            for target in targets:
+                landed = squares[target]
+                if landed & TYPE_MASK == PAWN and target // COLS == promotion_row:
+                    squares[target] = make_piece(color, QUEEN, piece_fraction(landed))
+
+        # Set en passant target square if a pawn moves two squares forward
+        if flags & DOUBLE_PUSH:
+            self.en_passant = (src + targets[0]) // 2
+        else:
+            self.en_passant = NO_SQUARE
+
+        self.turn ^= 1
+
+        # Update the hash key from the first logged value of each changed square
+        for sq, old in dict(reversed(changes)).items():
+            key ^= ZOBRIST_PIECES[old][sq] ^ ZOBRIST_PIECES[squares[sq]][sq]
+        self.key = key ^ ZOBRIST_TURN ^ ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_EN_PASSANT[self.en_passant]
+
+    def unmake_move(self):
+        # Take back the last move played with make_move
+        changes, self.castling, self.en_passant, self.key = self.history.pop()
+        squares = self.squares
+        for sq, piece in reversed(changes):
+            squares[sq] = piece
+        self.turn ^= 1
+
+    def compute_key(self):
+        # Zobrist key of the position computed from scratch
+        key = ZOBRIST_TURN if self.turn == BLACK else 0
+        for sq, piece in enumerate(self.squares):
+            key ^= ZOBRIST_PIECES[piece][sq]
+        return key ^ ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_EN_PASSANT[self.en_passant]
+
+    def commit(self, src, targets):
+        self.make_move(self.create_move(src, targets))
+
+    def winner(self):
+        # The game ends as soon as a king has been captured
+        squares = self.squares
+        if WHITE_KING not in squares:
+            return BLACK
+        if BLACK_KING not in squares:
+            return WHITE
+        return None
+
+
+INITIAL_BOARD = [
+    ["b_rook", "b_knight", "b_bishop", "b_queen", "b_king", "b_bishop", "b_knight", "b_rook"],
+    ["b_pawn"] * 8,
+    [None] * 8,
+    [None] * 8,
+    [None] * 8,
+    [None] * 8,
+    ["w_pawn"] * 8,
+    ["w_rook", "w_knight", "w_bishop", "w_queen", "w_king", "w_bishop", "w_knight", "w_rook"]
+]
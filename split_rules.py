@@ -0,0 +1,190 @@
+# Headless rules core for Split Chess.
+#
+# Everything needed to play a game (selection, split moves, commits, promotion,
+# en passant, castling and win detection) lives here without any pygame
+# dependency, so analysis tools can import it in milliseconds. SplitChess.py
+# puts a pygame front end on top of this ChessBoard.
+from enum import Enum, auto
+
+from indexed_position import IndexedPosition
+from move_cache import MoveCache
+from split_position import (COLS, EIGHTH, KING, KING_SIDE, NO_SQUARE, PIECE_NAMES, QUEEN_SIDE, SPLIT_PIECE, piece_color,
+                            piece_fraction, piece_type, square)
+
+
+# Piece types
+class PieceType(Enum):
+    PAWN = auto()
+    KNIGHT = auto()
+    BISHOP = auto()
+    ROOK = auto()
+    QUEEN = auto()
+    KING = auto()
+
+
+# Piece colors
+class PieceColor(Enum):
+    WHITE = "w"
+    BLACK = "b"
+
+
+COLORS_BY_INDEX = (PieceColor.WHITE, PieceColor.BLACK)
+
+
+class ChessBoard:
+    # Keeps piece lists and king squares up to date move by move, so the
+    # game-over check after a commit does not scan the board
+    position_class = IndexedPosition
+
+    def __init__(self, move_cache=None):
+        # Valid targets by position and square, kept across games and shareable between boards
+        self.move_cache = MoveCache() if move_cache is None else move_cache
+        self.reset()
+
+    def reset(self):
+        # Reset the game state to the initial setup.
+        self.position = self.position_class.initial()
+        self.selected_piece = None  # Piece code of the selected piece
+        self.selected_sq = None  # Its square
+        self.valid_targets = []  # Target squares of the selected piece
+        self.potential_targets = []  # Track potential moves before committing
+        self.ghosts = {}  # Ghost pieces shown on potential moves, keyed by square
+        self.game_over = False  # Track if the game is over
+        self.winner = None  # Track the winner
+
+    @property
+    def turn(self):
+        return COLORS_BY_INDEX[self.position.turn]
+
+    @property
+    def en_passant_target(self):
+        en_passant = self.position.en_passant
+        return None if en_passant == NO_SQUARE else (en_passant % COLS, en_passant // COLS)
+
+    @property
+    def castling_rights(self):
+        # Read-only: {PieceColor: {"king_side": bool, "queen_side": bool}}
+        castling = self.position.castling
+        return {color: {"king_side": bool(castling & KING_SIDE[index]),
+                        "queen_side": bool(castling & QUEEN_SIDE[index])} for index, color in enumerate(COLORS_BY_INDEX)}
+
+    # The selection as (x, y) tuples, like before the board kept square numbers.
+    # The lists are copies: append to potential_targets, not potential_moves.
+    @property
+    def selected_pos(self):
+        return None if self.selected_sq is None else (self.selected_sq % COLS, self.selected_sq // COLS)
+
+    @selected_pos.setter
+    def selected_pos(self, pos):
+        self.selected_sq = None if pos is None else square(*pos)
+
+    @property
+    def valid_moves(self):
+        return [(sq % COLS, sq // COLS) for sq in self.valid_targets]
+
+    @valid_moves.setter
+    def valid_moves(self, positions):
+        self.valid_targets = [square(x, y) for x, y in positions]
+
+    @property
+    def potential_moves(self):
+        return [(sq % COLS, sq // COLS) for sq in self.potential_targets]
+
+    @potential_moves.setter
+    def potential_moves(self, positions):
+        self.potential_targets = [square(x, y) for x, y in positions]
+
+    @property
+    def board(self):
+        # String form of the board as it is displayed, ghost pieces included
+        board = self.position.to_board()
+        for sq, ghost in self.ghosts.items():
+            board[sq // COLS][sq % COLS] = PIECE_NAMES[ghost]
+        return board
+
+    def get_valid_moves(self, piece, x, y):
+        # Valid moves of the piece on (x, y) as (x, y) tuples
+        return [(target % COLS, target // COLS) for target in self.move_cache.piece_moves(self.position, square(x, y))]
+
+    def click_square(self, col, row):
+        # Select a piece, add or remove a potential move, in board coordinates
+        if self.game_over:
+            return  # Ignore board clicks once the game is over
+        sq = square(col, row)
+
+        if self.selected_piece:
+            # Check if the player clicks on the same piece again to deselect it
+            if sq == self.selected_sq and len(self.potential_targets) == 0:
+                # Deselect the piece only if no moves have been made
+                self.selected_piece = None
+                self.selected_sq = None
+                self.valid_targets = []
+                self.potential_targets = []
+                return
+
+            # Check if the player clicks on a selected move option to deselect it
+            if sq in self.potential_targets:
+                # Remove the move and its ghost piece, uncovering any piece it was about to capture
+                self.potential_targets.remove(sq)
+                del self.ghosts[sq]
+
+                # If there's still one move left, revert it to a full ghost piece
+                if len(self.potential_targets) == 1:
+                    self.ghosts[self.potential_targets[0]] = self.selected_piece
+                return
+
+            if sq in self.valid_targets:
+                # Prevent kings from performing quantum moves
+                if piece_type(self.selected_piece) == KING and len(self.potential_targets) >= 1:
+                    return  # Kings can only have one move
+
+                # Prevent eighth pieces from splitting
+                if piece_fraction(self.selected_piece) == EIGHTH and len(self.potential_targets) >= 1:
+                    return  # Eighth pieces cannot split
+
+                elif (len(self.potential_targets) >= 2):
+                    return  # Half and quarter pieces can only split into two moves
+
+                # Add the move to potential moves
+                self.potential_targets.append(sq)
+
+                # Update ghost pieces
+                if len(self.potential_targets) == 1:
+                    # Display a full ghost piece
+                    self.ghosts[sq] = self.selected_piece
+                else:
+                    # Split the ghost piece into smaller pieces
+                    for target in self.potential_targets:
+                        self.ghosts[target] = SPLIT_PIECE[self.selected_piece]
+        else:
+            piece = self.position.squares[sq]
+            if piece and piece_color(piece) == self.position.turn:
+                self.selected_piece = piece
+                self.selected_sq = sq
+                self.valid_targets = self.move_cache.piece_moves(self.position, sq)
+                self.potential_targets = []  # Reset potential moves when a new piece is selected
+
+    def play_move(self, move):
+        # Play a complete Move (for example one picked by the computer player)
+        # through the same selection and commit steps as a player would
+        self.selected_piece = self.position.squares[move.src]
+        self.selected_sq = move.src
+        self.potential_targets = list(move.targets)
+        self.commit_move()
+
+    def commit_move(self):
+        if self.selected_piece and self.potential_targets:
+            self.position.commit(self.selected_sq, self.potential_targets)
+
+            # Reset the selected piece, potential moves, and ghost pieces
+            self.selected_piece = None
+            self.selected_sq = None
+            self.valid_targets = []
+            self.potential_targets = []
+            self.ghosts = {}
+
+            # Check if either player has lost their king
+            winner = self.position.winner()
+            if winner is not None:
+                self.game_over = True
+                self.winner = COLORS_BY_INDEX[winner]
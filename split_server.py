@@ -0,0 +1,281 @@
+# asyncio game server for Split Chess.
+#
+# Hosts any number of games on the headless rules core (split_rules) over
+# TCP with a line based protocol. Every line is one command or event; its
+# first letter says which, squares are written by name (e2):
+#
+#   client -> server                        server -> client
+#   J <game>           join or create game   J <color> <fen>        joined as w, b or s (spectator)
+#   S <square>         click a square        S <selected|-> <target> ...   selection and potential targets
+#   P                  pass: commit          M <notation>           a move was committed (sent to the whole game)
+#   M <src> <t> [<t>]  play a whole move     G <result> <reason>    the game is over
+#   R                  resign                N <fen>                the game was restarted
+#   N                  restart after the end L <color>              a player left
+#   I                  server info           I <games> <clients> <cpu seconds> <max rss kB>
+#                                            E <message>            the command was rejected
+#
+# Every move is checked on the server against ChessBoard.get_valid_moves and
+# the split rules (kings and eighths do not split, at most two targets)
+# before it is played. A game only keeps its board: a Position with the last
+# two undo records and the current selection; the valid move cache is shared
+# by all games. Outgoing lines go straight into the transport's buffer: after
+# answering a command the server waits for the buffer to drain (so a client
+# that does not read stops being read), and a client whose buffer grows past
+# MAX_BUFFERED with events caused by others is disconnected.
+import argparse
+import asyncio
+import re
+import resource
+import time
+
+import instrument
+from move_cache import LOOKBACK, MoveCache
+from split_position import COLS, EIGHTH, KING, Position, parse_square, piece_color, piece_fraction, piece_type, square_name
+from split_rules import COLORS_BY_INDEX, ChessBoard
+
+MAX_BUFFERED = 1 << 18  # Unsent bytes per client before it counts as too slow
+MAX_LINE = 128  # Longest command accepted
+MOVE_CACHE_ENTRIES = 1 << 18  # Shared by all games
+FILE_LIMIT = 1 << 16  # Open sockets wanted, two per game
+BACKLOG = 1024  # Connections waiting to be accepted, for many players joining at once
+COLOR_LETTERS = ("w", "b")
+SQUARE_PATTERN = re.compile(r"[a-h][1-8]")
+RESULTS = {"WHITE": "1-0", "BLACK": "0-1"}
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class ServerBoard(ChessBoard):
+    # A plain Position keeps hosted games small; winner() is a fast scan of 64 bytes
+    position_class = Position
+
+
+class Game:
+    __slots__ = ("name", "board", "players", "spectators", "reason")
+
+    def __init__(self, name, move_cache):
+        self.name = name
+        self.board = ServerBoard(move_cache)
+        self.players = [None, None]
+        self.spectators = []
+        self.reason = None  # Why the game ended: "king captured" or "resigned"
+
+    def clients(self):
+        return [client for client in self.players if client is not None] + self.spectators
+
+
+class Client:
+    __slots__ = ("writer", "game", "color")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.game = None
+        self.color = None  # WHITE, BLACK or None for a spectator
+
+
+def read_square(text):
+    if not SQUARE_PATTERN.fullmatch(text):
+        raise ProtocolError(f"bad square {text!r}")
+    return parse_square(text)
+
+
+class GameServer:
+    def __init__(self):
+        self.games = {}
+        self.clients = 0
+        self.move_cache = MoveCache(MOVE_CACHE_ENTRIES)
+
+    async def handle(self, reader, writer):
+        client = Client(writer)
+        self.clients += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break  # Line too long or connection reset
+                if not line:
+                    break
+                replies = self.dispatch(client, line.decode("ascii", "replace").strip())
+                if replies:
+                    writer.write("".join(reply + "\n" for reply in replies).encode())
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.leave(client)
+            self.clients -= 1
+            writer.close()
+
+    def send(self, client, text):
+        # Event for a client that did not ask for it: never wait, drop slow clients
+        transport = client.writer.transport
+        if transport.is_closing():
+            return
+        if transport.get_write_buffer_size() > MAX_BUFFERED:
+            transport.abort()
+        else:
+            transport.write((text + "\n").encode())
+
+    def broadcast(self, game, text, skip=None):
+        for client in game.clients():
+            if client is not skip:
+                self.send(client, text)
+
+    def dispatch(self, client, line):
+        # Handle one command and return the lines to send back to its client
+        command, _, argument = line.partition(" ")
+        try:
+            if command == "J":
+                return self.join(client, argument.strip())
+            if command == "I":
+                usage = resource.getrusage(resource.RUSAGE_SELF)
+                return [f"I {len(self.games)} {self.clients} {time.process_time():.3f} {usage.ru_maxrss}"]
+            game = client.game
+            if game is None:
+                raise ProtocolError("join a game first")
+            board = game.board
+            if command == "N":
+                if not board.game_over:
+                    raise ProtocolError("the game is not over")
+                board.reset()
+                game.reason = None
+                self.broadcast(game, f"N {board.position.to_fen()}")
+                return []
+            if client.color is None:
+                raise ProtocolError("spectators cannot play")
+            if board.game_over:
+                raise ProtocolError("the game is over")
+            if command == "R":
+                board.game_over = True
+                board.winner = COLORS_BY_INDEX[client.color ^ 1]
+                game.reason = "resigned"
+                self.finish(game)
+                return []
+            if board.position.turn != client.color:
+                raise ProtocolError("not your turn")
+            if command == "S":
+                sq = read_square(argument.strip())
+                board.click_square(sq % COLS, sq // COLS)
+                selected = "-" if board.selected_sq is None else square_name(board.selected_sq)
+                return [" ".join(["S", selected] + [square_name(target) for target in board.potential_targets])]
+            if command == "P":
+                if not board.selected_piece or not board.potential_targets:
+                    raise ProtocolError("nothing to commit")
+                self.commit(game)
+                return []
+            if command == "M":
+                squares = [read_square(name) for name in argument.split()]
+                if not 2 <= len(squares) <= 3:
+                    raise ProtocolError("a move is a source and one or two targets")
+                self.validate(board, squares[0], squares[1:])
+                board.selected_piece = board.position.squares[squares[0]]
+                board.selected_sq = squares[0]
+                board.potential_targets = squares[1:]
+                self.commit(game)
+                return []
+            raise ProtocolError(f"unknown command {command!r}")
+        except ProtocolError as error:
+            return [f"E {error}"]
+
+    def validate(self, board, src, targets):
+        piece = board.position.squares[src]
+        if not piece or piece_color(piece) != board.position.turn:
+            raise ProtocolError(f"no piece of yours on {square_name(src)}")
+        valid = board.get_valid_moves(piece, src % COLS, src // COLS)
+        for target in targets:
+            if (target % COLS, target // COLS) not in valid:
+                raise ProtocolError(f"{square_name(src)} cannot move to {square_name(target)}")
+        if len(targets) == 2:
+            if targets[0] == targets[1]:
+                raise ProtocolError("the two targets must differ")
+            if piece_type(piece) == KING or piece_fraction(piece) == EIGHTH:
+                raise ProtocolError("kings and eighth pieces cannot split")
+
+    def commit(self, game):
+        board = game.board
+        position = board.position
+        notation = position.create_move(board.selected_sq, board.potential_targets).notation
+        board.commit_move()
+        del position.history[:-LOOKBACK]  # Only the move cache looks back, and not further than this
+        self.broadcast(game, f"M {notation}")
+        if board.game_over:
+            game.reason = "king captured"
+            self.finish(game)
+
+    def finish(self, game):
+        board = game.board
+        self.broadcast(game, f"G {RESULTS[board.winner.name]} {game.reason}")
+
+    def join(self, client, name):
+        if not name or len(name) > 64 or " " in name:
+            raise ProtocolError("bad game name")
+        if client.game is not None:
+            raise ProtocolError("already in a game")
+        game = self.games.get(name)
+        if game is None:
+            game = self.games[name] = Game(name, self.move_cache)
+        if game.players[0] is None or game.players[1] is None:
+            client.color = 0 if game.players[0] is None else 1
+            game.players[client.color] = client
+            letter = COLOR_LETTERS[client.color]
+        else:
+            game.spectators.append(client)
+            letter = "s"
+        client.game = game
+        return [f"J {letter} {game.board.position.to_fen()}"]
+
+    def leave(self, client):
+        game = client.game
+        if game is None:
+            return
+        if client.color is None:
+            game.spectators.remove(client)
+        else:
+            game.players[client.color] = None
+            self.broadcast(game, f"L {COLOR_LETTERS[client.color]}")
+        client.game = None
+        if not game.clients():
+            del self.games[game.name]
+
+
+async def serve(host, port):
+    server = GameServer()
+    listener = await asyncio.start_server(server.handle, host, port, limit=MAX_LINE, backlog=BACKLOG)
+    address = listener.sockets[0].getsockname()
+    print(f"serving Split Chess on {address[0]}:{address[1]}", flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+
+def raise_file_limit():
+    # Every player is a socket: allow as many open files as the hard limit does
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = FILE_LIMIT if hard == resource.RLIM_INFINITY else min(hard, FILE_LIMIT)
+    if soft != resource.RLIM_INFINITY and soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host Split Chess games over TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on (0 picks a free one)")
+    parser.add_argument("--instrument", metavar="FILE",
+                        help="time move validation and commits and write the histograms to FILE as JSON on exit")
+    args = parser.parse_args(argv)
+    raise_file_limit()
+    if args.instrument:
+        instrument.enable()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.instrument:
+            instrument.dump(args.instrument)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# Pre-scaled sprite atlases for the piece images.
+#
+# All piece images of one square size are packed into a single surface and
+# handed out as subsurfaces of it, keyed by the packed piece codes of
+# split_position. An atlas is only built the first time its size is asked for
+# and is then saved as a PNG under .sprite_cache/, named after the square size
+# and a hash of the source files, so later starts (and window sizes seen
+# before) load one file instead of decoding and scaling every image. Editing
+# an image in images/ changes the hash, which rebuilds the atlas.
+import hashlib
+import os
+
+import pygame
+
+from split_position import FULL, KING, PIECE_CODES, piece_fraction, piece_type
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+IMAGE_DIR = os.path.join(BASE_PATH, "images")
+CACHE_DIR = os.path.join(BASE_PATH, ".sprite_cache")
+ATLAS_COLUMNS = 8
+ATLAS_VERSION = 1  # Part of the cache key, bump it when the layout changes
+
+# Names of the sprites in atlas order, e.g. "w_knight_half"; kings never split
+SPRITE_NAMES = sorted(name for name, code in PIECE_CODES.items()
+                      if piece_type(code) != KING or piece_fraction(code) == FULL)
+
+atlases = {}  # Square size -> SpriteAtlas
+source_images = {}  # Decoded source images, kept so a new size only needs scaling
+source_digest = None
+
+
+def sources_hash():
+    # Hash of the names and contents of the source images
+    global source_digest
+    if source_digest is None:
+        digest = hashlib.sha1(f"atlas {ATLAS_VERSION} {ATLAS_COLUMNS}".encode())
+        for name in SPRITE_NAMES:
+            with open(os.path.join(IMAGE_DIR, f"{name}.png"), "rb") as source:
+                digest.update(name.encode())
+                digest.update(hashlib.sha1(source.read()).digest())
+        source_digest = digest.hexdigest()[:16]
+    return source_digest
+
+
+def cache_path(size):
+    return os.path.join(CACHE_DIR, f"atlas_{size}_{sources_hash()}.png")
+
+
+def cell(index, size):
+    return pygame.Rect(index % ATLAS_COLUMNS * size, index // ATLAS_COLUMNS * size, size, size)
+
+
+def build_surface(size):
+    # Scale every source image to size and pack them into one surface
+    rows = -(-len(SPRITE_NAMES) // ATLAS_COLUMNS)
+    surface = pygame.Surface((ATLAS_COLUMNS * size, rows * size), pygame.SRCALPHA)
+    for index, name in enumerate(SPRITE_NAMES):
+        image = source_images.get(name)
+        if image is None:
+            image = source_images[name] = pygame.image.load(os.path.join(IMAGE_DIR, f"{name}.png"))
+        surface.blit(pygame.transform.scale(image, (size, size)), cell(index, size))
+    return surface
+
+
+def load_surface(size):
+    # The atlas surface from the disk cache, building and saving it when missing
+    path = cache_path(size)
+    try:
+        surface = pygame.image.load(path)
+    except (OSError, pygame.error):
+        surface = build_surface(size)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            temporary = f"{path[:-4]}.{os.getpid()}.tmp.png"
+            pygame.image.save(surface, temporary)
+            os.replace(temporary, path)
+        except (OSError, pygame.error):
+            pass  # A read-only checkout just rebuilds the atlas on every start
+    if pygame.display.get_surface() is not None:
+        surface = surface.convert_alpha()  # Match the window's pixel format for fast blits
+    return surface
+
+
+class SpriteAtlas:
+    def __init__(self, size):
+        self.size = size
+        self.surface = load_surface(size)
+        # One subsurface per piece code, all sharing the pixels of the atlas
+        self.images = {PIECE_CODES[name]: self.surface.subsurface(cell(index, size))
+                       for index, name in enumerate(SPRITE_NAMES)}
+
+    def __getitem__(self, code):
+        return self.images[code]
+
+
+def get_atlas(size):
+    atlas = atlases.get(size)
+    if atlas is None:
+        atlas = atlases[size] = SpriteAtlas(size)
+    return atlas
@@ -0,0 +1,728 @@
+# Retrograde endgame tables for Split Chess.
+#
+# A table holds the result for the side to move (WIN, LOSS or DRAW) of every
+# placement of one material set without pawns, named like KN4N4vK: the white
+# king and two quarter knights against the lone black king. Fractions are
+# distinct pieces and, as in the game, capturing the king wins. Positions
+# have no castling rights and no en passant square. A table also covers the
+# same material with the colors swapped.
+#
+# Material only changes through captures and splits, and both lower the weight
+# sum(3 ** (3 - fraction)) of the pieces, so a table only depends on tables of
+# lower weight. generate() solves the closure of the requested sets under
+# captures and splits, lightest first. Sets with more than max_pieces pieces
+# (kings included) are left out; moves into them count as unknown, and a
+# position whose result depends on one is stored as UNKNOWN instead of guessed.
+#
+# Solving one table:
+#   1. every position is classified from its moves: capturing the king or
+#      moving into a lost position of a lighter table wins; otherwise it
+#      counts its distinct successors inside the table (only quiet single
+#      moves stay inside) and notes lighter tables it can escape to
+#   2. retrograde rounds: quiet moves taken back from lost positions give won
+#      positions, and a position loses once all its successors are won for
+#      the opponent and it has no escape. The round that decides a position is
+#      its distance: plies to a king capture or a move into a lighter table
+#      when the winner hurries and the loser holds out
+#   3. what is left is a draw, unless it can reach an unknown result
+#   4. verify() checks every entry against its successors once more
+# Steps 1, 2 and 4 run on a process pool, chunk by chunk.
+#
+# Index: side to move, the white king folded into the a8-d8-d5 triangle by the
+# eight symmetries of the board (ties broken by the rest of the placement, so
+# all eight images share one index), then every group of identical pieces as
+# a combination of squares (combinatorial number system). Entries that are not
+# the canonical image of a legal placement stay UNKNOWN and are never looked
+# up. Results are packed four to a byte, followed by the distances one byte
+# each (capped at 255); Tablebase memory-maps the files. Searches only need
+# the results; best_move() follows the distances, since knowing a position is
+# won does not tell which move makes progress.
+import argparse
+import array
+import math
+import mmap
+import multiprocessing
+import os
+import re
+import struct
+import time
+
+from split_position import (BLACK, CAPTURE, COLOR_SHIFT, COLS, EIGHTH, FRACTION_SHIFT, KING, NO_SQUARE, PAWN, SPLIT,
+                            SPLIT_PIECE, TYPE_MASK, WHITE, Position, piece_fraction, square)
+
+UNKNOWN, WIN, LOSS, DRAW = range(4)
+RESULT_NAMES = ("unknown", "win", "loss", "draw")
+
+DEFAULT_DIRECTORY = "tablebases"
+DEFAULT_MAX_PIECES = 4
+SUFFIX = ".sptb"
+MAGIC = b"SPTB"
+VERSION = 1
+HEADER = struct.Struct("<4sBQ")  # magic, version, number of entries; the material name follows
+CHUNK = 4096  # Positions per job sent to a worker
+MAX_DISTANCE = 255
+
+PIECE_LETTERS = " PNBRQK"
+MATERIAL_PATTERN = re.compile(r"(K(?:[QRBN][248]?)*)v(K(?:[QRBN][248]?)*)")
+
+# Classification flags kept per position while a table is solved
+INVALID = 1  # Not the canonical image of a legal placement
+ESCAPE = 2  # Has a move into a lighter table that does not lose for the opponent
+UNKNOWN_MOVE = 4  # Has a move into a table that is not available
+TAINTED = 8  # Can reach an unknown result through undecided positions
+
+
+def _transform(index, sq):
+    x, y = sq % COLS, sq // COLS
+    if index & 4:
+        x, y = y, x
+    if index & 1:
+        x = 7 - x
+    if index & 2:
+        y = 7 - y
+    return square(x, y)
+
+
+TRANSFORMS = [[_transform(index, sq) for sq in range(64)] for index in range(8)]
+TRIANGLE = [square(x, y) for y in range(4) for x in range(y, 4)]
+TRIANGLE_INDEX = {sq: index for index, sq in enumerate(TRIANGLE)}
+# (transform, index of the king in the triangle) for the transforms that bring a
+# white king on each square into the triangle: two for the diagonal, else one
+KING_TRANSFORMS = [[(TRANSFORMS[index], TRIANGLE_INDEX[TRANSFORMS[index][sq]]) for index in range(8)
+                    if TRANSFORMS[index][sq] in TRIANGLE_INDEX] for sq in range(64)]
+BINOMIAL = [[math.comb(n, k) for k in range(9)] for n in range(65)]
+
+
+def piece_weight(code):
+    return 0 if code & TYPE_MASK == KING else 3 ** (3 - piece_fraction(code))
+
+
+def sort_key(code):
+    # King first, then queen down to knight, whole pieces before their fractions
+    return -(code & TYPE_MASK), piece_fraction(code)
+
+
+def side_name(codes):
+    name = ""
+    for code in codes:
+        name += PIECE_LETTERS[code & TYPE_MASK]
+        if piece_fraction(code):
+            name += "1248"[piece_fraction(code)]
+    return name
+
+
+def canonical(white, black):
+    # Material as (white codes, black codes) without color bits, each side sorted,
+    # the heavier side as white; and whether the colors had to be swapped
+    white = tuple(sorted(white, key=sort_key))
+    black = tuple(sorted(black, key=sort_key))
+    if (sum(map(piece_weight, black)), [sort_key(code) for code in black]) > \
+            (sum(map(piece_weight, white)), [sort_key(code) for code in white]):
+        return (black, white), True
+    return (white, black), False
+
+
+def material_name(material):
+    return f"{side_name(material[0])}v{side_name(material[1])}"
+
+
+def parse_material(name):
+    match = MATERIAL_PATTERN.fullmatch(name)
+    if not match:
+        raise ValueError(f"Bad material {name!r}, expected something like KN4N4vK")
+    sides = []
+    for text in match.groups():
+        codes = []
+        for letter, fraction in re.findall(r"([KQRBN])([248]?)", text):
+            codes.append(PIECE_LETTERS.index(letter) | "1248".index(fraction or "1") << FRACTION_SHIFT)
+        sides.append(codes)
+    if sides[0].count(KING) != 1 or sides[1].count(KING) != 1:
+        raise ValueError(f"Bad material {name!r}, each side needs exactly one king")
+    return canonical(*sides)[0]
+
+
+def material_of(pieces):
+    # (white codes, black codes) without color bits, from (code, square) pairs
+    sides = ([], [])
+    for code, _ in pieces:
+        sides[code >> COLOR_SHIFT].append(code & ~(1 << COLOR_SHIFT))
+    return sides
+
+
+def material_successors(material):
+    # Material sets one move away: any piece but a king captured or split in two
+    for side in (WHITE, BLACK):
+        codes = material[side]
+        for index, code in enumerate(codes):
+            if code & TYPE_MASK == KING:
+                continue
+            rest = codes[:index] + codes[index + 1:]
+            for new in ([rest] if piece_fraction(code) == EIGHTH else [rest, rest + (SPLIT_PIECE[code],) * 2]):
+                sides = [material[WHITE], material[BLACK]]
+                sides[side] = new
+                yield canonical(*sides)[0]
+
+
+def material_closure(materials, max_pieces):
+    # Every set the given ones depend on, up to max_pieces pieces, lightest first
+    seen = set()
+    stack = list(materials)
+    while stack:
+        material = stack.pop()
+        if material in seen or len(material[0]) + len(material[1]) > max_pieces:
+            continue
+        seen.add(material)
+        stack.extend(material_successors(material))
+    return sorted(seen, key=lambda material: (sum(map(piece_weight, material[0] + material[1])),
+                                              len(material[0]) + len(material[1]), material_name(material)))
+
+
+class Layout:
+    # Index of the placements of one material set
+    def __init__(self, material):
+        self.material = material
+        self.name = material_name(material)
+        codes = [code | WHITE << COLOR_SHIFT for code in material[0][1:]] + \
+                [code | BLACK << COLOR_SHIFT for code in material[1]]
+        self.groups = [(code, codes.count(code), BINOMIAL[64][codes.count(code)]) for code in sorted(set(codes))]
+        self.placements = len(TRIANGLE) * math.prod(radix for _, _, radix in self.groups)
+        self.size = 2 * self.placements
+        self.pieces = 1 + len(codes)
+
+    def encode(self, pieces, turn):
+        # Index of a placement, given as (code, square) pairs
+        by_code = {}
+        for code, sq in pieces:
+            if code in by_code:
+                by_code[code].append(sq)
+            else:
+                by_code[code] = [sq]
+        best = None
+        for transform, index in KING_TRANSFORMS[by_code[KING][0]]:
+            for code, count, radix in self.groups:
+                squares = by_code[code]
+                if count == 1:
+                    rank = transform[squares[0]]
+                elif count == 2:
+                    low, high = transform[squares[0]], transform[squares[1]]
+                    if low > high:
+                        low, high = high, low
+                    rank = high * (high - 1) // 2 + low
+                else:
+                    rank = 0
+                    for position, sq in enumerate(sorted(transform[sq] for sq in squares), 1):
+                        rank += BINOMIAL[sq][position]
+                index = index * radix + rank
+            if best is None or index < best:
+                best = index
+        return turn * self.placements + best
+
+    def canonical_pieces(self, index):
+        # decode(index) when index is the canonical image of a legal placement, else None
+        decoded = self.decode(index)
+        if decoded is None:
+            return None
+        if len(KING_TRANSFORMS[decoded[1][0][1]]) > 1 and self.encode(decoded[1], decoded[0]) != index:
+            return None
+        return decoded
+
+    def decode(self, index):
+        # (turn, (code, square) pairs) of an index, or None when pieces overlap
+        turn, index = divmod(index, self.placements)
+        pieces = []
+        for code, count, radix in reversed(self.groups):
+            index, rank = divmod(index, radix)
+            sq = 63
+            for position in range(count, 0, -1):
+                while BINOMIAL[sq][position] > rank:
+                    sq -= 1
+                rank -= BINOMIAL[sq][position]
+                pieces.append((code, sq))
+                sq -= 1
+        pieces.append((KING, TRIANGLE[index]))
+        pieces.reverse()
+        if len({sq for _, sq in pieces}) < len(pieces):
+            return None
+        return turn, pieces
+
+
+def table_path(directory, material):
+    return os.path.join(directory, material_name(material) + SUFFIX)
+
+
+class Tablebase:
+    # Memory-mapped tables of a directory, opened on first use
+    def __init__(self, directory=DEFAULT_DIRECTORY):
+        self.directory = directory
+        self.tables = {}  # material -> (layout, mmap, offset of the results), None when missing
+        self.max_pieces = 0
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.endswith(SUFFIX) and MATERIAL_PATTERN.fullmatch(name[:-len(SUFFIX)]):
+                    material = parse_material(name[:-len(SUFFIX)])
+                    self.max_pieces = max(self.max_pieces, len(material[0]) + len(material[1]))
+
+    def table(self, material):
+        if material not in self.tables:
+            path = table_path(self.directory, material)
+            self.tables[material] = None
+            if os.path.exists(path):
+                self.tables[material] = open_table(path, material)
+        return self.tables[material]
+
+    def locate(self, pieces, turn):
+        # (table, index) of a pawnless placement with both kings, None without a table
+        white, black = material_of(pieces)
+        material, swapped = canonical(white, black)
+        table = self.table(material)
+        if table is None:
+            return None
+        if swapped:
+            pieces = [(code ^ 1 << COLOR_SHIFT, sq) for code, sq in pieces]
+            turn ^= 1
+        return table, table[0].encode(pieces, turn)
+
+    def lookup(self, pieces, turn):
+        # Result for the side to move
+        located = self.locate(pieces, turn)
+        if located is None:
+            return UNKNOWN
+        (layout, data, offset), index = located
+        return data[offset + (index >> 2)] >> ((index & 3) << 1) & 3
+
+    def distance(self, pieces, turn):
+        # Plies to a king capture or a lighter table for a won or lost placement
+        (layout, data, offset), index = self.locate(pieces, turn)
+        return data[offset + (layout.size + 3 >> 2) + index]
+
+    def covers(self, position):
+        squares = position.squares
+        if 64 - squares.count(0) > self.max_pieces or position.castling or position.en_passant != NO_SQUARE:
+            return False
+        return PAWN not in [code & TYPE_MASK for code in squares] and position.winner() is None
+
+    def probe(self, position):
+        # Result of a Position for the side to move, None when no table covers it
+        if not self.covers(position):
+            return None
+        result = self.lookup(pieces_of(position), position.turn)
+        return None if result == UNKNOWN else result
+
+    def best_move(self, position):
+        # The move that wins fastest from a won position, or loses slowest from a
+        # lost one; None for other positions. For the winner moving into a
+        # lighter table is the fastest of all, it can never be undone.
+        result = self.probe(position)
+        if result not in (WIN, LOSS):
+            return None
+        wanted = LOSS if result == WIN else WIN  # For the opponent
+        best = None
+        for move in position.generate_moves():
+            position.make_move(move)
+            if position.winner() is not None:
+                child, plies = wanted, -1
+            else:
+                child = self.probe(position)
+                if move.flags & (CAPTURE | SPLIT) and result == WIN:
+                    plies = -1
+                elif child == wanted:
+                    plies = self.distance(pieces_of(position), position.turn)
+            position.unmake_move()
+            if child == wanted:
+                key = plies if result == WIN else -plies
+                if best is None or key < best[0]:
+                    best = (key, move)
+        return best[1] if best else None
+
+    def close(self):
+        for table in self.tables.values():
+            if table is not None:
+                table[1].close()
+        self.tables.clear()
+
+
+def pieces_of(position):
+    return [(code, sq) for sq, code in enumerate(position.squares) if code]
+
+
+def open_table(path, material):
+    with open(path, "rb") as stream:
+        data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, size = HEADER.unpack_from(data)
+    name = material_name(material).encode()
+    layout = Layout(material)
+    offset = HEADER.size + len(name)
+    if (magic != MAGIC or version != VERSION or size != layout.size or data[HEADER.size:offset] != name
+            or len(data) != offset + (size + 3 >> 2) + size):
+        data.close()
+        raise ValueError(f"{path} is not a version {VERSION} table of {material_name(material)}")
+    return layout, data, offset
+
+
+def write_table(path, layout, values, distances):
+    values = values + bytes(-len(values) % 4)
+    packed = bytes(a | b << 2 | c << 4 | d << 6 for a, b, c, d in zip(values[0::4], values[1::4], values[2::4], values[3::4]))
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as stream:
+        stream.write(HEADER.pack(MAGIC, VERSION, layout.size) + layout.name.encode())
+        stream.write(packed)
+        stream.write(distances)
+    os.replace(temporary, path)  # Readers never see a half written table
+
+
+class Solver:
+    # Move generation over (code, square) pairs for one table, used by the workers
+    def __init__(self, material, directory):
+        self.layout = Layout(material)
+        self.tablebase = Tablebase(directory)
+        self.position = Position(castling=0)
+        self.empty = bytes(64)
+
+    def set_board(self, pieces):
+        squares = self.position.squares
+        squares[:] = self.empty
+        for code, sq in pieces:
+            squares[sq] = code
+        return squares
+
+    def successors(self, pieces, turn):
+        # (inside the table, successor pieces) for every move of the side to
+        # move; None instead when a move captures the king
+        squares = self.set_board(pieces)
+        piece_moves = self.position.piece_moves
+        for index, (code, sq) in enumerate(pieces):
+            if code >> COLOR_SHIFT != turn:
+                continue
+            targets = piece_moves(sq)
+            for target in targets:
+                if squares[target] & TYPE_MASK == KING:
+                    yield None
+                    return
+            rest = pieces[:index] + pieces[index + 1:]
+            for target in targets:
+                if squares[target]:
+                    yield False, [(other, at) for other, at in rest if at != target] + [(code, target)]
+                else:
+                    yield True, rest + [(code, target)]
+            if code & TYPE_MASK == KING or piece_fraction(code) == EIGHTH:
+                continue
+            split = SPLIT_PIECE[code]
+            for first in range(len(targets)):
+                for second in range(first + 1, len(targets)):
+                    a, b = targets[first], targets[second]
+                    yield False, [(other, at) for other, at in rest if at != a and at != b] + [(split, a), (split, b)]
+
+    def classify(self, start, stop):
+        # Step 1 for indexes start..stop: (values, flags, counters) as bytes
+        layout = self.layout
+        lookup = self.tablebase.lookup
+        count = stop - start
+        values = bytearray(count)
+        flags = bytearray(count)
+        counters = array.array("H", bytes(2 * count))
+        for offset in range(count):
+            index = start + offset
+            decoded = layout.canonical_pieces(index)
+            if decoded is None:
+                flags[offset] = INVALID
+                continue
+            turn, pieces = decoded
+            inside = set()
+            state = 0
+            moves = 0
+            for successor in self.successors(pieces, turn):
+                if successor is None:
+                    values[offset] = WIN
+                    break
+                moves += 1
+                internal, after = successor
+                if internal:
+                    inside.add(layout.encode(after, turn ^ 1))
+                    continue
+                result = lookup(after, turn ^ 1)
+                if result == LOSS:
+                    values[offset] = WIN
+                    break
+                if result != WIN:
+                    state |= ESCAPE if result == DRAW else ESCAPE | UNKNOWN_MOVE
+            else:
+                if not moves:
+                    values[offset] = DRAW  # No move at all, the game cannot go on
+                elif not inside and not state:
+                    values[offset] = LOSS
+                counters[offset] = len(inside)
+                flags[offset] = state
+        return start, bytes(values), bytes(flags), counters.tobytes()
+
+    def predecessors(self, indexes):
+        # Distinct indexes one quiet move before each of indexes, concatenated
+        layout = self.layout
+        found = array.array("q")
+        for index in indexes:
+            turn, pieces = layout.decode(index)
+            squares = self.set_board(pieces)
+            mover = turn ^ 1
+            before = set()
+            for position, (code, sq) in enumerate(pieces):
+                if code >> COLOR_SHIFT != mover:
+                    continue
+                rest = pieces[:position] + pieces[position + 1:]
+                for origin in self.position.piece_moves(sq):
+                    if not squares[origin]:
+                        before.add(layout.encode(rest + [(code, origin)], mover))
+            found.extend(before)
+        return found.tobytes()
+
+    def verify(self, start, stop, path):
+        # Step 4: recompute every entry of start..stop from its successors in the
+        # written table; returns (checked, list of (index, stored, expected)),
+        # stored and expected being (result, distance)
+        own = open_table(path, self.layout.material)
+        self.tablebase.tables[self.layout.material] = own
+        layout = self.layout
+        lookup = self.tablebase.lookup
+        distance = self.tablebase.distance
+        checked = 0
+        wrong = []
+        for index in range(start, stop):
+            decoded = layout.canonical_pieces(index)
+            if decoded is None:
+                continue
+            turn, pieces = decoded
+            results = set()
+            quickest = None  # Least distance of the successors lost for the opponent, -1 for a way out of the table
+            longest = -1  # Largest distance of the successors inside the table
+            for successor in self.successors(pieces, turn):
+                if successor is None:
+                    results.add(LOSS)
+                    quickest = -1
+                    break
+                internal, after = successor
+                result = lookup(after, turn ^ 1)
+                results.add(result)
+                if not internal:
+                    if result == LOSS:
+                        quickest = -1
+                    continue
+                plies = distance(after, turn ^ 1) if result in (WIN, LOSS) else 0
+                if result == LOSS and (quickest is None or plies < quickest):
+                    quickest = plies
+                longest = max(longest, plies)
+            if LOSS in results:
+                expected = WIN
+            elif not results:
+                expected = DRAW
+            elif results == {WIN}:
+                expected = LOSS
+            elif UNKNOWN in results:
+                expected = UNKNOWN
+            else:
+                expected = DRAW
+            plies = quickest + 1 if expected == WIN else longest + 1 if expected == LOSS else 0
+            expected = (expected, min(plies, MAX_DISTANCE))
+            stored = lookup(pieces, turn)
+            stored = (stored, distance(pieces, turn) if stored in (WIN, LOSS) else 0)
+            checked += 1
+            if stored != expected:
+                wrong.append((index, stored, expected))
+        own[1].close()
+        del self.tablebase.tables[self.layout.material]
+        return checked, wrong[:20]
+
+
+# Worker processes keep one Solver for the table being built
+_solver = None
+
+
+def _start_worker(material, directory):
+    global _solver
+    _solver = Solver(material, directory)
+
+
+def _classify(bounds):
+    return _solver.classify(*bounds)
+
+
+def _predecessors(data):
+    return _solver.predecessors(array.array("q", data))
+
+
+def _verify(job):
+    return _solver.verify(*job)
+
+
+def chunks(size, step=CHUNK):
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+
+def spread(indexes, pool, workers):
+    # Predecessors of indexes from the pool, as one array
+    step = max(256, min(CHUNK, len(indexes) // (workers * 4) + 1))
+    jobs = [indexes[start:start + step].tobytes() for start in range(0, len(indexes), step)]
+    found = array.array("q")
+    for data in pool.imap_unordered(_predecessors, jobs):
+        found.frombytes(data)
+    return found
+
+
+def solve(material, directory, pool, workers, log=print):
+    # Steps 1 to 3 for one table whose lighter tables are already written; returns the values and distances
+    layout = Layout(material)
+    started = time.perf_counter()
+    values = bytearray(layout.size)
+    flags = bytearray(layout.size)
+    counters = array.array("H", bytes(2 * layout.size))
+    for start, chunk_values, chunk_flags, chunk_counters in pool.imap_unordered(_classify, chunks(layout.size)):
+        stop = start + len(chunk_values)
+        values[start:stop] = chunk_values
+        flags[start:stop] = chunk_flags
+        counters[start:stop] = array.array("H", chunk_counters)
+    won = array.array("q", (index for index, value in enumerate(values) if value == WIN))
+    lost = array.array("q", (index for index, value in enumerate(values) if value == LOSS))
+    log(f"  {layout.name}: {layout.size} entries classified in {time.perf_counter() - started:.1f}s, "
+        f"{len(won)} won and {len(lost)} lost at once")
+
+    distances = bytearray(layout.size)
+    rounds = 0
+    while won or lost:
+        rounds += 1
+        distance = min(rounds, MAX_DISTANCE)
+        next_won = array.array("q")
+        next_lost = array.array("q")
+        for index in spread(lost, pool, workers):
+            if not values[index]:
+                values[index] = WIN
+                distances[index] = distance
+                next_won.append(index)
+        for index in spread(won, pool, workers):
+            if not values[index]:
+                counters[index] -= 1
+                if not counters[index] and not flags[index] & ESCAPE:
+                    values[index] = LOSS
+                    distances[index] = distance
+                    next_lost.append(index)
+        won, lost = next_won, next_lost
+
+    tainted = array.array("q", (index for index, value in enumerate(values)
+                                if not value and flags[index] & UNKNOWN_MOVE))
+    for index in tainted:
+        flags[index] |= TAINTED
+    while tainted:
+        found = array.array("q")
+        for index in spread(tainted, pool, workers):
+            if not values[index] and not flags[index] & TAINTED:
+                flags[index] |= TAINTED
+                found.append(index)
+        tainted = found
+    for index in range(layout.size):
+        if not values[index] and not flags[index] & (INVALID | TAINTED):
+            values[index] = DRAW
+    log(f"  {layout.name}: solved after {rounds} retrograde rounds in {time.perf_counter() - started:.1f}s")
+    return layout, values, distances
+
+
+def verify(material, directory, pool, log=print):
+    # Step 4 for a written table; returns the number of wrong entries
+    layout = Layout(material)
+    path = table_path(directory, material)
+    checked = 0
+    wrong = []
+    for chunk_checked, chunk_wrong in pool.imap_unordered(_verify, [bounds + (path,) for bounds in chunks(layout.size)]):
+        checked += chunk_checked
+        wrong.extend(chunk_wrong)
+    for index, stored, expected in wrong[:5]:
+        turn, pieces = layout.decode(index)
+        solver = Solver(material, directory)
+        solver.set_board(pieces)
+        solver.position.turn = turn
+        log(f"  wrong: {solver.position.to_fen()} stored {RESULT_NAMES[stored[0]]} in {stored[1]}, "
+            f"expected {RESULT_NAMES[expected[0]]} in {expected[1]}")
+    log(f"  {layout.name}: verified {checked} positions, {len(wrong)} wrong")
+    return len(wrong)
+
+
+def count_results(material, directory):
+    # How many canonical positions of a written table have each result, per side to move
+    layout, data, offset = open_table(table_path(directory, material), material)
+    counts = [[0] * 4, [0] * 4]
+    for index in range(layout.size):
+        decoded = layout.canonical_pieces(index)
+        if decoded is not None:
+            counts[decoded[0]][data[offset + (index >> 2)] >> ((index & 3) << 1) & 3] += 1
+    data.close()
+    return counts
+
+
+def generate(materials, directory=DEFAULT_DIRECTORY, max_pieces=DEFAULT_MAX_PIECES, workers=None, check=True,
+             log=print):
+    # Build (and verify) the tables of materials and of everything they depend on
+    workers = workers or os.cpu_count()
+    os.makedirs(directory, exist_ok=True)
+    wrong = 0
+    for material in material_closure(materials, max_pieces):
+        path = table_path(directory, material)
+        if os.path.exists(path):
+            log(f"{material_name(material)}: already built")
+            continue
+        log(f"{material_name(material)}: building")
+        with multiprocessing.Pool(workers, _start_worker, (material, directory)) as pool:
+            layout, values, distances = solve(material, directory, pool, workers, log)
+            write_table(path, layout, values, distances)
+            if check:
+                wrong += verify(material, directory, pool, log)
+    return wrong
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query Split Chess endgame tables")
+    parser.add_argument("--dir", default=DEFAULT_DIRECTORY, help="directory of the table files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("generate", help="build the tables of some material sets and the ones they depend on")
+    build.add_argument("materials", nargs="+", help="material sets such as KN4vK or KN2vKN8")
+    build.add_argument("--max-pieces", type=int, default=DEFAULT_MAX_PIECES,
+                       help="largest set built, kings included; moves into bigger sets count as unknown")
+    build.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    build.add_argument("--no-verify", action="store_true", help="skip checking every entry against its successors")
+    check = commands.add_parser("verify", help="check every entry of built tables against its successors")
+    check.add_argument("materials", nargs="+")
+    check.add_argument("--workers", type=int, default=os.cpu_count())
+    stats = commands.add_parser("stats", help="count the results in built tables")
+    stats.add_argument("materials", nargs="+")
+    probe = commands.add_parser("probe", help="look a position up")
+    probe.add_argument("fen")
+    args = parser.parse_args(argv)
+
+    if args.command == "probe":
+        tablebase = Tablebase(args.dir)
+        position = Position.from_fen(args.fen)
+        result = tablebase.probe(position)
+        if result is None:
+            print("not covered by the tables")
+        elif result == DRAW:
+            print("draw")
+        else:
+            plies = tablebase.distance(pieces_of(position), position.turn)
+            print(f"{RESULT_NAMES[result]} for the side to move, {plies} plies to a king capture or a lighter table, "
+                  f"best move {tablebase.best_move(position).notation}")
+        return
+    materials = [parse_material(name) for name in args.materials]
+    if args.command == "generate":
+        wrong = generate(materials, args.dir, args.max_pieces, args.workers, not args.no_verify)
+    elif args.command == "verify":
+        wrong = 0
+        for material in materials:
+            with multiprocessing.Pool(args.workers, _start_worker, (material, args.dir)) as pool:
+                wrong += verify(material, args.dir, pool)
+    else:
+        for material in materials:
+            counts = count_results(material, args.dir)
+            for turn, name in ((WHITE, "white"), (BLACK, "black")):
+                print(f"{material_name(material)} {name} to move: " +
+                      ", ".join(f"{count} {RESULT_NAMES[result]}" for result, count in enumerate(counts[turn])))
+        return
+    if wrong:
+        raise SystemExit(f"{wrong} entries failed verification")
+
+
+if __name__ == "__main__":
+    main()
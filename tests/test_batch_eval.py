@@ -0,0 +1,30 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import batch_eval
+from split_ai import evaluate
+from split_position import WHITE, Position
+
+
+def test_batch_matches_evaluate():
+    positions = batch_eval.random_positions(300, seed=12)
+    positions.append(Position.from_fen("4k3/8/8/8/8/8/8/8 w - - 0 1"))  # Game over, White's king is gone
+    codes, turns = batch_eval.positions_to_arrays(positions)
+    results = batch_eval.evaluate_batch(codes, turns)
+    for index, position in enumerate(positions):
+        expected = batch_eval.evaluate_one(position)
+        assert results["to_move"][index] == evaluate(position) == expected["to_move"]
+        white_view = evaluate(position) if position.turn == WHITE else -evaluate(position)
+        assert results["score"][index] == white_view
+        for name, value in expected.items():
+            assert results[name][index] == value, name
+
+
+def test_chunks_give_the_same_results(monkeypatch):
+    codes, turns = batch_eval.positions_to_arrays(batch_eval.random_positions(50, seed=3))
+    whole = batch_eval.evaluate_batch(codes, turns)
+    monkeypatch.setattr(batch_eval, "CHUNK", 7)
+    chunked = batch_eval.evaluate_batch(codes, turns)
+    for name in whole:
+        assert np.array_equal(whole[name], chunked[name]), name
@@ -0,0 +1,35 @@
+import random
+
+import pytest
+
+from bitboard import BitboardPosition
+from perft import REFERENCE_POSITIONS, perft
+from split_position import Position
+
+
+@pytest.mark.parametrize("name, fen, expected", REFERENCE_POSITIONS)
+def test_perft_matches_the_reference_counts(name, fen, expected):
+    position = BitboardPosition.from_fen(fen)
+    assert [perft(position, depth) for depth in (1, 2)] == expected[:2]
+
+
+def test_same_moves_in_the_same_order_as_position():
+    # Move equality compares the split targets in order, as do notation and codes
+    rng = random.Random(5)
+    for name, fen, _ in REFERENCE_POSITIONS:
+        for game in range(5):
+            plain = Position.from_fen(fen)
+            bitboard = BitboardPosition.from_fen(fen)
+            for ply in range(60):
+                moves = plain.generate_moves()
+                assert bitboard.generate_moves() == moves
+                assert BitboardPosition.from_position(plain).generate_moves() == moves
+                assert bitboard.generate_captures() == plain.generate_captures()
+                if not moves:
+                    break
+                move = rng.choice(moves)
+                plain.make_move(move)
+                bitboard.make_move(move)
+                if rng.random() < 0.2:
+                    plain.unmake_move()
+                    bitboard.unmake_move()
@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+pygame = pytest.importorskip("pygame")
+
+import SplitChess
+
+
+@pytest.fixture
+def board():
+    pygame.init()
+    SplitChess.set_board_size(256)
+    screen = pygame.display.set_mode((int(SplitChess.WIDTH), SplitChess.HEIGHT))
+    yield SplitChess.ChessBoard(screen)
+    pygame.quit()
+
+
+def full_frame(board):
+    board.screen.fill(SplitChess.WHITE)
+    board.draw_board()
+    board.draw_pieces()
+    board.draw_sidebar()
+    return pygame.image.tobytes(board.screen, "RGB")
+
+
+def test_dirty_frames_match_full_redraws(board):
+    renderer = SplitChess.DirtyRenderer(board)
+    clicks = [(4, 6), (4, 4), None, (1, 0), (0, 2), (2, 2), "flip", None, (3, 6), (3, 6), (6, 7), (5, 5), None]
+    for click in clicks:
+        if click is None:
+            board.commit_move()
+        elif click == "flip":
+            board.flipped = not board.flipped
+        else:
+            board.click_square(*click)
+        renderer.render()
+        assert pygame.image.tobytes(board.screen, "RGB") == full_frame(board), click
+        renderer.invalidate()
+        renderer.render()  # The full redraw above is now what the renderer shows
+
+
+def test_unchanged_frame_updates_nothing(board):
+    renderer = SplitChess.DirtyRenderer(board)
+    assert renderer.render() > 0
+    assert renderer.render() == 0
+    board.click_square(6, 7)  # Selecting a knight changes its square and two targets
+    assert renderer.render() == 3
@@ -0,0 +1,53 @@
+import io
+import os
+import random
+
+from game_record import GameArchive, GameRecord, encode_game, read_game, read_games, write_games
+from split_position import Position
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+START = "r3k2r/8/8/3pPp2/8/8/8/R3K2R w KQkq f6 0 1"
+
+
+def random_game(rng, fen=None, plies=60):
+    position = Position.from_fen(fen) if fen else Position.initial()
+    moves = []
+    for _ in range(plies):
+        choices = position.generate_moves()
+        if not choices:
+            break
+        move = rng.choice(choices)
+        position.make_move(move)
+        moves.append(move)
+    return GameRecord(moves, rng.choice(RESULTS), fen), position
+
+
+def test_encode_decode():
+    rng = random.Random(3)
+    for fen in (None, START):
+        game, _ = random_game(rng, fen)
+        decoded = read_game(io.BytesIO(encode_game(game)))
+        assert (decoded.moves, decoded.result, decoded.fen) == (game.moves, game.result, game.fen)
+
+
+def test_replay_reaches_the_same_position():
+    rng = random.Random(4)
+    game, position = random_game(rng, START)
+    assert game.board().position.to_fen() == position.to_fen()
+    assert len(game.notation()) == len(game.moves)
+
+
+def test_file_and_index(tmp_path):
+    rng = random.Random(5)
+    path = str(tmp_path / "games.spg")
+    games = [random_game(rng, START if number % 3 == 0 else None, rng.randrange(0, 40))[0] for number in range(10)]
+    assert write_games(path, games[:6]) == 6
+    assert write_games(path, games[6:]) == 4  # Appending keeps the index in step
+    assert [game.moves for game in read_games(path)] == [game.moves for game in games]
+    os.remove(path + ".idx")  # Rebuilt on open
+    with GameArchive(path) as archive:
+        assert len(archive) == len(games)
+        for number in (9, 0, 4):
+            assert archive[number].moves == games[number].moves
+            assert archive[number].fen == games[number].fen
+        assert archive[-1].result == games[-1].result
@@ -0,0 +1,36 @@
+import random
+
+import pytest
+
+from indexed_position import IndexedPosition
+from perft import REFERENCE_POSITIONS, perft
+from split_position import Position
+
+
+@pytest.mark.parametrize("name, fen, expected", REFERENCE_POSITIONS)
+def test_perft_matches_the_reference_counts(name, fen, expected):
+    position = IndexedPosition.from_fen(fen)
+    assert [perft(position, depth) for depth in (1, 2)] == expected[:2]
+
+
+def test_indexes_and_moves_follow_random_games(monkeypatch):
+    monkeypatch.setattr(IndexedPosition, "debug", True)  # Rescan after every make and unmake
+    rng = random.Random(13)
+    for name, fen, _ in REFERENCE_POSITIONS:
+        for game in range(5):
+            plain = Position.from_fen(fen)
+            indexed = IndexedPosition.from_fen(fen)
+            for ply in range(60):
+                moves = plain.generate_moves()
+                assert indexed.generate_moves() == moves
+                assert indexed.generate_captures() == plain.generate_captures()
+                assert indexed.occupied_count == sum(1 for piece in plain.squares if piece)
+                assert indexed.winner() == plain.winner()
+                if not moves:
+                    break
+                move = rng.choice(moves)
+                plain.make_move(move)
+                indexed.make_move(move)
+                if rng.random() < 0.2:
+                    plain.unmake_move()
+                    indexed.unmake_move()
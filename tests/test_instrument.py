@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+import instrument
+from move_cache import MoveCache
+from split_rules import ChessBoard
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    instrument.reset()
+    yield
+    instrument.disable()
+    instrument.reset()
+
+
+def play_opening(board):
+    for col, row in ((4, 6), (4, 4)):
+        board.click_square(col, row)
+    board.commit_move()
+    for col, row in ((6, 0), (5, 2), (7, 2)):
+        board.click_square(col, row)
+    board.commit_move()
+
+
+class Counter:
+    def tick(self):
+        return 1
+
+
+def test_enable_and_disable_round_trip():
+    methods = (MoveCache.piece_moves, ChessBoard.commit_move)
+    instrument.enable()
+    instrument.enable()  # Twice is the same as once
+    assert MoveCache.piece_moves is not methods[0] and ChessBoard.commit_move is not methods[1]
+    play_opening(ChessBoard())
+    assert {"valid_moves.pawn", "valid_moves.knight", "commit.quiet", "commit.split"} <= set(instrument.histograms)
+    assert instrument.histograms["commit.split"].count == 1
+
+    instrument.disable()
+    assert (MoveCache.piece_moves, ChessBoard.commit_move) == methods
+    counts = {name: histogram.count for name, histogram in instrument.histograms.items()}
+    play_opening(ChessBoard())
+    assert {name: histogram.count for name, histogram in instrument.histograms.items()} == counts  # Kept, not added to
+
+    instrument.enable()
+    play_opening(ChessBoard())
+    assert instrument.histograms["commit.split"].count == 2
+
+
+def test_registered_methods_are_only_wrapped_while_enabled():
+    original = Counter.tick
+    instrument.wrap_methods(Counter, ("tick",), "counter.")
+    try:
+        Counter().tick()
+        assert "counter.tick" not in instrument.histograms
+        instrument.enable()
+        assert Counter().tick() == 1
+        assert instrument.histograms["counter.tick"].count == 1
+        instrument.disable()
+        assert Counter.tick is original
+    finally:
+        instrument.registered.pop()
+
+
+def test_buckets_hold_their_samples():
+    for ns in list(range(100)) + [1000, 12345, 10 ** 9, 2 ** 40 + 5]:
+        low, high = instrument.bucket_bounds(instrument.bucket_of(ns))
+        assert low <= ns < high
+
+
+def test_report_and_dump(tmp_path):
+    for ns in (1000, 2000, 3000, 1000000):
+        instrument.record("work", ns)
+    instrument.record("other", 10)
+    lines = instrument.report()
+    assert lines[0].startswith("work: 4 x ") and len(lines) == 2
+    instrument.dump(tmp_path / "timings.json")
+    summary = json.loads((tmp_path / "timings.json").read_text())["work"]
+    assert summary["count"] == 4 and summary["max_us"] == 1000.0
+    assert summary["p50_us"] <= summary["p90_us"] <= summary["max_us"]
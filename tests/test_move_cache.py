@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+from move_cache import CachedPosition, MoveCache
+from split_position import Position
+
+FENS = [
+    Position.initial().to_fen(),
+    "r3k2r/pppq1ppp/2n2n2/3pp3/1b1PP1b1/2N2N2/PPPQ1PPP/R3K2R w KQkq - 0 1",  # Castling, pins of sliders
+    "4k3/8/8/3pPp2/8/8/8/4K3 w - f6 0 1",  # En passant
+]
+
+
+def notations(moves):
+    return sorted(move.notation for move in moves)
+
+
+def check(cached, plain):
+    assert notations(cached.generate_moves()) == notations(plain.generate_moves())
+    for sq in range(64):
+        if plain.squares[sq]:
+            assert sorted(cached.piece_moves(sq)) == sorted(plain.piece_moves(sq))
+
+
+@pytest.mark.parametrize("fen", FENS)
+@pytest.mark.parametrize("capacity", [64, 1 << 16])
+def test_cache_matches_uncached_generation(fen, capacity):
+    rng = random.Random(capacity + len(fen))
+    cache = MoveCache(capacity)
+    for game in range(4):
+        plain = Position.from_fen(fen)
+        cached = CachedPosition.from_position(plain, cache)
+        for ply in range(40):
+            check(cached, plain)
+            moves = plain.generate_moves()
+            if not moves:
+                break
+            move = rng.choice(moves)
+            plain.make_move(move)
+            cached.make_move(cached.create_move(move.src, move.targets))
+            if rng.random() < 0.2:  # Take back and play on: the old entries come back under the old key
+                plain.unmake_move()
+                cached.unmake_move()
+                check(cached, plain)
+                plain.make_move(move)
+                cached.make_move(cached.create_move(move.src, move.targets))
+    stats = cache.stats()
+    assert stats["hits"] > 0 and stats["carried"] > 0
+    if capacity == 64:
+        assert stats["evictions"] > 0
+
+
+def test_move_touching_a_dependency_invalidates():
+    cache = MoveCache()
+    position = CachedPosition.from_position(Position.from_fen("4k3/8/8/8/8/8/P7/R3K3 w - - 0 1"), cache)
+    rook = 56  # a1
+    assert 48 not in position.piece_moves(rook)  # a2 holds our own pawn
+    position.make_move(position.parse_move("a2-a4"))
+    position.make_move(position.parse_move("e8-d8"))
+    assert {48, 40} <= set(position.piece_moves(rook))  # The file opened up to the pawn
+    assert 32 not in position.piece_moves(rook)
+
+
+def test_unrelated_move_carries_the_entry_over():
+    cache = MoveCache()
+    position = CachedPosition.from_position(Position.from_fen("4k3/8/8/8/8/8/P6P/R3K3 w - - 0 1"), cache)
+    before = position.piece_moves(56)
+    position.make_move(position.parse_move("h2-h3"))
+    position.make_move(position.parse_move("e8-d8"))
+    carried = cache.carried
+    assert position.piece_moves(56) == before
+    assert cache.carried == carried + 1
@@ -0,0 +1,47 @@
+import pytest
+
+from split_position import CASTLE, EN_PASSANT, PROMOTION, SPLIT, Position
+
+POSITIONS = [
+    Position.initial().to_fen(),
+    "r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1",  # Castling both ways
+    "4k3/8/8/3pPp2/8/8/8/4K3 w - f6 0 1",  # En passant, alone and split with a push
+    "1n2k3/P1P5/8/8/8/8/8/4K3 w - - 0 1",  # Promotions, with and without capture
+    "4k3/8/2p1p3/8/3N^24/8/8/4K3 w - - 0 1",  # Half knight: splits onto captures
+]
+
+
+@pytest.mark.parametrize("fen", POSITIONS)
+def test_every_move_round_trips(fen):
+    position = Position.from_fen(fen)
+    for move in position.generate_moves():
+        parsed = position.parse_move(move.notation)
+        assert parsed == move
+        assert parsed.notation == move.notation
+
+
+@pytest.mark.parametrize("fen, text, flag", [
+    (POSITIONS[0], "Nb1-c3/a3^2", SPLIT),
+    (POSITIONS[1], "Ke1-g1 O-O", CASTLE),
+    (POSITIONS[1], "Ke1-c1 O-O-O", CASTLE),
+    (POSITIONS[2], "Pe5xf6 e.p.", EN_PASSANT),
+    (POSITIONS[3], "Pa7-a8=Q", PROMOTION),
+    (POSITIONS[3], "Pa7xb8=Q", PROMOTION),
+    (POSITIONS[4], "Nd4xe6/xc6^4", SPLIT),
+])
+def test_written_moves(fen, text, flag):
+    move = Position.from_fen(fen).parse_move(text)
+    assert move.flags & flag
+    assert move.notation == text
+
+
+def test_split_targets_in_either_order():
+    position = Position.initial()
+    assert position.parse_move("Nb1-a3/c3^2") == position.parse_move("Nb1-c3/a3^2")
+
+
+def test_en_passant_is_written_as_a_capture():
+    position = Position.from_fen(POSITIONS[2])
+    assert position.parse_move("e5-f6").notation == "Pe5xf6 e.p."
+    with pytest.raises(ValueError):
+        position.parse_move("Pe5-f6 e.p.")
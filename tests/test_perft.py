@@ -0,0 +1,20 @@
+import pytest
+
+from perft import REFERENCE_POSITIONS, divide, perft
+from split_position import Position
+
+
+@pytest.mark.parametrize("name, fen, expected", REFERENCE_POSITIONS)
+def test_reference_counts(name, fen, expected):
+    position = Position.from_fen(fen)
+    depths = (1, 2, 3) if expected[2] < 100000 else (1, 2)
+    assert [perft(position, depth) for depth in depths] == expected[:len(depths)]
+    assert position == Position.from_fen(fen)
+
+
+def test_divide_adds_up_to_perft():
+    position = Position.initial()
+    results = divide(position, 2)
+    assert len(results) == REFERENCE_POSITIONS[0][2][0]
+    assert sum(nodes for _, nodes in results) == REFERENCE_POSITIONS[0][2][1]
+
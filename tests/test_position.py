@@ -0,0 +1,29 @@
+import random
+
+from perft import REFERENCE_POSITIONS
+from split_position import Position
+
+
+def test_unmake_restores_every_position():
+    rng = random.Random(3)
+    for name, fen, _ in REFERENCE_POSITIONS:
+        position = Position.from_fen(fen)
+        for move in position.generate_moves():
+            before = position.copy()
+            position.make_move(move)
+            position.unmake_move()
+            assert position == before and position.key == before.key
+        for game in range(3):
+            position = Position.from_fen(fen)
+            seen = []
+            for ply in range(80):
+                moves = position.generate_moves()
+                if not moves:
+                    break
+                seen.append((position.copy(), position.to_fen()))
+                position.make_move(rng.choice(moves))
+            while seen:
+                position.unmake_move()
+                before, before_fen = seen.pop()
+                assert position == before and position.to_fen() == before_fen
+            assert not position.history
@@ -0,0 +1,49 @@
+import io
+import random
+
+import pytest
+
+pygame = pytest.importorskip("pygame")
+
+import render_batch
+from split_position import Position
+
+
+def pixels(surface):
+    return pygame.image.tobytes(surface, "RGB")
+
+
+def test_png_decodes_to_the_frame():
+    frame = render_batch.Renderer(96).render(Position.initial())
+    decoded = pygame.image.load(io.BytesIO(render_batch.encode_png(frame)), "board.png")
+    assert decoded.get_size() == (96, 96)
+    assert pixels(decoded) == pixels(frame)
+
+
+def test_size_is_whole_squares():
+    assert render_batch.Renderer(100).render(Position.initial()).get_size() == (96, 96)
+
+
+def test_redrawn_squares_match_a_fresh_render():
+    # One renderer reused over a game draws what a new renderer would for every ply
+    rng = random.Random(2)
+    reused = render_batch.Renderer(64)
+    position = Position.initial()
+    for ply in range(30):
+        moves = position.generate_moves()
+        if not moves:
+            break
+        move = rng.choice(moves)
+        position.make_move(move)
+        flipped = ply % 10 >= 5
+        frame = pixels(reused.render(position, flipped, move))
+        assert frame == pixels(render_batch.Renderer(64).render(position, flipped, move))
+    assert ply >= 10  # Both orientations were drawn
+
+
+def test_positions_command(tmp_path):
+    fens = tmp_path / "fens.txt"
+    fens.write_text(Position.initial().to_fen() + "\n\n" + "4k3/8/8/8/8/8/8/4K3 w - - 0 1\n")
+    out = tmp_path / "thumbnails"
+    assert render_batch.main(["--size", "64", "--workers", "1", "positions", str(fens), str(out)]) == 0
+    assert sorted(path.name for path in out.iterdir()) == ["000000.png", "000002.png"]
@@ -0,0 +1,55 @@
+import argparse
+import json
+
+import pytest
+
+import selfplay
+
+
+def run_args(tmp_path, **options):
+    args = dict(games=4, white="greedy", black="random", alternate=False, max_plies=20, seed=1,
+                out=str(tmp_path / "games.jsonl"))
+    args.update(options)
+    return argparse.Namespace(**args)
+
+
+def write_results(args, count):
+    with open(args.out, "w") as out:
+        for task in selfplay.build_tasks(args, {})[:count]:
+            out.write(json.dumps(selfplay.play_game(task)) + "\n")
+        out.write('{"game": 3, "whi')  # Cut short by an interruption
+
+
+def test_resume_skips_finished_games(tmp_path):
+    args = run_args(tmp_path, alternate=True)
+    write_results(args, 2)
+    done = selfplay.completed_games(args.out)
+    assert sorted(done) == [0, 1]
+    assert "moves" not in done[0]
+    assert [task[0] for task in selfplay.build_tasks(args, done)] == [2, 3]
+    with open(args.out) as results:
+        assert results.read().endswith("\n")
+
+
+@pytest.mark.parametrize("options", [{"white": "search:1"}, {"seed": 2}, {"alternate": True}, {"max_plies": 30}])
+def test_resume_refuses_other_options(tmp_path, options):
+    write_results(run_args(tmp_path), 2)
+    args = run_args(tmp_path, **options)
+    with pytest.raises(ValueError):
+        selfplay.build_tasks(args, selfplay.completed_games(args.out))
+
+
+def test_resumed_games_count_in_the_totals(tmp_path):
+    args = run_args(tmp_path)
+    write_results(args, 2)
+    tally = selfplay.Tally()
+    for game in selfplay.completed_games(args.out).values():
+        tally.add(game, resumed=True)
+    assert tally.games == 2 and tally.resumed == 2
+    assert sum(count for _, count in tally.points.values()) == 4
+
+
+def test_search_players_differ_between_seeds():
+    games = [selfplay.play_game((0, "search:1", "search:1", seed, 30))["moves"] for seed in (11, 999, 11)]
+    assert games[0] != games[1]
+    assert games[0] == games[2]
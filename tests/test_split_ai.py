@@ -0,0 +1,43 @@
+import time
+
+from split_ai import AIPlayer, Searcher
+from split_position import WHITE, Position
+
+
+def test_cancel_right_after_start_is_not_lost():
+    # The thread only gets to the search after cancel() has stopped it
+    player = AIPlayer(WHITE, time_limit=3)
+    search = player.searcher.search
+
+    def late_search(*args):
+        time.sleep(0.1)
+        return search(*args)
+    player.searcher.search = late_search
+    started = time.perf_counter()
+    player.start(Position.initial())
+    player.cancel()
+    assert time.perf_counter() - started < 1
+    assert not player.thinking
+
+
+def test_player_searches_again_after_a_cancel():
+    player = AIPlayer(WHITE, time_limit=None, node_limit=200, max_depth=3)
+    player.start(Position.initial())
+    player.cancel()
+    player.start(Position.initial())
+    player.thread.join()
+    assert player.poll().move is not None
+
+
+def test_no_move_without_a_king_to_move():
+    # The search has nothing to play once the game is over
+    assert Searcher().search(Position.from_fen("4k3/8/8/8/8/8/8/8 w - - 0 1"), 2).move is None
+
+
+def test_searcher_searches_again_after_reset():
+    searcher = Searcher()
+    searcher.stop()
+    assert searcher.search(Position.initial(), 3).depth == 0  # Stopped before the first iteration
+    searcher.reset()
+    result = searcher.search(Position.initial(), 2)
+    assert result.depth == 2 and result.move is not None
@@ -0,0 +1,33 @@
+from split_position import square
+from split_rules import ChessBoard, PieceColor
+
+
+def test_selection_keeps_the_old_tuple_attributes():
+    board = ChessBoard()
+    board.click_square(4, 6)
+    board.click_square(4, 4)
+    assert board.selected_sq == square(4, 6) and board.selected_pos == (4, 6)
+    assert board.valid_moves == [(4, 5), (4, 4)]
+    assert board.potential_targets == [square(4, 4)] and board.potential_moves == [(4, 4)]
+    board.commit_move()
+    assert board.selected_pos is None and board.en_passant_target == (4, 5)
+
+
+def test_tuple_attributes_can_set_up_a_move():
+    board = ChessBoard()
+    board.selected_piece = board.position.squares[square(1, 7)]
+    board.selected_pos = (1, 7)
+    board.potential_moves = [(2, 5), (0, 5)]
+    board.commit_move()
+    assert board.board[5][:3] == ["w_knight_half", None, "w_knight_half"]
+
+
+def test_castling_rights_follow_the_position():
+    board = ChessBoard()
+    assert board.castling_rights[PieceColor.WHITE] == {"king_side": True, "queen_side": True}
+    for col, row in ((7, 6), (7, 4), (0, 1), (0, 2), (7, 7), (7, 6)):
+        board.click_square(col, row)
+        if len(board.potential_targets) == 1:
+            board.commit_move()
+    assert board.castling_rights[PieceColor.WHITE] == {"king_side": False, "queen_side": True}
+    assert board.castling_rights[PieceColor.BLACK] == {"king_side": True, "queen_side": True}
@@ -0,0 +1,121 @@
+import asyncio
+
+from split_position import Position, parse_square
+from split_server import GameServer
+
+START_FEN = Position.initial().to_fen()
+
+
+def notation(position, src, *targets):
+    return position.create_move(parse_square(src), [parse_square(target) for target in targets]).notation
+
+
+class Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def send(self, line):
+        self.writer.write(f"{line}\n".encode())
+        await self.writer.drain()
+        return await self.read()
+
+    async def read(self):
+        return (await asyncio.wait_for(self.reader.readline(), 5)).decode().rstrip("\n")
+
+
+async def connect(server, count):
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    connections = [Connection(*await asyncio.open_connection("127.0.0.1", port)) for _ in range(count)]
+    return listener, connections
+
+
+def run(scenario, count=3):
+    async def main():
+        server = GameServer()
+        listener, connections = await connect(server, count)
+        try:
+            await scenario(server, *connections)
+        finally:
+            for connection in connections:
+                connection.writer.close()
+            listener.close()
+            await listener.wait_closed()
+    asyncio.run(main())
+
+
+def test_join_gives_colors_then_spectators():
+    async def scenario(server, white, black, spectator):
+        assert await white.send("J g1") == f"J w {START_FEN}"
+        assert await black.send("J g1") == f"J b {START_FEN}"
+        assert await spectator.send("J g1") == f"J s {START_FEN}"
+        assert await spectator.send("J g2") == "E already in a game"
+        assert (await white.send("I")).startswith("I 1 3 ")
+    run(scenario)
+
+
+def test_moves_are_checked_and_sent_to_everyone():
+    async def scenario(server, white, black, spectator):
+        for connection in (white, black, spectator):
+            await connection.send("J g1")
+        position = Position.initial()
+        assert await black.send("M e7 e5") == "E not your turn"
+        assert await spectator.send("M e2 e4") == "E spectators cannot play"
+        assert await white.send("M e2 e5") == "E e2 cannot move to e5"
+        assert await white.send("M e1 e2") == "E e1 cannot move to e2"
+        assert await white.send("M e2 e9") == "E bad square 'e9'"
+        expected = f"M {notation(position, 'e2', 'e4')}"
+        for connection, line in ((white, "M e2 e4"), (black, None), (spectator, None)):
+            assert (await connection.send(line) if line else await connection.read()) == expected
+        position.commit(parse_square("e2"), [parse_square("e4")])
+        expected = f"M {notation(position, 'g8', 'h6', 'f6')}"  # A split, in the order given
+        for connection, line in ((black, "M g8 h6 f6"), (white, None), (spectator, None)):
+            assert (await connection.send(line) if line else await connection.read()) == expected
+        assert await white.send("M e1 d1 f1") == "E e1 cannot move to d1"
+    run(scenario)
+
+
+def test_clicks_then_pass():
+    async def scenario(server, white, black, spectator):
+        await white.send("J g1")
+        await black.send("J g1")
+        assert await white.send("P") == "E nothing to commit"
+        assert await white.send("S b1") == "S b1"
+        assert await white.send("S c3") == "S b1 c3"
+        assert await white.send("S a3") == "S b1 c3 a3"
+        line = f"M {notation(Position.initial(), 'b1', 'c3', 'a3')}"
+        assert await white.send("P") == line
+        assert await black.read() == line
+    run(scenario)
+
+
+def test_resign_ends_the_game_and_restart():
+    async def scenario(server, white, black, spectator):
+        for connection in (white, black, spectator):
+            await connection.send("J g1")
+        assert await white.send("N") == "E the game is not over"
+        assert await white.send("R") == "G 0-1 resigned"
+        assert await black.read() == "G 0-1 resigned"
+        assert await spectator.read() == "G 0-1 resigned"
+        assert await black.send("M e7 e5") == "E the game is over"
+        assert await black.send("N") == f"N {START_FEN}"
+        assert await white.read() == f"N {START_FEN}"
+        assert await spectator.read() == f"N {START_FEN}"
+        assert await white.send("M e2 e4") == f"M {notation(Position.initial(), 'e2', 'e4')}"
+    run(scenario)
+
+
+def test_leaving_tells_the_game_and_frees_the_seat():
+    async def scenario(server, white, black, spectator):
+        await white.send("J g1")
+        await black.send("J g1")
+        black.writer.close()
+        assert await white.read() == "L b"
+        assert await spectator.send("J g1") == f"J b {START_FEN}"
+        white.writer.close()
+        await asyncio.sleep(0.05)
+        spectator.writer.close()
+        await asyncio.sleep(0.05)
+        assert server.games == {}
+    run(scenario)
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+pygame = pytest.importorskip("pygame")
+
+import sprite_atlas
+from split_position import KING, PIECE_CODES, piece_fraction, piece_type
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(sprite_atlas, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(sprite_atlas, "atlases", {})
+    return tmp_path
+
+
+def test_atlas_has_every_piece_at_the_size(cache_dir):
+    atlas = sprite_atlas.get_atlas(20)
+    assert sprite_atlas.get_atlas(20) is atlas
+    for name, code in PIECE_CODES.items():
+        if piece_type(code) != KING or not piece_fraction(code):
+            assert atlas[code].get_size() == (20, 20)
+
+
+def test_cached_atlas_loads_the_same_pixels(cache_dir, monkeypatch):
+    built = sprite_atlas.get_atlas(20).surface
+    assert os.listdir(cache_dir) == [os.path.basename(sprite_atlas.cache_path(20))]
+    sprite_atlas.atlases.clear()
+
+    def no_build(size):
+        raise AssertionError("the atlas should come from the cache")
+    monkeypatch.setattr(sprite_atlas, "build_surface", no_build)
+    loaded = sprite_atlas.get_atlas(20).surface
+    assert loaded is not built
+    assert pygame.image.tobytes(loaded, "RGBA") == pygame.image.tobytes(built, "RGBA")
+
+
+def test_unwritable_cache_still_builds(tmp_path, monkeypatch):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    monkeypatch.setattr(sprite_atlas, "CACHE_DIR", str(blocker / "cache"))
+    monkeypatch.setattr(sprite_atlas, "atlases", {})
+    assert sprite_atlas.get_atlas(12).surface.get_width() == 12 * sprite_atlas.ATLAS_COLUMNS
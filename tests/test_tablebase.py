@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+import tablebase
+from split_position import BLACK, COLOR_SHIFT, EIGHTH, KING, KNIGHT, WHITE, Position, make_piece
+from tablebase import DRAW, LOSS, WIN, Tablebase, pieces_of
+
+
+@pytest.fixture(scope="module")
+def tables(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("tablebases"))
+    wrong = tablebase.generate([tablebase.parse_material("KN8vK")], directory, workers=1, log=lambda line: None)
+    assert wrong == 0
+    return Tablebase(directory)
+
+
+def knight_positions(tables, rng, results, least_distance=0):
+    # Random covered KN8vK placements whose result is one of results
+    while True:
+        white_king, black_king, knight = rng.sample(range(64), 3)
+        position = Position(castling=0)
+        position.squares[white_king] = make_piece(WHITE, KING, 0)
+        position.squares[black_king] = make_piece(BLACK, KING, 0)
+        position.squares[knight] = make_piece(WHITE, KNIGHT, EIGHTH)
+        position.turn = rng.choice((WHITE, BLACK))
+        result = tables.probe(position)
+        if result in results and (result == DRAW or tables.distance(pieces_of(position), position.turn) >= least_distance):
+            yield position
+
+
+def test_kings_alone(tables):
+    assert tables.probe(Position.from_fen("8/8/8/8/8/3k4/3K4/8 w - - 0 1")) == WIN
+    assert tables.distance(pieces_of(Position.from_fen("8/8/8/8/8/3k4/3K4/8 w - - 0 1")), WHITE) == 0
+    assert tables.probe(Position.from_fen("8/8/8/8/8/3k4/3K4/8 b - - 0 1")) == WIN
+    assert tables.probe(Position.from_fen("k7/8/8/8/8/8/8/7K w - - 0 1")) == DRAW
+
+
+def test_not_covered(tables):
+    assert tables.probe(Position.initial()) is None
+    assert tables.probe(Position.from_fen("k7/8/8/8/8/8/P7/7K w - - 0 1")) is None  # Pawns are never in a table
+    assert tables.probe(Position.from_fen("k7/8/8/8/8/8/8/R6K w - - 0 1")) is None  # No KRvK table was built
+
+
+def test_distance_is_plies_before_the_king_capture(tables):
+    # d plies of best play, then the winner captures the king with ply d + 1
+    rng = random.Random(5)
+    positions = knight_positions(tables, rng, (WIN, LOSS), least_distance=3)
+    for _ in range(8):
+        position = next(positions)
+        result = tables.probe(position)
+        winner = position.turn if result == WIN else position.turn ^ 1
+        distance = tables.distance(pieces_of(position), position.turn)
+        plies = 0
+        while position.winner() is None:
+            position.make_move(tables.best_move(position))
+            plies += 1
+        assert position.winner() == winner
+        assert plies == distance + 1
+
+
+def test_symmetric_positions_agree(tables):
+    rng = random.Random(9)
+    positions = knight_positions(tables, rng, (WIN, LOSS, DRAW))
+    for _ in range(50):
+        position = next(positions)
+        result = tables.probe(position)
+        mirrored = Position(castling=0)
+        mirrored.turn = position.turn
+        for sq, code in enumerate(position.squares):
+            mirrored.squares[sq ^ 7] = code  # Files mirrored
+        assert tables.probe(mirrored) == result
+        swapped = Position(castling=0)
+        swapped.turn = position.turn ^ 1
+        for sq, code in enumerate(position.squares):
+            if code:
+                swapped.squares[sq ^ 56] = code ^ 1 << COLOR_SHIFT  # Ranks mirrored and colors swapped
+        assert tables.probe(swapped) == result
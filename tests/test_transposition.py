@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from perft import REFERENCE_POSITIONS, perft
+from split_position import Position
+from transposition import EXACT, SLOT_BYTES, TranspositionTable
+
+
+@pytest.mark.parametrize("size_mb", [1, 3, 16])
+def test_size_is_an_upper_bound(size_mb):
+    table = TranspositionTable(size_mb)
+    memory = table.stats()["memory_bytes"]
+    assert memory == table.size * SLOT_BYTES
+    assert size_mb * 1024 * 1024 // 2 < memory <= size_mb * 1024 * 1024
+    assert table.size & table.mask == 0
+
+
+def test_incremental_key_matches_a_fresh_one():
+    rng = random.Random(6)
+    for name, fen, _ in REFERENCE_POSITIONS:
+        for game in range(3):
+            position = Position.from_fen(fen)
+            for ply in range(80):
+                assert position.key == position.compute_key()
+                moves = position.generate_moves()
+                if not moves:
+                    break
+                position.make_move(rng.choice(moves))
+                if rng.random() < 0.2:
+                    position.unmake_move()
+                    assert position.key == position.compute_key()
+
+
+def test_same_position_same_key():
+    # Transpositions reach the same key, and a different side to move does not
+    position = Position.initial()
+    for first, second in (("Ng1-f3", "Ng8-f6"), ("Nb1-c3", "Nb8-c6"), ("Nf3-g1", "Nf6-g8"), ("Nc3-b1", "Nc6-b8")):
+        position.make_move(position.parse_move(first))
+        position.make_move(position.parse_move(second))
+    assert position == Position.initial() and position.key == Position.initial().key
+    assert Position.from_fen(Position.initial().to_fen().replace(" w ", " b ")).key != position.key
+
+
+def test_store_and_probe():
+    table = TranspositionTable(1)
+    table.store(12345, 3, 42, EXACT, 7)
+    assert table.probe(12345)[:4] == (3, 42, EXACT, 7)
+    assert table.probe(12345 + table.size) is None  # Same slot, other key
+
+
+def test_perft_with_a_table_keeps_the_counts():
+    name, fen, expected = REFERENCE_POSITIONS[2]
+    assert perft(Position.from_fen(fen), 3, table=TranspositionTable(1)) == expected[2]
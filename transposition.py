@@ -0,0 +1,109 @@
+# Fixed-memory transposition table keyed by Position.key.
+#
+# The table is a power-of-two number of slots stored in flat typed arrays, so
+# its memory use is set once when it is created and never grows. The size
+# asked for is an upper bound: the largest power of two that fits is used,
+# which is between half of it and all of it (16 MB gives 524288 slots, 12.5
+# MiB; stats() reports the actual memory_bytes). Each slot
+# keeps the full 64-bit key, the search depth, a score, a bound flag, the best
+# move (Move.code) and the search generation ("age") that stored it.
+from array import array
+
+# Bound flags
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Bytes per slot: key 8, score 8, move 4, depth 1, flag 1, age 2, used 1
+SLOT_BYTES = 25
+
+POLICIES = ("depth", "age")
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16, policy="depth"):
+        # size_mb is the most memory the slots may take, see above.
+        # policy "depth" keeps the deeper entry whatever its age; policy "age"
+        # always replaces entries left over from earlier searches and only keeps
+        # deeper entries of the current search.
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown replacement policy {policy!r}, expected one of {POLICIES}")
+        slots = 1
+        while slots * 2 * SLOT_BYTES <= size_mb * 1024 * 1024:
+            slots *= 2
+        self.size = slots
+        self.mask = slots - 1
+        self.policy = policy
+        self.keys = array("Q", bytes(8 * slots))
+        self.scores = array("q", bytes(8 * slots))
+        self.moves = array("I", bytes(4 * slots))
+        self.depths = array("b", bytes(slots))
+        self.flags = array("B", bytes(slots))
+        self.ages = array("H", bytes(2 * slots))
+        self.used = bytearray(slots)
+        self.age = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.overwrites = 0  # Stores that evicted an entry of another position
+        self.rejected = 0  # Stores skipped because the existing entry was kept
+
+    def clear(self):
+        self.used = bytearray(self.size)
+        self.age = 0
+        self.reset_stats()
+
+    def new_search(self):
+        # Start a new generation, used by the "age" policy to spot stale entries
+        self.age = (self.age + 1) & 0xFFFF
+
+    def probe(self, key):
+        # Returns (depth, score, flag, move code) stored for key, or None
+        index = key & self.mask
+        if self.used[index] and self.keys[index] == key:
+            self.hits += 1
+            return self.depths[index], self.scores[index], self.flags[index], self.moves[index]
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, score, flag, move=0):
+        index = key & self.mask
+        if self.used[index]:
+            same = self.keys[index] == key
+            if not same:
+                keep = self.depths[index] > depth
+                if self.policy == "age":
+                    keep = keep and self.ages[index] == self.age
+                if keep:
+                    self.rejected += 1
+                    return False
+                self.overwrites += 1
+            elif not move:
+                move = self.moves[index]  # Keep the best move known for this position
+        self.keys[index] = key
+        self.depths[index] = max(-128, min(127, depth))
+        self.scores[index] = score
+        self.flags[index] = flag
+        self.moves[index] = move
+        self.ages[index] = self.age
+        self.used[index] = 1
+        self.stores += 1
+        return True
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            "size": self.size,
+            "memory_bytes": self.size * SLOT_BYTES,
+            "policy": self.policy,
+            "filled": self.used.count(1),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / probes if probes else 0.0,
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+            "rejected": self.rejected,
+        }